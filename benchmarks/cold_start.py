@@ -0,0 +1,258 @@
+"""
+MIT No Attribution
+
+Copyright 2025 Amazon Web Services
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+
+Measures the init phase (module import) and the deployment package size of
+Lambda handler modules.
+
+Every sample runs in a fresh interpreter so that nothing is cached between runs.
+AWS calls made at import time are answered by a local STS endpoint with an
+injectable latency, so a handler that calls STS during init is measured the
+same way it would be in Lambda.
+
+The package size is the code of the function directory plus the installed
+size of everything its requirements.txt pulls in, and the same for the shared
+layer. Requirements are resolved against the distributions installed in the
+running interpreter.
+
+Usage:
+    python benchmarks/cold_start.py infrastructure/extraction/app.py --baseline df79c90 --sts-latency-ms 80
+    python benchmarks/cold_start.py infrastructure/*/app.py --baseline 13a0a46
+"""
+
+import argparse
+import importlib.metadata
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STS_RESPONSE = """<GetCallerIdentityResponse xmlns="https://sts.amazonaws.com/doc/2011-06-15/">
+  <GetCallerIdentityResult>
+    <Arn>arn:aws:iam::123456789012:user/benchmark</Arn>
+    <UserId>AIDABENCHMARK</UserId>
+    <Account>123456789012</Account>
+  </GetCallerIdentityResult>
+  <ResponseMetadata><RequestId>benchmark</RequestId></ResponseMetadata>
+</GetCallerIdentityResponse>"""
+
+# Runs inside the child interpreter: import the module and report the elapsed time
+CHILD_SCRIPT = """
+import importlib.util, json, os, sys, time
+path = sys.argv[1]
+sys.path.insert(0, os.path.dirname(path))
+# Modules of the shared layer
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(path))), 'shared'))
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location('handler_under_test', path)
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+print(json.dumps({'init_ms': (time.perf_counter() - start) * 1000}))
+"""
+
+
+class FakeStsHandler(BaseHTTPRequestHandler):
+    latency_seconds = 0.0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.latency_seconds)
+        body = STS_RESPONSE.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/xml')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_sts(latency_ms):
+    FakeStsHandler.latency_seconds = latency_ms / 1000
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeStsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def child_environment(sts_endpoint):
+    env = dict(os.environ)
+    env.update({
+        'AWS_DEFAULT_REGION': 'us-east-1',
+        'AWS_REGION': 'us-east-1',
+        'AWS_ACCESS_KEY_ID': 'benchmark',
+        'AWS_SECRET_ACCESS_KEY': 'benchmark',
+        'AWS_ENDPOINT_URL_STS': sts_endpoint,
+        'AWS_EC2_METADATA_DISABLED': 'true',
+        'PYTHONDONTWRITEBYTECODE': '1'
+    })
+    return env
+
+
+def measure(module_path, runs, env):
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', CHILD_SCRIPT, module_path],
+            env=env, capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1])['init_ms'])
+    return samples
+
+
+def export_revision(ref, module_path, target_dir):
+    """
+    Copy the Lambda directories (the function and the shared layer) of module_path as they were at git revision ref
+    """
+    relative_dir = os.path.relpath(os.path.dirname(os.path.abspath(module_path)), REPO_ROOT)
+    archive = subprocess.run(
+        ['git', '-C', REPO_ROOT, 'archive', ref, os.path.dirname(relative_dir)],
+        capture_output=True, check=True
+    ).stdout
+    subprocess.run(['tar', '-x', '-C', target_dir], input=archive, check=True)
+    return os.path.join(target_dir, relative_dir, os.path.basename(module_path))
+
+
+def code_size(directory):
+    total = 0
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = [name for name in dirs if name != '__pycache__']
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+def requirement_name(requirement):
+    """
+    Distribution name of a requirement line, None for comments and extras-only requirements
+    """
+    requirement = requirement.split('#', 1)[0].strip()
+    if not requirement or requirement.startswith('-') or 'extra ==' in requirement:
+        return None
+    match = re.match(r'[A-Za-z0-9._-]+', requirement)
+    return match.group(0).lower().replace('_', '-') if match else None
+
+
+def dependency_size(requirements_path):
+    """
+    Installed size in bytes of the requirements and everything they depend on,
+    and the names that are not installed here
+    """
+    try:
+        with open(requirements_path) as requirements_file:
+            pending = [name for name in map(requirement_name, requirements_file) if name]
+    except FileNotFoundError:
+        return 0, []
+
+    seen = set()
+    total = 0
+    missing = []
+    while pending:
+        name = pending.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        try:
+            distribution = importlib.metadata.distribution(name)
+        except importlib.metadata.PackageNotFoundError:
+            missing.append(name)
+            continue
+        for file in distribution.files or []:
+            path = file.locate()
+            if os.path.isfile(path) and '__pycache__' not in file.parts:
+                total += os.path.getsize(path)
+        pending.extend(name for name in map(requirement_name, distribution.requires or []) if name)
+    return total, missing
+
+
+def package_size(directory):
+    """
+    (code bytes, dependency bytes, missing distributions) of a function or layer directory
+    """
+    dependencies, missing = dependency_size(os.path.join(directory, 'requirements.txt'))
+    return code_size(directory), dependencies, missing
+
+
+def format_size(size):
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024 or unit == 'MB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def summarize_package(label, module_path):
+    function_dir = os.path.dirname(os.path.abspath(module_path))
+    layer_dir = os.path.join(os.path.dirname(function_dir), 'shared')
+    function_code, function_dependencies, function_missing = package_size(function_dir)
+    layer_code, layer_dependencies, layer_missing = package_size(layer_dir)
+    missing = sorted(set(function_missing + layer_missing))
+    print(f"{label:<12} function={format_size(function_code + function_dependencies):>9} "
+          f"({format_size(function_dependencies)} requirements)  "
+          f"layer={format_size(layer_code + layer_dependencies):>9} "
+          f"({format_size(layer_dependencies)} requirements)"
+          + (f"  not installed: {', '.join(missing)}" if missing else ''))
+    return function_code + function_dependencies
+
+
+def summarize(label, samples):
+    samples = sorted(samples)
+    p90 = samples[min(len(samples) - 1, int(len(samples) * 0.9))]
+    print(f"{label:<12} runs={len(samples):<4} median={statistics.median(samples):8.1f} ms  "
+          f"p90={p90:8.1f} ms  min={samples[0]:8.1f} ms")
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the init phase and package size of Lambda handler modules')
+    parser.add_argument('modules', nargs='+', help='Paths to Lambda handler modules, e.g. infrastructure/extraction/app.py')
+    parser.add_argument('--baseline', help='Git revision to compare the working tree against')
+    parser.add_argument('--runs', type=int, default=15)
+    parser.add_argument('--sts-latency-ms', type=float, default=50.0,
+                        help='Latency injected into each STS call made during init')
+    args = parser.parse_args()
+
+    server = start_fake_sts(args.sts_latency_ms)
+    env = child_environment(f"http://127.0.0.1:{server.server_address[1]}")
+
+    try:
+        for module_path in args.modules:
+            print(os.path.relpath(os.path.abspath(module_path), REPO_ROOT))
+            current = summarize('current', measure(os.path.abspath(module_path), args.runs, env))
+            current_size = summarize_package('current', module_path)
+            if args.baseline:
+                with tempfile.TemporaryDirectory() as target_dir:
+                    baseline_module = export_revision(args.baseline, module_path, target_dir)
+                    baseline = summarize(args.baseline[:12], measure(baseline_module, args.runs, env))
+                    baseline_size = summarize_package(args.baseline[:12], baseline_module)
+                print(f"init-phase change: {current - baseline:+.1f} ms ({(current - baseline) / baseline:+.0%})  "
+                      f"function package change: {format_size(abs(current_size - baseline_size))} "
+                      f"{'smaller' if current_size <= baseline_size else 'larger'}")
+            print()
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,633 @@
+"""
+MIT No Attribution
+
+Copyright 2025 Amazon Web Services
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+
+In-memory fakes of the AWS clients used by the Lambda functions.
+
+install() patches boto3.client, so it must run before the handler modules are
+imported. Every fake counts its calls and can be given an artificial latency
+and a probability of answering with ThrottlingException. The Bedrock fakes
+also enforce a requests-per-minute quota (per model for Converse). The
+DynamoDB fake stores items and understands the update, condition and key
+condition expressions used by the functions (SET, ADD, REMOVE, if_not_exists,
+attribute_(not_)exists, comparisons, BETWEEN and begins_with), including
+TransactWriteItems. Tables given as stream_tables keep a NEW_AND_OLD_IMAGES
+stream of their writes.
+"""
+
+import hashlib
+import io
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from decimal import Decimal
+from unittest import mock
+
+from botocore.exceptions import ClientError
+
+# Key attributes of the tables of the sample, tried in order
+KNOWN_KEY_SCHEMAS = [('invocationId', 'fileName'), ('contentHash',), ('cacheKey',), ('dimension', 'hour'), ('partition', 'position')]
+
+
+def client_error(code, operation_name, message=''):
+    return ClientError({'Error': {'Code': code, 'Message': message}}, operation_name)
+
+
+class FakeClient:
+    def __init__(self, latency_ms=0, throttle_probability=0.0):
+        self.latency = latency_ms / 1000
+        self.throttle_probability = throttle_probability
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, operation_name):
+        """
+        Count the call, sleep for the latency and inject throttling
+        """
+        if self.throttle_probability and random.random() < self.throttle_probability:
+            with self._lock:
+                self.calls['Throttled'] += 1
+            raise client_error('ThrottlingException', operation_name, 'Injected throttling')
+        with self._lock:
+            self.calls[operation_name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+
+class QuotaWindow:
+    """
+    Requests per minute quota, enforced over one second windows like the service does
+    """
+
+    def __init__(self, requests_per_minute):
+        self.per_second = requests_per_minute / 60
+        self.window = None
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def admit(self):
+        with self._lock:
+            window = int(time.monotonic())
+            if window != self.window:
+                self.window = window
+                self.count = 0
+            self.count += 1
+            return self.count <= self.per_second
+
+
+class FakeS3(FakeClient):
+    def __init__(self, latency_ms=0, throttle_probability=0.0):
+        super().__init__(latency_ms, throttle_probability)
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.record('PutObject')
+        body = Body if isinstance(Body, bytes) else Body.encode('utf-8')
+        self.objects[(Bucket, Key)] = body
+        return {'ETag': f'"{hashlib.md5(body).hexdigest()}"'}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        self.record('GetObject')
+        if (Bucket, Key) not in self.objects:
+            raise client_error('NoSuchKey', 'GetObject', Key)
+        data = self.objects[(Bucket, Key)]
+        return {'Body': io.BytesIO(data), 'ContentLength': len(data)}
+
+
+class FakeBedrockAgentRuntime(FakeClient):
+    """
+    Knowledge base retrieval; every query returns the same SOP passages
+    """
+
+    PASSAGES = [
+        "Claims for amounts less than $50 can be auto approved, Claims for greater than $50 needs further review "
+        "except: Claims with Covid19 medication drugs should be auto approved regardless of the dollar value.",
+        "Over the counter drugs such as Tylenol, Vicks are not allowed. Toiletries are not allowed.",
+        "Tier 1: less than $50, auto-approval. Tier 3: greater than $100, mandatory review. "
+        "Tier 4: greater than $10,000, automatic denial."
+    ]
+
+    def retrieve(self, knowledgeBaseId, retrievalQuery, **kwargs):
+        self.record('Retrieve')
+        return {'retrievalResults': [{'content': {'text': text}, 'score': 0.9} for text in self.PASSAGES]}
+
+
+class FakeBedrockRuntime(FakeClient):
+    """
+    Model calls with a requests-per-minute quota per model. slow_probability of
+    the calls take slow_latency_ms instead of the latency, to model a long tail.
+    """
+
+    def __init__(self, latency_ms=0, requests_per_minute=None, decision='approved', throttle_probability=0.0,
+                 slow_probability=0.0, slow_latency_ms=0):
+        super().__init__(latency_ms, throttle_probability)
+        self.requests_per_minute = requests_per_minute
+        self.quotas = {}
+        self.decision = decision
+        self.slow_probability = slow_probability
+        self.slow_latency = slow_latency_ms / 1000
+
+    def admit(self, model_id):
+        if not self.requests_per_minute:
+            return True
+        with self._lock:
+            quota = self.quotas.setdefault(model_id, QuotaWindow(self.requests_per_minute))
+        return quota.admit()
+
+    def converse(self, modelId, messages, system=None, **kwargs):
+        if not self.admit(modelId):
+            with self._lock:
+                self.calls['Throttled'] += 1
+            raise client_error('ThrottlingException', 'Converse', 'Too many requests')
+        if self.slow_probability and random.random() < self.slow_probability:
+            with self._lock:
+                self.calls['Slow'] += 1
+            time.sleep(max(0.0, self.slow_latency - self.latency))
+        self.record('Converse')
+        with self._lock:
+            self.calls[f'Converse {modelId}'] += 1
+        text = json.dumps({'decision': self.decision, 'reason': 'Within the SOP limits'})
+        prompt = ''.join(block['text'] for block in (system or []))
+        prompt += ''.join(block['text'] for message in messages for block in message['content'])
+        return {
+            'output': {'message': {'role': 'assistant', 'content': [{'text': text}]}},
+            'usage': {'inputTokens': len(prompt) // 4, 'outputTokens': len(text) // 4,
+                      'totalTokens': (len(prompt) + len(text)) // 4},
+            'stopReason': 'end_turn'
+        }
+
+
+class FakeBedrockDataAutomationRuntime(FakeClient):
+    """
+    Accepts jobs and hands them to on_job(job) (e.g. a simulator that writes the output later).
+    With max_jobs, jobs beyond that many running ones are refused until complete(job_id) is called.
+    """
+
+    def __init__(self, latency_ms=0, requests_per_minute=None, throttle_probability=0.0, on_job=None, max_jobs=None):
+        super().__init__(latency_ms, throttle_probability)
+        self.quota = QuotaWindow(requests_per_minute) if requests_per_minute else None
+        self.on_job = on_job
+        self.max_jobs = max_jobs
+        self.running = set()
+        self.peak_running = 0
+
+    def invoke_data_automation_async(self, inputConfiguration, outputConfiguration, **kwargs):
+        if self.quota and not self.quota.admit():
+            with self._lock:
+                self.calls['Throttled'] += 1
+            raise client_error('ThrottlingException', 'InvokeDataAutomationAsync', 'Too many requests')
+        job_id = str(uuid.uuid4())
+        with self._lock:
+            if self.max_jobs and len(self.running) >= self.max_jobs:
+                self.calls['JobLimitExceeded'] += 1
+                raise client_error('ServiceQuotaExceededException', 'InvokeDataAutomationAsync', 'Too many concurrent jobs')
+            self.running.add(job_id)
+            self.peak_running = max(self.peak_running, len(self.running))
+        self.record('InvokeDataAutomationAsync')
+        job = {
+            'job_id': job_id,
+            'input_s3_uri': inputConfiguration['s3Uri'],
+            'output_s3_uri': outputConfiguration['s3Uri']
+        }
+        if self.on_job:
+            self.on_job(job)
+        return {'invocationArn': f"arn:aws:bedrock:us-east-1:123456789012:data-automation-invocation/{job_id}"}
+
+    def complete(self, job_id):
+        with self._lock:
+            self.running.discard(job_id)
+
+
+def to_python(attribute_value):
+    (kind, value), = attribute_value.items()
+    if kind == 'N':
+        return Decimal(value)
+    if kind == 'NULL':
+        return None
+    return value
+
+
+def split_clauses(text):
+    """
+    Split on top level commas, leaving function arguments together
+    """
+    clauses, depth, current = [], 0, ''
+    for character in text:
+        if character == ',' and depth == 0:
+            clauses.append(current.strip())
+            current = ''
+            continue
+        depth += character == '('
+        depth -= character == ')'
+        current += character
+    if current.strip():
+        clauses.append(current.strip())
+    return clauses
+
+
+class FakeDynamoDB(FakeClient):
+    def __init__(self, latency_ms=0, throttle_probability=0.0, key_schemas=None, stream_tables=()):
+        super().__init__(latency_ms, throttle_probability)
+        self.key_schemas = dict(key_schemas or {})
+        self.tables = {}
+        # table name -> stream records in write order
+        self.streams = {table_name: [] for table_name in stream_tables}
+        self._sequence = 0
+
+    def emit(self, table_name, old_item, new_item):
+        """
+        Append a stream record for a write; called with the lock held
+        """
+        stream = self.streams.get(table_name)
+        if stream is None or (old_item is None and new_item is None):
+            return
+        self._sequence += 1
+        images = {'SequenceNumber': str(100000000000000000000 + self._sequence)}
+        if old_item is not None:
+            images['OldImage'] = dict(old_item)
+        if new_item is not None:
+            images['NewImage'] = dict(new_item)
+        event_name = 'INSERT' if old_item is None else 'REMOVE' if new_item is None else 'MODIFY'
+        stream.append({'eventID': uuid.uuid4().hex, 'eventName': event_name, 'dynamodb': images})
+
+    def read_stream(self, table_name, position, limit):
+        with self._lock:
+            return self.streams[table_name][position:position + limit]
+
+    def key_of(self, table_name, attributes):
+        key_names = self.key_schemas.get(table_name)
+        if key_names is None:
+            key_names = next(names for names in KNOWN_KEY_SCHEMAS if all(name in attributes for name in names))
+            self.key_schemas[table_name] = key_names
+        return tuple(json.dumps(attributes[name], sort_keys=True) for name in key_names)
+
+    def matches(self, expression, item, names, values):
+        """
+        Evaluate a condition or key condition expression against an item
+        """
+        if not expression:
+            return True
+
+        def name(token):
+            return names.get(token, token)
+
+        def value(token):
+            if token.startswith(':'):
+                return to_python(values[token])
+            return to_python(item[name(token)]) if name(token) in item else None
+
+        def compare(left, operator, right):
+            left, right = value(left), value(right)
+            if left is None or right is None:
+                return operator == '<>'
+            return {'=': left == right, '<>': left != right, '<': left < right,
+                    '<=': left <= right, '>': left > right, '>=': left >= right}[operator]
+
+        python = expression
+        python = re.sub(r'attribute_not_exists\(\s*([#\w]+)\s*\)', lambda m: f"(not exists({m.group(1)!r}))", python)
+        python = re.sub(r'attribute_exists\(\s*([#\w]+)\s*\)', lambda m: f"exists({m.group(1)!r})", python)
+        python = re.sub(r'begins_with\(\s*([#\w]+)\s*,\s*(:\w+)\s*\)',
+                        lambda m: f"begins_with({m.group(1)!r}, {m.group(2)!r})", python)
+        python = re.sub(r'([#\w]+)\s+IN\s*\(([^)]*)\)',
+                        lambda m: f"is_in({m.group(1)!r}, {[token.strip() for token in m.group(2).split(',')]!r})", python)
+        python = re.sub(r'([#\w]+)\s+BETWEEN\s+(:\w+)\s+AND\s+(:\w+)',
+                        lambda m: f"between({m.group(1)!r}, {m.group(2)!r}, {m.group(3)!r})", python)
+        python = re.sub(r'([#\w]+)\s*(<>|<=|>=|=|<|>)\s*([#:\w]+)',
+                        lambda m: f"compare({m.group(1)!r}, {m.group(2)!r}, {m.group(3)!r})", python)
+        python = re.sub(r'\bAND\b', 'and', re.sub(r'\bOR\b', 'or', re.sub(r'\bNOT\b', 'not', python)))
+        return eval(python, {'__builtins__': {}}, {
+            'exists': lambda token: name(token) in item,
+            'begins_with': lambda token, prefix: str(value(token) or '').startswith(value(prefix)),
+            'between': lambda token, low, high: value(token) is not None and value(low) <= value(token) <= value(high),
+            'is_in': lambda token, candidates: value(token) in [value(candidate) for candidate in candidates],
+            'compare': compare
+        })
+
+    def apply_update(self, item, expression, names, values):
+        def name(token):
+            return names.get(token, token)
+
+        for action, body in re.findall(r'\b(SET|ADD|REMOVE)\b(.*?)(?=\b(?:SET|ADD|REMOVE)\b|$)', expression, re.DOTALL):
+            for clause in split_clauses(body):
+                if action == 'SET':
+                    target, source = [part.strip() for part in clause.split('=', 1)]
+                    if_not_exists = re.match(r'if_not_exists\(\s*([#\w]+)\s*,\s*(:\w+)\s*\)', source)
+                    if if_not_exists:
+                        item.setdefault(name(if_not_exists.group(1)), values[if_not_exists.group(2)])
+                    else:
+                        item[name(target)] = values[source]
+                elif action == 'ADD':
+                    target, source = clause.split()
+                    current, addition = item.get(name(target)), values[source]
+                    if 'N' in addition:
+                        total = Decimal(current['N'] if current else '0') + Decimal(addition['N'])
+                        item[name(target)] = {'N': str(total)}
+                    else:
+                        (kind, members), = addition.items()
+                        item[name(target)] = {kind: sorted(set(current[kind] if current else []) | set(members))}
+                else:
+                    item.pop(name(clause), None)
+
+    def put_item(self, TableName, Item, ConditionExpression=None, ExpressionAttributeNames=None,
+                 ExpressionAttributeValues=None, **kwargs):
+        self.record('PutItem')
+        with self._lock:
+            table = self.tables.setdefault(TableName, {})
+            key = self.key_of(TableName, Item)
+            if not self.matches(ConditionExpression, table.get(key, {}), ExpressionAttributeNames or {},
+                                ExpressionAttributeValues or {}):
+                raise client_error('ConditionalCheckFailedException', 'PutItem', 'The conditional request failed')
+            self.emit(TableName, table.get(key), Item)
+            table[key] = dict(Item)
+        return {}
+
+    def update_item(self, TableName, Key, UpdateExpression, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ReturnValues='NONE', **kwargs):
+        self.record('UpdateItem')
+        names, values = ExpressionAttributeNames or {}, ExpressionAttributeValues or {}
+        with self._lock:
+            table = self.tables.setdefault(TableName, {})
+            key = self.key_of(TableName, Key)
+            old_item = table.get(key)
+            item = dict(old_item or Key)
+            if not self.matches(ConditionExpression, old_item or {}, names, values):
+                raise client_error('ConditionalCheckFailedException', 'UpdateItem', 'The conditional request failed')
+            self.apply_update(item, UpdateExpression, names, values)
+            self.emit(TableName, old_item, item)
+            table[key] = item
+        if ReturnValues == 'NONE' or (ReturnValues.endswith('_OLD') and old_item is None):
+            return {}
+        return {'Attributes': dict(old_item if ReturnValues.endswith('_OLD') else item)}
+
+    def delete_item(self, TableName, Key, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, **kwargs):
+        self.record('DeleteItem')
+        with self._lock:
+            table = self.tables.setdefault(TableName, {})
+            key = self.key_of(TableName, Key)
+            if not self.matches(ConditionExpression, table.get(key, {}), ExpressionAttributeNames or {},
+                                ExpressionAttributeValues or {}):
+                raise client_error('ConditionalCheckFailedException', 'DeleteItem', 'The conditional request failed')
+            self.emit(TableName, table.pop(key, None), None)
+        return {}
+
+    def get_item(self, TableName, Key, **kwargs):
+        self.record('GetItem')
+        with self._lock:
+            item = self.tables.get(TableName, {}).get(self.key_of(TableName, Key))
+        return {'Item': dict(item)} if item else {}
+
+    def batch_write_item(self, RequestItems, **kwargs):
+        self.record('BatchWriteItem')
+        with self._lock:
+            for table_name, requests in RequestItems.items():
+                table = self.tables.setdefault(table_name, {})
+                for request in requests:
+                    item = request['PutRequest']['Item']
+                    key = self.key_of(table_name, item)
+                    self.emit(table_name, table.get(key), item)
+                    table[key] = dict(item)
+        return {'UnprocessedItems': {}}
+
+    def transact_write_items(self, TransactItems, **kwargs):
+        """
+        Put, Update, Delete and ConditionCheck items, all or nothing
+        """
+        self.record('TransactWriteItems')
+        with self._lock:
+            targets = []
+            reasons = []
+            for transact_item in TransactItems:
+                (action, request), = transact_item.items()
+                table = self.tables.setdefault(request['TableName'], {})
+                key = self.key_of(request['TableName'], request.get('Key') or request['Item'])
+                old_item = table.get(key)
+                names, values = request.get('ExpressionAttributeNames') or {}, request.get('ExpressionAttributeValues') or {}
+                targets.append((action, request, table, key, old_item, names, values))
+                if self.matches(request.get('ConditionExpression'), old_item or {}, names, values):
+                    reasons.append({'Code': 'None'})
+                else:
+                    reason = {'Code': 'ConditionalCheckFailed', 'Message': 'The conditional request failed'}
+                    if old_item and request.get('ReturnValuesOnConditionCheckFailure') == 'ALL_OLD':
+                        reason['Item'] = dict(old_item)
+                    reasons.append(reason)
+            if any(reason['Code'] != 'None' for reason in reasons):
+                raise ClientError({
+                    'Error': {'Code': 'TransactionCanceledException', 'Message': 'Transaction cancelled'},
+                    'CancellationReasons': reasons
+                }, 'TransactWriteItems')
+
+            for action, request, table, key, old_item, names, values in targets:
+                if action == 'Put':
+                    new_item = dict(request['Item'])
+                elif action == 'Update':
+                    new_item = dict(old_item or request['Key'])
+                    self.apply_update(new_item, request['UpdateExpression'], names, values)
+                elif action == 'Delete':
+                    new_item = None
+                else:
+                    continue
+                self.emit(request['TableName'], old_item, new_item)
+                if new_item is None:
+                    table.pop(key, None)
+                else:
+                    table[key] = new_item
+        return {}
+
+    def query(self, TableName, KeyConditionExpression, ExpressionAttributeNames=None, ExpressionAttributeValues=None,
+              FilterExpression=None, **kwargs):
+        """
+        Indexes are not modelled: every item of the table is checked against the key condition.
+        Queries on the table itself are sorted by key and honour Limit.
+        """
+        self.record('Query')
+        names, values = ExpressionAttributeNames or {}, ExpressionAttributeValues or {}
+        with self._lock:
+            items = [dict(item) for item in self.tables.get(TableName, {}).values()
+                     if self.matches(KeyConditionExpression, item, names, values)
+                     and self.matches(FilterExpression, item, names, values)]
+            key_names = self.key_schemas.get(TableName)
+        if key_names and 'IndexName' not in kwargs:
+            items.sort(key=lambda item: tuple(to_python(item[name]) for name in key_names),
+                       reverse=not kwargs.get('ScanIndexForward', True))
+            items = items[:kwargs['Limit']] if kwargs.get('Limit') else items
+        return {'Items': items, 'Count': len(items)}
+
+    def get_paginator(self, operation_name):
+        operation = getattr(self, operation_name)
+
+        class Paginator:
+            def paginate(self, **kwargs):
+                yield operation(**kwargs)
+
+        return Paginator()
+
+
+class FakeEventBridge(FakeClient):
+    """
+    Records entries and passes every event to the subscribers, as a rule target would receive it
+    """
+
+    def __init__(self, latency_ms=0, throttle_probability=0.0):
+        super().__init__(latency_ms, throttle_probability)
+        self.entries = []
+        self.subscribers = []
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def put_events(self, Entries, **kwargs):
+        self.record('PutEvents')
+        with self._lock:
+            self.entries.extend(Entries)
+        for entry in Entries:
+            event = {
+                'id': str(uuid.uuid4()),
+                'source': entry['Source'],
+                'detail-type': entry['DetailType'],
+                'detail': json.loads(entry['Detail'])
+            }
+            for callback in self.subscribers:
+                callback(event)
+        return {'FailedEntryCount': 0, 'Entries': [{'EventId': str(index)} for index, _ in enumerate(Entries)]}
+
+
+class FakeSNS(FakeClient):
+    def __init__(self, latency_ms=0, throttle_probability=0.0):
+        super().__init__(latency_ms, throttle_probability)
+        self.messages = []
+
+    def publish(self, **kwargs):
+        self.record('Publish')
+        with self._lock:
+            self.messages.append(kwargs)
+        return {'MessageId': str(uuid.uuid4())}
+
+    def publish_batch(self, PublishBatchRequestEntries, **kwargs):
+        self.record('PublishBatch')
+        with self._lock:
+            self.messages.extend(PublishBatchRequestEntries)
+        return {
+            'Successful': [{'Id': entry['Id'], 'MessageId': str(uuid.uuid4())} for entry in PublishBatchRequestEntries],
+            'Failed': []
+        }
+
+
+class FakeQueue:
+    """
+    Just enough SQS: batched receive, visibility timeout, receive count and a dead-letter queue
+    """
+
+    def __init__(self, visibility_timeout, max_receive):
+        self.visibility_timeout = visibility_timeout
+        self.max_receive = max_receive
+        self.messages = {}
+        self.dead_letters = []
+        self.redeliveries = 0
+        self._lock = threading.Lock()
+
+    def send(self, body):
+        with self._lock:
+            message_id = str(uuid.uuid4())
+            self.messages[message_id] = {'body': body, 'visible_at': 0.0, 'receive_count': 0}
+        return message_id
+
+    def receive(self, batch_size):
+        now = time.monotonic()
+        records = []
+        with self._lock:
+            for message_id in [message_id for message_id, message in self.messages.items()
+                               if message['receive_count'] >= self.max_receive and message['visible_at'] <= now]:
+                self.dead_letters.append(self.messages.pop(message_id))
+            for message_id, message in self.messages.items():
+                if message['visible_at'] > now:
+                    continue
+                if message['receive_count']:
+                    self.redeliveries += 1
+                message['receive_count'] += 1
+                message['visible_at'] = now + self.visibility_timeout
+                records.append({'messageId': message_id, 'body': message['body']})
+                if len(records) == batch_size:
+                    break
+        return records
+
+    def delete(self, message_ids):
+        with self._lock:
+            for message_id in message_ids:
+                self.messages.pop(message_id, None)
+
+    def empty(self):
+        with self._lock:
+            return not self.messages
+
+
+class FakeAWS:
+    """
+    One fake per service; install() makes boto3.client return them.
+    latency_ms and throttle map service names to a latency and a throttling probability.
+    """
+
+    def __init__(self, model_requests_per_minute=None, model_latency_ms=0, s3_latency_ms=0, dynamodb_latency_ms=0,
+                 bda_requests_per_minute=None, latency_ms=None, throttle=None, model_slow_probability=0.0,
+                 model_slow_latency_ms=0, dynamodb_stream_tables=(), bda_max_jobs=None):
+        latency_ms = dict({'s3': s3_latency_ms, 'dynamodb': dynamodb_latency_ms,
+                           'bedrock-runtime': model_latency_ms}, **(latency_ms or {}))
+        throttle = throttle or {}
+
+        def options(service_name):
+            return {'latency_ms': latency_ms.get(service_name, 0),
+                    'throttle_probability': throttle.get(service_name, 0.0)}
+
+        self.clients = {
+            's3': FakeS3(**options('s3')),
+            'bedrock-agent-runtime': FakeBedrockAgentRuntime(**options('bedrock-agent-runtime')),
+            'bedrock-runtime': FakeBedrockRuntime(requests_per_minute=model_requests_per_minute,
+                                                  slow_probability=model_slow_probability,
+                                                  slow_latency_ms=model_slow_latency_ms,
+                                                  **options('bedrock-runtime')),
+            'bedrock-data-automation-runtime': FakeBedrockDataAutomationRuntime(
+                requests_per_minute=bda_requests_per_minute, max_jobs=bda_max_jobs,
+                **options('bedrock-data-automation-runtime')),
+            'dynamodb': FakeDynamoDB(stream_tables=dynamodb_stream_tables, **options('dynamodb')),
+            'events': FakeEventBridge(**options('events')),
+            'sns': FakeSNS(**options('sns'))
+        }
+        self._patcher = None
+
+    def __getitem__(self, service_name):
+        return self.clients[service_name]
+
+    def client(self, service_name=None, *args, **kwargs):
+        service_name = service_name or kwargs.get('service_name')
+        if service_name not in self.clients:
+            raise ValueError(f"No fake for {service_name}")
+        return self.clients[service_name]
+
+    def install(self):
+        self._patcher = mock.patch('boto3.client', self.client)
+        self._patcher.start()
+        return self
+
+    def uninstall(self):
+        if self._patcher:
+            self._patcher.stop()
+            self._patcher = None
@@ -0,0 +1,121 @@
+"""
+MIT No Attribution
+
+Copyright 2025 Amazon Web Services
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+
+Compares peak memory and parse time of reading a BDA result.json with
+read().decode() + json.loads (the previous validation lambda) against the
+streaming parser in infrastructure/validation/result_parser.py.
+
+Synthetic multi-page results are generated from the field layout of
+assets/results/bda_invocation_result.json, with one geometry entry per page
+for every field.
+
+Usage:
+    python benchmarks/parse_result.py --pages 1 10 50 200
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'infrastructure', 'validation'))
+
+import result_parser  # noqa: E402
+
+SAMPLE_RESULT = os.path.join(REPO_ROOT, 'assets', 'results', 'bda_invocation_result.json')
+
+
+def synthetic_result(pages, fields_per_page):
+    with open(SAMPLE_RESULT) as sample_file:
+        sample = json.load(sample_file)
+    sample_fields = list(sample['explainability_info'][0].items())
+
+    explainability = {}
+    inference_result = {}
+    for index in range(fields_per_page):
+        sample_name, sample_data = sample_fields[index % len(sample_fields)]
+        name = f"{sample_name}_{index}"
+        geometry = sample_data['geometry'][0]
+        explainability[name] = dict(sample_data, geometry=[dict(geometry, page=page) for page in range(1, pages + 1)])
+        inference_result[name] = sample_data.get('value')
+
+    result = dict(sample)
+    result['inference_result'] = inference_result
+    result['explainability_info'] = [explainability]
+    result['split_document'] = {'page_indices': list(range(pages))}
+    return json.dumps(result).encode('utf-8')
+
+
+def parse_full(body):
+    data = body.read().decode('utf-8')
+    return json.loads(data)
+
+
+def parse_streaming(body):
+    return result_parser.parse_result(body)
+
+
+def measure(parse, payload, runs):
+    """
+    Best-of-runs parse time, then peak traced memory from a separate run
+    (tracemalloc slows allocation down, so it is not enabled while timing)
+    """
+    timings = []
+    for _ in range(runs):
+        body = io.BytesIO(payload)
+        start = time.perf_counter()
+        parse(body)
+        timings.append(time.perf_counter() - start)
+
+    body = io.BytesIO(payload)
+    tracemalloc.start()
+    parse(body)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(timings) * 1000, peak / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare BDA result.json parsing strategies')
+    parser.add_argument('--pages', type=int, nargs='+', default=[1, 10, 50, 200])
+    parser.add_argument('--fields', type=int, default=40, help='Fields per result')
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'pages':>6} {'size MB':>8} | {'full ms':>8} {'full peak MB':>13} | {'stream ms':>9} {'stream peak MB':>15}")
+    for pages in args.pages:
+        payload = synthetic_result(pages, args.fields)
+        # Both strategies must agree on everything the validation lambda reads
+        full = parse_full(io.BytesIO(payload))
+        streamed = parse_streaming(io.BytesIO(payload))
+        assert streamed['inference_result'] == full['inference_result']
+        assert streamed['matched_blueprint'] == full['matched_blueprint']
+
+        full_ms, full_peak = measure(parse_full, payload, args.runs)
+        stream_ms, stream_peak = measure(parse_streaming, payload, args.runs)
+        print(f"{pages:>6} {len(payload) / (1024 * 1024):>8.2f} | {full_ms:>8.1f} {full_peak:>13.2f} | "
+              f"{stream_ms:>9.1f} {stream_peak:>15.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,568 @@
+"""
+MIT No Attribution
+
+Copyright 2025 Amazon Web Services
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+
+Runs the whole claim pipeline locally against the in-process fakes of
+benchmarks/fakes.py:
+
+    S3 put -> extraction/app.py -> BDA job (fake, writes result.json after
+    --bda-latency-ms) -> validation queue -> validation/app.py -> EventBridge
+    -> integration queue -> integration/app.py -> SNS
+
+and the stream of the claims table -> aggregation/app.py, whose hourly
+aggregates are checked against the claims table at the end of the run.
+
+Claims are seeded from assets/results/bda_invocation_result.json and, for
+receipts, from the benefitClaimsReceipt of assets/others/sample-kb-event.json,
+with a unique value per claim so that neither dedup nor the decision cache
+short-circuits them (use --duplicate-ratio to re-upload earlier content).
+--junk-ratio uploads blank pages that BDA matches to no blueprint; they are
+rejected at triage without a knowledge base or model call.
+
+--bda-max-jobs caps the jobs the fake BDA runs at once. With
+--max-jobs-in-flight the extraction Lambda admits submissions against that
+many slots and queues the rest; every completion event is also delivered
+to it, and its schedule runs every --admission-interval seconds.
+
+Without --benchmark one claim of each kind is traced through every stage.
+With --benchmark the run reports per-stage p50/p99 latency (queueing
+included) and handler durations, end-to-end latency and claims/second.
+
+Usage:
+    python benchmarks/pipeline_simulator.py
+    python benchmarks/pipeline_simulator.py --benchmark --claims 500 --latency bedrock-runtime=200 \\
+        --throttle bedrock-data-automation-runtime=0.05
+    python benchmarks/pipeline_simulator.py --benchmark --model-slow-probability 0.05 \\
+        --models amazon.nova-lite-v1:0,amazon.nova-micro-v1:0 --hedge-after-ms 150
+"""
+
+import argparse
+import copy
+import importlib.util
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# The shared layer is on the path of every function in Lambda
+sys.path.insert(0, os.path.join(REPO_ROOT, 'infrastructure', 'shared'))
+
+import instrumentation  # noqa: E402
+from fakes import FakeAWS, FakeQueue  # noqa: E402
+
+logger = logging.getLogger('pipeline_simulator')
+
+SAMPLE_RESULT = os.path.join(REPO_ROOT, 'assets', 'results', 'bda_invocation_result.json')
+SAMPLE_KB_EVENT = os.path.join(REPO_ROOT, 'assets', 'others', 'sample-kb-event.json')
+
+INGESTION_BUCKET = 'benefit-claim-ingestion-bucket-simulator'
+EXTRACTION_BUCKET = 'benefit-claim-extraction-bucket-simulator'
+
+STAGES = ['extraction', 'bda', 'validation', 'integration']
+TIMESTAMPS = ['uploaded', 'extracted', 'bda_completed', 'validated', 'notified']
+
+
+def load_handler(function_name):
+    """
+    Import infrastructure/<function_name>/app.py under its own module name; its sibling modules become importable
+    """
+    function_dir = os.path.join(REPO_ROOT, 'infrastructure', function_name)
+    sys.path.insert(0, function_dir)
+    spec = importlib.util.spec_from_file_location(f"{function_name}_app", os.path.join(function_dir, 'app.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def seed_results():
+    with open(SAMPLE_RESULT) as sample_file:
+        diploma = json.load(sample_file)
+    with open(SAMPLE_KB_EVENT) as sample_file:
+        receipt_fields = json.load(sample_file)['benefitClaimsReceipt']
+
+    receipt = copy.deepcopy(diploma)
+    receipt['matched_blueprint'] = dict(diploma['matched_blueprint'], name='benefit-claims-pharmacy-receipt-blueprint')
+    receipt['inference_result'] = receipt_fields
+    receipt['explainability_info'] = [{
+        name: {'confidence': 0.95, 'success': True} for name in receipt_fields
+    }]
+    return [diploma, receipt]
+
+
+def unique_result(seeds, index):
+    """
+    Vary one extracted value per claim so that every claim needs its own decision
+    """
+    result = copy.deepcopy(seeds[index % len(seeds)])
+    inference_result = result['inference_result']
+    if 'PAYMENTDETAILS' in inference_result:
+        inference_result['PAYMENTDETAILS']['TOTAL'] = round(200 + index / 100, 2)
+    else:
+        inference_result['registration_number'] = str(100000 + index)
+    return result
+
+
+def percentile(values, fraction):
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class Pipeline:
+    def __init__(self, aws, args):
+        self.aws = aws
+        self.args = args
+        self.seeds = seed_results()
+        self.extraction = load_handler('extraction')
+        self.validation = load_handler('validation')
+        self.integration = load_handler('integration')
+        self.aggregation = load_handler('aggregation')
+        self.stream_position = 0
+        self.stream_records = 0
+
+        self.upload_queue = FakeQueue(args.visibility_timeout, args.max_receive)
+        self.validation_queue = FakeQueue(args.visibility_timeout, args.max_receive)
+        self.integration_queue = FakeQueue(args.visibility_timeout, args.max_receive)
+
+        self.lock = threading.Lock()
+        self.claims = {}              # upload key -> {'index', timestamps...}
+        self.jobs = {}                # BDA job id -> upload key
+        self.contents = {}            # uploaded bytes -> index of the claim that first carried them
+        self.durations = defaultdict(list)
+        self.expected = 0
+        self.done = threading.Event()
+        self.timers = []
+        # Spans and EMF documents the handlers would write to their logs
+        self.spans = []
+        self.metric_documents = []
+        instrumentation.write = self.collect
+
+        aws['bedrock-data-automation-runtime'].on_job = self.start_bda_job
+        aws['events'].subscribe(self.route_event)
+
+    def collect(self, document):
+        if '_aws' in document:
+            self.metric_documents.append(document)
+        else:
+            self.spans.append(document)
+
+    def now(self):
+        return time.perf_counter()
+
+    def mark(self, key, timestamp):
+        with self.lock:
+            claim = self.claims.get(key)
+            if claim is not None and timestamp not in claim:
+                claim[timestamp] = self.now()
+                if timestamp == 'notified':
+                    self.expected -= 1
+                    if self.expected == 0:
+                        self.done.set()
+
+    # Stage 0: the frontend uploads a document and S3 notifies the extraction lambda
+    def upload(self, index, content_index, junk=False):
+        key = f"claims/claim-{index}.png"
+        body = f"claim document {content_index}".encode('utf-8')
+        content_index = self.contents.setdefault(body, content_index)
+        response = self.aws['s3'].put_object(Bucket=INGESTION_BUCKET, Key=key, Body=body)
+        with self.lock:
+            self.claims[key] = {'index': content_index, 'junk': junk, 'uploaded': self.now()}
+            if content_index == index:
+                self.expected += 1
+        self.upload_queue.send(json.dumps({'Records': [{
+            's3': {
+                'bucket': {'name': INGESTION_BUCKET},
+                'object': {'key': key, 'eTag': response['ETag'].strip('"'), 'size': len(body)}
+            }
+        }]}))
+
+    # Stage 1: BDA finishes the job and publishes the completion event
+    def start_bda_job(self, job):
+        key = job['input_s3_uri'].split('/', 3)[3]
+        with self.lock:
+            self.jobs[job['job_id']] = key
+        self.mark(key, 'extracted')
+        timer = threading.Timer(self.args.bda_latency_ms / 1000, self.complete_bda_job, args=(job, key))
+        timer.daemon = True
+        self.timers.append(timer)
+        timer.start()
+
+    def complete_bda_job(self, job, key):
+        self.aws['bedrock-data-automation-runtime'].complete(job['job_id'])
+        output_path = f"output/{job['job_id']}/0"
+        standard_output_key = f"{output_path}/standard_output/0/result.json"
+        segment = {'standard_output_path': f"s3://{EXTRACTION_BUCKET}/{standard_output_key}"}
+        if self.claims[key]['junk']:
+            standard_output = {'image': {'text_words': []}, 'statistics': {'word_count': 0}}
+            segment['custom_output_status'] = 'NO_MATCH'
+        else:
+            standard_output = {'image': {'text_words': []}, 'statistics': {'word_count': 120}}
+            result_key = f"{output_path}/custom_output/0/result.json"
+            result = unique_result(self.seeds, self.claims[key]['index'])
+            self.aws['s3'].objects[(EXTRACTION_BUCKET, result_key)] = json.dumps(result).encode('utf-8')
+            segment.update({'custom_output_status': 'MATCH', 'custom_output_path': f"s3://{EXTRACTION_BUCKET}/{result_key}"})
+        self.aws['s3'].objects[(EXTRACTION_BUCKET, standard_output_key)] = json.dumps(standard_output).encode('utf-8')
+        self.aws['s3'].objects[(EXTRACTION_BUCKET, f"output/{job['job_id']}/job_metadata.json")] = json.dumps({
+            'job_id': job['job_id'],
+            'output_metadata': [{'asset_id': 0, 'segment_metadata': [segment]}]
+        }).encode('utf-8')
+        self.mark(key, 'bda_completed')
+        self.durations['bda'].append(self.args.bda_latency_ms / 1000)
+        completion_event = json.dumps({
+            'source': 'aws.bedrock',
+            'detail-type': 'Bedrock Data Automation Job Succeeded',
+            'detail': {
+                'job_id': job['job_id'],
+                'job_status': 'SUCCESS',
+                'input_s3_object': {'s3_bucket': INGESTION_BUCKET, 'name': key},
+                'output_s3_location': {'s3_bucket': EXTRACTION_BUCKET, 'name': output_path}
+            }
+        })
+        self.validation_queue.send(completion_event)
+        # The job completed rule releases the admission slot
+        if self.args.max_jobs_in_flight:
+            self.upload_queue.send(completion_event)
+
+    # The decision event rule targets the integration queue
+    def route_event(self, event):
+        if event['source'] == 'benefit-claim-validation-function':
+            key = self.jobs.get(event['detail'].get('bda_invocation_id'))
+            if key:
+                self.mark(key, 'validated')
+            self.integration_queue.send(json.dumps(event))
+
+    def timed(self, stage, handler, event):
+        """
+        Invoke a handler like Lambda would. Returns None when it raised: the whole event is retried.
+        """
+        start = self.now()
+        try:
+            return handler(event, None)
+        except Exception:
+            logger.exception(f"{stage} invocation failed")
+            return None
+        finally:
+            with self.lock:
+                self.durations[stage].append(self.now() - start)
+
+    def poll_uploads(self):
+        while not self.done.is_set():
+            records = self.upload_queue.receive(1)
+            if not records:
+                time.sleep(0.005)
+                continue
+            response = self.timed('extraction', self.extraction.lambda_handler, json.loads(records[0]['body']))
+            # S3 retries the asynchronous invocation when the function fails
+            if response and response['statusCode'] == 200:
+                self.upload_queue.delete([records[0]['messageId']])
+
+    def admission_schedule(self):
+        while not self.done.wait(self.args.admission_interval):
+            self.timed('extraction', self.extraction.lambda_handler, {'source': 'aws.events', 'detail-type': 'Scheduled Event'})
+
+    def poll(self, stage, queue, handler, batch_size, on_success=None):
+        while not self.done.is_set():
+            records = queue.receive(batch_size)
+            if not records:
+                time.sleep(0.005)
+                continue
+            response = self.timed(stage, handler, {'Records': records})
+            if response is None:
+                continue
+            failed = {failure['itemIdentifier'] for failure in response.get('batchItemFailures', [])}
+            succeeded = [record for record in records if record['messageId'] not in failed]
+            queue.delete([record['messageId'] for record in succeeded])
+            if on_success:
+                on_success(succeeded)
+
+    def poll_stream(self):
+        while not self.done.is_set():
+            if not self.aggregate_stream():
+                time.sleep(self.args.aggregation_window)
+
+    def aggregate_stream(self):
+        """
+        Pass the next batch of the claims table stream to the aggregation handler. The position
+        only moves on when the handler succeeds, so a failed batch is retried from its first record.
+        """
+        records = self.aws['dynamodb'].read_stream(os.environ['BDA_TABLE_NAME'], self.stream_position,
+                                                   self.args.aggregation_batch_size)
+        if not records:
+            return False
+        if self.timed('aggregation', self.aggregation.lambda_handler, {'Records': records}) is not None:
+            self.stream_position += len(records)
+            self.stream_records += len(records)
+        return True
+
+    def notified(self, records):
+        for record in records:
+            key = self.jobs.get(json.loads(record['body'])['detail'].get('bda_invocation_id'))
+            if key:
+                self.mark(key, 'notified')
+
+    def run(self, claims):
+        args = self.args
+        workers = [(self.poll_uploads, ()) for _ in range(args.extraction_concurrency)]
+        workers += [(self.poll, ('validation', self.validation_queue, self.validation.lambda_handler, args.validation_batch_size))
+                    for _ in range(args.validation_concurrency)]
+        workers += [(self.poll, ('integration', self.integration_queue, self.integration.lambda_handler,
+                                 args.integration_batch_size, self.notified))]
+        workers += [(self.poll_stream, ())]
+        if args.max_jobs_in_flight:
+            workers += [(self.admission_schedule, ())]
+
+        start = self.now()
+        with ThreadPoolExecutor(max_workers=len(workers) + 1) as executor:
+            for target, target_args in workers:
+                executor.submit(target, *target_args)
+            rng = random.Random(args.seed)
+            junk_contents = set()
+            upload_contents = []
+            for index in range(claims):
+                # A re-upload repeats the bytes of an earlier document under a new key
+                duplicate = index and rng.random() < args.duplicate_ratio
+                content_index = upload_contents[rng.randrange(index)] if duplicate else index
+                upload_contents.append(content_index)
+                if not duplicate and args.junk_ratio and rng.random() < args.junk_ratio:
+                    junk_contents.add(index)
+                self.upload(index, content_index, content_index in junk_contents)
+                if args.upload_rate:
+                    time.sleep(1 / args.upload_rate)
+            finished = self.done.wait(args.timeout) or self.expected == 0
+            self.done.set()
+        elapsed = self.now() - start
+        # Records written after the last poll
+        while self.aggregate_stream():
+            pass
+        return elapsed, finished
+
+    def aggregates(self):
+        """
+        Totals of the "all" aggregates next to the same counts taken from the claims table
+        """
+        tables = self.aws['dynamodb'].tables
+        totals = defaultdict(Decimal)
+        for key, item in tables.get(os.environ['AGGREGATES_TABLE_NAME'], {}).items():
+            if item['dimension']['S'] == 'all':
+                for name, value in item.items():
+                    if 'N' in value and name != 'expiresAt':
+                        totals[name] += Decimal(value['N'])
+        claims = list(tables.get(os.environ['BDA_TABLE_NAME'], {}).values())
+        expected = {
+            'claims': len(claims),
+            'decided': sum(1 for claim in claims if 'decision' in claim),
+            'amount': sum(Decimal(claim['amount']['N']) for claim in claims if 'decision' in claim and 'amount' in claim)
+        }
+        return totals, expected
+
+
+def print_aggregates(pipeline):
+    totals, expected = pipeline.aggregates()
+    print(f"{'aggregates:':<34}{pipeline.stream_records} stream records in {len(pipeline.durations['aggregation'])} "
+          f"invocations, {pipeline.aws['dynamodb'].calls['TransactWriteItems']} transactions")
+    for name, value in expected.items():
+        print(f"{'  ' + name + ':':<34}{totals.get(name, 0)} aggregated, {value} in the claims table")
+    decided = totals.get('decided')
+    if decided:
+        decisions = ', '.join(f"{name.split('#', 1)[1]} {totals[name] / decided:.0%}"
+                              for name in sorted(totals) if name.startswith('decision#'))
+        print(f"{'  decisions:':<34}{decisions}")
+        triage = ', '.join(f"{name.split('#', 1)[1]} {totals[name]}" for name in sorted(totals) if name.startswith('triage#'))
+        if triage:
+            print(f"{'  triage:':<34}{triage}")
+        for stage in ('submission', 'processing', 'total'):
+            if totals.get(f"latency#{stage}#sum"):
+                print(f"{'  ' + stage + ' latency mean:':<34}{totals[f'latency#{stage}#sum'] / decided:.0f} ms")
+
+
+def print_trace(pipeline):
+    for key, claim in sorted(pipeline.claims.items(), key=lambda item: item[1]['uploaded']):
+        steps = [f"{name} +{(claim[name] - claim['uploaded']) * 1000:.0f} ms" for name in TIMESTAMPS[1:] if name in claim]
+        print(f"{key}: {', '.join(steps) or 'linked to an earlier upload'}")
+    for entry in pipeline.aws['sns'].messages:
+        print(f"SNS: {entry.get('Subject')}: {entry.get('Message')[:300]}")
+    print()
+    print_aggregates(pipeline)
+    print()
+    # The BDA invocation id ties the spans of one claim together across the three functions
+    by_correlation_id = defaultdict(list)
+    for record in pipeline.spans:
+        if record['correlationId']:
+            by_correlation_id[record['correlationId']].append(record)
+    for correlation_id, records in by_correlation_id.items():
+        steps = [f"{record['service']}.{record['span']} {record['durationMs']:.0f} ms" for record in records]
+        print(f"{correlation_id}: {', '.join(steps)}")
+
+
+def print_report(pipeline, elapsed, finished):
+    completed = [claim for claim in pipeline.claims.values() if 'notified' in claim]
+    linked = sum(1 for claim in pipeline.claims.values() if 'extracted' not in claim)
+    print(f"claims completed:   {len(completed)} of {len(pipeline.claims)} uploads, "
+          f"{linked} linked to earlier uploads{'' if finished else ' (timed out)'}")
+    print(f"elapsed:            {elapsed:.2f} s")
+    print(f"throughput:         {len(completed) / elapsed:.1f} claims/s")
+    print()
+    print(f"{'stage':<12} {'claim p50 ms':>13} {'claim p99 ms':>13} {'invocations':>12} {'handler p50 ms':>15} {'handler p99 ms':>15}")
+    for stage, (begin, end) in zip(STAGES, zip(TIMESTAMPS, TIMESTAMPS[1:])):
+        latencies = [(claim[end] - claim[begin]) * 1000 for claim in completed]
+        durations = [duration * 1000 for duration in pipeline.durations[stage]]
+        print(f"{stage:<12} {percentile(latencies, 0.5):>13.1f} {percentile(latencies, 0.99):>13.1f} "
+              f"{len(durations):>12} {percentile(durations, 0.5):>15.1f} {percentile(durations, 0.99):>15.1f}")
+    end_to_end = [(claim['notified'] - claim['uploaded']) * 1000 for claim in completed]
+    print(f"{'end to end':<12} {percentile(end_to_end, 0.5):>13.1f} {percentile(end_to_end, 0.99):>13.1f}")
+    claim_latencies = [value for document in pipeline.metric_documents
+                       for value in document.get('ClaimLatency', [])]
+    print(f"{'claim latency':<12} {percentile(claim_latencies, 0.5):>13.1f} {percentile(claim_latencies, 0.99):>13.1f}"
+          f"   (ClaimLatency metric, upload to decision)")
+    print()
+    print(f"{'span':<34} {'calls':>8} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    spans = defaultdict(list)
+    for record in pipeline.spans:
+        spans[f"{record['service']}.{record['span']}"].append(record)
+    for name, records in sorted(spans.items()):
+        durations = [record['durationMs'] for record in records]
+        errors = sum(1 for record in records if record['outcome'] == 'error')
+        print(f"{name:<34} {len(records):>8} {percentile(durations, 0.5):>9.1f} {percentile(durations, 0.99):>9.1f} {errors:>7}")
+    print()
+    for service_name, client in pipeline.aws.clients.items():
+        calls = ', '.join(f"{name} {count}" for name, count in sorted(client.calls.items()))
+        print(f"{service_name + ':':<34}{calls}")
+    bda = pipeline.aws['bedrock-data-automation-runtime']
+    admission = {name: sum(sum(document.get(name, [])) for document in pipeline.metric_documents)
+                 for name in ('DocumentsQueued', 'DocumentsAdmitted')}
+    print(f"{'bda jobs:':<34}peak {bda.peak_running} running{f' of {bda.max_jobs}' if bda.max_jobs else ''}, "
+          f"{bda.calls['JobLimitExceeded']} refused, {admission['DocumentsQueued']} queued, "
+          f"{admission['DocumentsAdmitted']} admitted from the backlog")
+    print(f"{'redeliveries:':<34}upload {pipeline.upload_queue.redeliveries}, "
+          f"validation {pipeline.validation_queue.redeliveries}, integration {pipeline.integration_queue.redeliveries}")
+    print(f"{'dead letters:':<34}validation {len(pipeline.validation_queue.dead_letters)}, "
+          f"integration {len(pipeline.integration_queue.dead_letters)}")
+    print_aggregates(pipeline)
+
+
+def parse_service_options(values, cast):
+    options = {}
+    for value in values or []:
+        service_name, _, setting = value.partition('=')
+        options[service_name] = cast(setting)
+    return options
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local end-to-end simulation of the claim pipeline')
+    parser.add_argument('--benchmark', action='store_true', help='Report latency percentiles and throughput')
+    parser.add_argument('--claims', type=int, default=None, help='Claims to upload (default 2, or 500 with --benchmark)')
+    parser.add_argument('--upload-rate', type=float, default=0, help='Uploads per second (default: one burst)')
+    parser.add_argument('--duplicate-ratio', type=float, default=0.0, help='Share of uploads that repeat earlier content')
+    parser.add_argument('--junk-ratio', type=float, default=0.0,
+                        help='Share of uploads that are blank pages, rejected at triage')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--bda-latency-ms', type=int, default=500)
+    parser.add_argument('--latency', action='append', metavar='SERVICE=MS',
+                        help='Latency per call, e.g. bedrock-runtime=200 (repeatable)')
+    parser.add_argument('--throttle', action='append', metavar='SERVICE=PROBABILITY',
+                        help='Share of calls answered with ThrottlingException, e.g. dynamodb=0.01 (repeatable)')
+    parser.add_argument('--model-rpm', type=int, default=3000, help='Fake Bedrock model requests per minute quota')
+    parser.add_argument('--models', default='amazon.nova-lite-v1:0',
+                        help='ADJUDICATION_MODELS, e.g. amazon.nova-lite-v1:0@2,amazon.nova-micro-v1:0@2')
+    parser.add_argument('--hedge-after-ms', type=int, default=3000, help='HEDGE_AFTER_MS, 0 disables hedging')
+    parser.add_argument('--model-slow-probability', type=float, default=0.0,
+                        help='Share of model calls that take --model-slow-latency-ms')
+    parser.add_argument('--model-slow-latency-ms', type=int, default=1000)
+    parser.add_argument('--bda-rpm', type=int, default=6000, help='Fake BDA submissions per minute quota')
+    parser.add_argument('--bda-max-jobs', type=int, default=0, help='Fake BDA concurrent job limit, 0 for none')
+    parser.add_argument('--max-jobs-in-flight', type=int, default=0,
+                        help='MAX_BDA_JOBS_IN_FLIGHT of the admission control, 0 disables it')
+    parser.add_argument('--admission-interval', type=float, default=1.0,
+                        help='Seconds between runs of the admission schedule, scaled down')
+    parser.add_argument('--extraction-concurrency', type=int, default=8)
+    parser.add_argument('--validation-concurrency', type=int, default=2)
+    parser.add_argument('--validation-batch-size', type=int, default=10)
+    parser.add_argument('--integration-batch-size', type=int, default=50)
+    parser.add_argument('--aggregation-batch-size', type=int, default=1000)
+    parser.add_argument('--aggregation-window', type=float, default=0.5,
+                        help='Seconds between polls of an empty stream, scaled down')
+    parser.add_argument('--visibility-timeout', type=float, default=2.0, help='Seconds, scaled down')
+    parser.add_argument('--max-receive', type=int, default=5)
+    parser.add_argument('--timeout', type=float, default=300, help='Give up after this many seconds')
+    args = parser.parse_args()
+    claims = args.claims or (500 if args.benchmark else 2)
+
+    os.environ.update({
+        'AWS_DEFAULT_REGION': 'us-east-1',
+        'BDA_TABLE_NAME': 'benefit-claims-simulator',
+        'DEDUP_TABLE_NAME': 'benefit-claim-dedup-simulator',
+        'DECISION_CACHE_TABLE_NAME': 'benefit-claim-decision-cache-simulator',
+        'AGGREGATES_TABLE_NAME': 'benefit-claim-aggregates-simulator',
+        'EXTRACTION_BUCKET_NAME': EXTRACTION_BUCKET,
+        'BDA_PROJECT_ARN': 'arn:aws:bedrock:us-east-1:123456789012:data-automation-project/simulator',
+        'BDA_PROFILE_ARN': 'arn:aws:bedrock:us-east-1:123456789012:data-automation-profile/us.data-automation-v1',
+        'MAX_BDA_JOBS_IN_FLIGHT': str(args.max_jobs_in_flight),
+        'KNOWLEDGE_BASE_ID': 'simulator',
+        'KNOWLEDGE_BASE_MODEL_ID': 'amazon.nova-lite-v1:0',
+        'ADJUDICATION_MODELS': args.models,
+        'HEDGE_AFTER_MS': str(args.hedge_after_ms),
+        # The sample BDA result (a diploma) stands in for a claim document
+        'TRIAGE_CLAIM_BLUEPRINTS': 'engineering_diploma_v4_manual_prompt,Receipt',
+        'NOTIFICATION_TOPIC_ARN': 'arn:aws:sns:us-east-1:123456789012:benefit-claim-notification-topic-simulator',
+        'MODEL_REQUESTS_PER_MINUTE': str(args.model_rpm),
+        # All validation pollers share this process and therefore one token bucket
+        'VALIDATION_MAX_CONCURRENCY': '1'
+    })
+    if args.max_jobs_in_flight:
+        os.environ['ADMISSION_TABLE_NAME'] = 'benefit-claim-bda-admission-simulator'
+
+    aws = FakeAWS(
+        model_requests_per_minute=args.model_rpm,
+        bda_requests_per_minute=args.bda_rpm,
+        bda_max_jobs=args.bda_max_jobs or None,
+        latency_ms=dict({'s3': 5, 'dynamodb': 5, 'bedrock-agent-runtime': 30, 'bedrock-runtime': 40,
+                         'bedrock-data-automation-runtime': 20, 'events': 5, 'sns': 5},
+                        **parse_service_options(args.latency, int)),
+        throttle=parse_service_options(args.throttle, float),
+        model_slow_probability=args.model_slow_probability,
+        model_slow_latency_ms=args.model_slow_latency_ms,
+        dynamodb_stream_tables=['benefit-claims-simulator']
+    ).install()
+    if not args.benchmark:
+        logging.basicConfig(level=logging.WARNING, format='%(levelname)s %(message)s')
+    pipeline = Pipeline(aws, args)
+    logging.getLogger().setLevel(logging.WARNING)
+    if args.benchmark:
+        logging.disable(logging.CRITICAL)
+
+    elapsed, finished = pipeline.run(claims)
+    if args.benchmark:
+        print_report(pipeline, elapsed, finished)
+    else:
+        print_trace(pipeline)
+    if not finished:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
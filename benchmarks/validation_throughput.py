@@ -0,0 +1,192 @@
+"""
+MIT No Attribution
+
+Copyright 2025 Amazon Web Services
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+
+Replays a burst of BDA completion events through the validation lambda
+against fake S3 and Bedrock endpoints (benchmarks/fakes.py) and reports the
+sustained throughput.
+
+Two modes are compared:
+  direct  - every event invokes the handler at once, as the EventBridge rule
+            used to, without the token bucket.
+  queued  - events sit in an in-memory SQS queue drained by --concurrency
+            pollers in batches, with partial batch responses, visibility
+            timeout redelivery and a dead-letter queue after --max-receive.
+
+All pollers share one process, so the token bucket is sized to the whole
+model quota (VALIDATION_MAX_CONCURRENCY=1).
+
+Usage:
+    python benchmarks/validation_throughput.py --events 2000 --model-rpm 3000 --model-latency-ms 40
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'infrastructure', 'validation'))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'infrastructure', 'shared'))
+
+from fakes import FakeAWS, FakeQueue  # noqa: E402
+
+OUTPUT_BUCKET = 'benefit-claim-extraction-bucket-benchmark'
+
+
+def receipt_result(index):
+    """
+    A receipt the deterministic rules cannot decide, so every claim needs a model call.
+    The amount is unique per claim so that the decision cache never hits.
+    """
+    return {
+        'matched_blueprint': {'name': 'benefit-claims-pharmacy-receipt-blueprint', 'confidence': 1},
+        'inference_result': {
+            'Total': f"{60 + index / 100:.2f}",
+            'ReceiptDate': '01/15/2025',
+            'LineItems': [{'Product': 'Bandages', 'Amount': f"{60 + index / 100:.2f}"}]
+        },
+        'explainability_info': [{
+            'Total': {'confidence': 0.97, 'success': True},
+            'ReceiptDate': {'confidence': 0.95, 'success': True},
+            'LineItems': [{'Product': {'confidence': 0.93, 'success': True},
+                           'Amount': {'confidence': 0.96, 'success': True}}]
+        }]
+    }
+
+
+def make_events(aws, count):
+    events = []
+    for index in range(count):
+        job_id = f"job-{index}"
+        output_path = f"output/{job_id}/0"
+        result_key = f"{output_path}/custom_output/0/result.json"
+        aws['s3'].objects[(OUTPUT_BUCKET, result_key)] = json.dumps(receipt_result(index)).encode('utf-8')
+        aws['s3'].objects[(OUTPUT_BUCKET, f"output/{job_id}/job_metadata.json")] = json.dumps({
+            'output_metadata': [{'asset_id': 0, 'segment_metadata': [
+                {'custom_output_status': 'MATCH', 'custom_output_path': f"s3://{OUTPUT_BUCKET}/{result_key}"}
+            ]}]
+        }).encode('utf-8')
+        events.append({
+            'source': 'aws.bedrock',
+            'detail-type': 'Bedrock Data Automation Job Succeeded',
+            'detail': {
+                'job_id': job_id,
+                'job_status': 'SUCCESS',
+                'input_s3_object': {'s3_bucket': 'benefit-claim-ingestion-bucket-benchmark', 'name': f"claim-{index}.png"},
+                'output_s3_location': {'s3_bucket': OUTPUT_BUCKET, 'name': output_path}
+            }
+        })
+    return events
+
+
+def run_queued(app, events, args):
+    queue = FakeQueue(args.visibility_timeout, args.max_receive)
+    for event in events:
+        queue.send(json.dumps(event))
+
+    def poll():
+        while not queue.empty():
+            records = queue.receive(args.batch_size)
+            if not records:
+                time.sleep(0.01)
+                continue
+            response = app.lambda_handler({'Records': records}, None)
+            failed = {failure['itemIdentifier'] for failure in response['batchItemFailures']}
+            queue.delete([record['messageId'] for record in records if record['messageId'] not in failed])
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for _ in range(args.concurrency):
+            executor.submit(poll)
+    return {'redeliveries': queue.redeliveries, 'dead letters': len(queue.dead_letters)}
+
+
+def run_direct(app, events, args):
+    failed = 0
+    with ThreadPoolExecutor(max_workers=args.direct_concurrency) as executor:
+        futures = [executor.submit(app.lambda_handler, event, None) for event in events]
+        for future in futures:
+            try:
+                future.result()
+            except app.ClaimThrottledError:
+                failed += 1
+    return {'throttled claims': failed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sustained throughput of the validation lambda')
+    parser.add_argument('--events', type=int, default=2000)
+    parser.add_argument('--mode', choices=['queued', 'direct'], default='queued')
+    parser.add_argument('--model-rpm', type=int, default=3000, help='Fake Bedrock requests per minute quota')
+    parser.add_argument('--model-latency-ms', type=int, default=40)
+    parser.add_argument('--s3-latency-ms', type=int, default=5)
+    parser.add_argument('--concurrency', type=int, default=2, help='SQS event source maximum concurrency')
+    parser.add_argument('--batch-size', type=int, default=10)
+    parser.add_argument('--visibility-timeout', type=float, default=2.0, help='Seconds, scaled down from 720')
+    parser.add_argument('--max-receive', type=int, default=5)
+    parser.add_argument('--direct-concurrency', type=int, default=200, help='Concurrent direct invocations')
+    args = parser.parse_args()
+
+    os.environ.update({
+        'AWS_DEFAULT_REGION': 'us-east-1',
+        'BDA_TABLE_NAME': 'benefit-claims-benchmark',
+        'KNOWLEDGE_BASE_ID': 'benchmark',
+        'KNOWLEDGE_BASE_MODEL_ID': 'amazon.nova-lite-v1:0',
+        'MODEL_REQUESTS_PER_MINUTE': str(args.model_rpm),
+        'VALIDATION_MAX_CONCURRENCY': '1',
+        'RATE_LIMIT_BURST': '1'
+    })
+    os.environ.pop('DECISION_CACHE_TABLE_NAME', None)
+
+    aws = FakeAWS(model_requests_per_minute=args.model_rpm, model_latency_ms=args.model_latency_ms,
+                  s3_latency_ms=args.s3_latency_ms).install()
+    import app
+    import instrumentation
+    import rate_limiter
+    # Spans and metric documents would otherwise be printed for every claim
+    instrumentation.write = lambda document: None
+    logging.disable(logging.CRITICAL)
+
+    if args.mode == 'direct':
+        # The old direct invocation had no rate limiter in front of the model
+        rate_limiter.TokenBucket.acquire = lambda self, *a, **kw: None
+
+    events = make_events(aws, args.events)
+    start = time.perf_counter()
+    stats = run_direct(app, events, args) if args.mode == 'direct' else run_queued(app, events, args)
+    elapsed = time.perf_counter() - start
+
+    bedrock = aws['bedrock-runtime']
+    decided = sum(1 for entry in aws['events'].entries if json.loads(entry['Detail'])['validation_result'])
+    print(f"mode:               {args.mode}")
+    print(f"events:             {args.events}")
+    print(f"elapsed:            {elapsed:.1f} s")
+    print(f"decided claims:     {decided} ({decided / elapsed:.1f} claims/s)")
+    print(f"model calls:        {bedrock.calls['Converse']} "
+          f"(quota {args.model_rpm / 60:.1f}/s)")
+    print(f"model throttles:    {bedrock.calls['Throttled']}")
+    for name, value in stats.items():
+        print(f"{name + ':':<20}{value}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,20 +1,56 @@
+import os
+
 import streamlit as st
 import boto3
+from botocore.config import Config
+
+import claim_status
+import uploads
 
 st.set_page_config(page_title="benefit-claims")  # HTML title
 st.title("benefit-claims")  # page title
 
-bucket_name = "benefit-claim-ingestion-bucket-sdf123"
-s3 = boto3.client("s3")
+# benefit-claim-ingestion-bucket-<UniqueKey> and the claims table of the deployed stack
+bucket_name = os.environ.get("INGESTION_BUCKET_NAME", "benefit-claim-ingestion-bucket-sdf123")
+table_name = os.environ.get("BDA_TABLE_NAME")
+
+# Presigned URLs must be signed with SigV4 for the bucket's region
+s3 = boto3.client("s3", config=Config(signature_version="s3v4", max_pool_connections=uploads.UPLOAD_CONCURRENCY))
+dynamodb = boto3.client("dynamodb")
 
-uploaded_file = st.file_uploader("Choose a file", type=["jpg", "jpeg", "png"],label_visibility="collapsed")
-if uploaded_file is not None:
+uploaded_file = st.file_uploader("Choose a file", type=["pdf", "jpg", "jpeg", "png", "tif", "tiff"], label_visibility="collapsed")
+if uploaded_file is not None and uploaded_file.type.startswith("image/") and uploaded_file.type != "image/tiff":
     st.image(uploaded_file, caption="Uploaded Image", use_container_width=True)
 
-go_button = st.button("Analyze the file", type="primary")  # display a primary button
+go_button = st.button("Analyze the file", type="primary", disabled=uploaded_file is None)  # display a primary button
+
+
+if go_button:
+    progress = st.progress(0.0, text="Uploading")
+    key = uploads.Uploader(s3, bucket_name).upload(
+        uploaded_file,
+        uploaded_file.name,
+        uploaded_file.size,
+        on_progress=lambda sent, size: progress.progress(sent / size if size else 1.0, text=f"Uploading {sent // 1024:,} of {size // 1024:,} KB")
+    )
+    progress.progress(1.0, text="Uploaded")
 
+    if not table_name:
+        st.info("Set BDA_TABLE_NAME to follow the claim here; the decision is also sent by email.")
+    else:
+        with st.status("Waiting for the claim to be processed", expanded=True) as status:
+            def show(claim):
+                if claim is None:
+                    return
+                if claim["decision"]:
+                    st.write(f"Decision: **{claim['decision']}**")
+                    if claim["reason"]:
+                        st.write(claim["reason"])
+                else:
+                    st.write(f"Status: {claim['status']}")
 
-if go_button: 
-    doc_bytes = uploaded_file.getvalue()
-    s3.put_object(Body=doc_bytes, Bucket=bucket_name, Key=uploaded_file.name)
-    
+            claim = claim_status.wait_for_decision(dynamodb, table_name, key, on_update=show)
+            if claim and claim["decision"]:
+                status.update(label=f"Claim {claim['decision']}", state="complete")
+            else:
+                status.update(label="No decision yet; it will be sent by email", state="error")
@@ -0,0 +1,95 @@
+"""
+MIT No Attribution
+
+Copyright 2025 Amazon Web Services
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+
+Progress of an uploaded claim, read from the claims table.
+
+The item of a claim is found by its object key on the FileNameIndex of the
+table. It appears once the extraction Lambda has started the BDA job and gets
+its decision from the validation Lambda; wait_for_decision polls with
+exponential backoff between POLL_INITIAL_SECONDS and POLL_MAX_SECONDS.
+"""
+
+import json
+import os
+import random
+import time
+
+FILE_NAME_INDEX = 'FileNameIndex'
+
+POLL_INITIAL_SECONDS = float(os.environ.get('POLL_INITIAL_SECONDS', '2'))
+POLL_MAX_SECONDS = float(os.environ.get('POLL_MAX_SECONDS', '30'))
+POLL_TIMEOUT_SECONDS = float(os.environ.get('POLL_TIMEOUT_SECONDS', '900'))
+
+
+def get_claim(dynamodb, table_name, key):
+    """
+    Status, decision and reason of the newest claim for the object key, or None before it is recorded
+    """
+    response = dynamodb.query(
+        TableName=table_name,
+        IndexName=FILE_NAME_INDEX,
+        KeyConditionExpression='#fileName = :fileName',
+        ExpressionAttributeNames={'#fileName': 'fileName'},
+        ExpressionAttributeValues={':fileName': {'S': key}},
+        ScanIndexForward=False,
+        Limit=1
+    )
+    items = response.get('Items', [])
+    if not items:
+        return None
+
+    item = items[0]
+    claim = {
+        'status': item.get('status', {}).get('S'),
+        'decision': item.get('decision', {}).get('S'),
+        'reason': None
+    }
+    validation_result = item.get('validationResult', {}).get('S')
+    if validation_result:
+        try:
+            claim['reason'] = json.loads(validation_result).get('reason')
+        except (ValueError, AttributeError):
+            claim['reason'] = validation_result
+    return claim
+
+
+def wait_for_decision(dynamodb, table_name, key, on_update=None, timeout=POLL_TIMEOUT_SECONDS):
+    """
+    Poll until the claim has a decision or timeout seconds have passed. on_update(claim) is
+    called whenever the claim changes. Returns the last claim read, None if it never appeared.
+    """
+    deadline = time.monotonic() + timeout
+    delay = POLL_INITIAL_SECONDS
+    claim = None
+    while True:
+        current = get_claim(dynamodb, table_name, key)
+        if current != claim:
+            claim = current
+            # A change means the claim is moving; look again soon
+            delay = POLL_INITIAL_SECONDS
+            if on_update:
+                on_update(claim)
+        if claim and claim['decision']:
+            return claim
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return claim
+        time.sleep(min(remaining, random.uniform(delay / 2, delay)))
+        delay = min(POLL_MAX_SECONDS, delay * 2)
@@ -0,0 +1,253 @@
+"""
+MIT No Attribution
+
+Copyright 2025 Amazon Web Services
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+
+Uploads of claim documents to the ingestion bucket through presigned URLs.
+
+Files below MULTIPART_THRESHOLD_MB go up in one presigned PUT. Larger files
+use a multipart upload: every part is sent to its own presigned UploadPart
+URL, UPLOAD_CONCURRENCY parts at a time, and only those parts are held in
+memory. The upload id is kept in UPLOAD_STATE_DIR until the upload completes,
+so an interrupted upload of the same file resumes with the parts S3 does not
+have yet (ListParts). Incomplete uploads are removed by the bucket lifecycle
+rule.
+
+The object key is derived from the content, so the same file always gets
+the same key and its claim can be found again in the claims table.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+# Not configurable: the ETag of an upload depends on whether it was sent in parts and on
+# the part size, and the extraction dedup (infrastructure/extraction/dedup.py) keys on it
+MULTIPART_THRESHOLD_MB = 16
+PART_SIZE_MB = 8
+UPLOAD_CONCURRENCY = int(os.environ.get('UPLOAD_CONCURRENCY', '4'))
+UPLOAD_STATE_DIR = os.environ.get('UPLOAD_STATE_DIR', os.path.join(os.path.expanduser('~'), '.benefit-claims', 'uploads'))
+PRESIGNED_URL_EXPIRY_SECONDS = 3600
+PART_MAX_ATTEMPTS = 4
+
+# S3 limits
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PARTS = 10000
+
+HASH_CHUNK_SIZE = 1024 * 1024
+KEY_PREFIX = 'uploads'
+
+CONTENT_TYPES = {
+    '.pdf': 'application/pdf',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.tif': 'image/tiff',
+    '.tiff': 'image/tiff'
+}
+
+
+def content_digest(fileobj):
+    """
+    SHA-256 of the file, read in chunks
+    """
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def object_key(file_name, digest):
+    """
+    uploads/<content digest>/<file name>, with only URL-safe characters so that the key
+    in S3 notifications is the key itself
+    """
+    safe_name = re.sub(r'[^A-Za-z0-9._-]+', '-', os.path.basename(file_name)).strip('-') or 'document'
+    return f"{KEY_PREFIX}/{digest[:32]}/{safe_name}"
+
+
+def part_size_for(size):
+    return max(PART_SIZE_MB * 1024 * 1024, MIN_PART_SIZE, math.ceil(size / MAX_PARTS))
+
+
+def http_put(url, body, content_type=None):
+    """
+    PUT body to a presigned URL with retries. Returns the ETag of the stored object or part.
+    """
+    headers = {'Content-Type': content_type} if content_type else {}
+    attempt = 0
+    while True:
+        attempt += 1
+        request = urllib.request.Request(url, data=body, method='PUT', headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=120) as response:
+                return response.headers['ETag']
+        except (urllib.error.URLError, TimeoutError) as e:
+            retryable = not isinstance(e, urllib.error.HTTPError) or e.code >= 500 or e.code == 429
+            if not retryable or attempt >= PART_MAX_ATTEMPTS:
+                raise
+            delay = random.uniform(0, 0.5 * (2 ** attempt))
+            logger.warning(f"PUT failed ({e}), retrying in {delay:.1f}s (attempt {attempt})")
+            time.sleep(delay)
+
+
+class UploadState:
+    """
+    Multipart upload id of a file, stored under UPLOAD_STATE_DIR by content digest
+    """
+
+    def __init__(self, digest):
+        self.path = os.path.join(UPLOAD_STATE_DIR, f"{digest}.json")
+
+    def load(self):
+        try:
+            with open(self.path) as state_file:
+                return json.load(state_file)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, state):
+        os.makedirs(UPLOAD_STATE_DIR, exist_ok=True)
+        with open(self.path, 'w') as state_file:
+            json.dump(state, state_file)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class Uploader:
+    def __init__(self, s3, bucket):
+        self.s3 = s3
+        self.bucket = bucket
+
+    def upload(self, fileobj, file_name, size, on_progress=None):
+        """
+        Upload the file and return its object key. on_progress(sent_bytes, size) is called as parts complete.
+        """
+        digest = content_digest(fileobj)
+        key = object_key(file_name, digest)
+        content_type = CONTENT_TYPES.get(os.path.splitext(file_name)[1].lower(), 'application/octet-stream')
+
+        if size < MULTIPART_THRESHOLD_MB * 1024 * 1024:
+            url = self.s3.generate_presigned_url(
+                'put_object',
+                Params={'Bucket': self.bucket, 'Key': key, 'ContentType': content_type},
+                ExpiresIn=PRESIGNED_URL_EXPIRY_SECONDS
+            )
+            fileobj.seek(0)
+            http_put(url, fileobj.read(), content_type)
+            if on_progress:
+                on_progress(size, size)
+            return key
+
+        self.upload_multipart(fileobj, key, size, content_type, UploadState(digest), on_progress)
+        return key
+
+    def upload_multipart(self, fileobj, key, size, content_type, state, on_progress):
+        upload = state.load()
+        uploaded = self.uploaded_parts(upload, key)
+        if uploaded is None:
+            part_size = part_size_for(size)
+            response = self.s3.create_multipart_upload(Bucket=self.bucket, Key=key, ContentType=content_type)
+            upload = {'key': key, 'uploadId': response['UploadId'], 'partSize': part_size}
+            state.save(upload)
+            uploaded = {}
+        else:
+            logger.info(f"Resuming upload of {key} with {len(uploaded)} part(s) already in S3")
+
+        part_size = upload['partSize']
+        part_count = max(1, math.ceil(size / part_size))
+        etags = dict(uploaded)
+        sent = sum(min(part_size, size - (number - 1) * part_size) for number in uploaded)
+        if on_progress:
+            on_progress(sent, size)
+
+        read_lock = threading.Lock()
+        progress_lock = threading.Lock()
+
+        def upload_part(number):
+            nonlocal sent
+            # Parts are read when they are sent, so at most UPLOAD_CONCURRENCY parts are in memory
+            with read_lock:
+                fileobj.seek((number - 1) * part_size)
+                body = fileobj.read(part_size)
+            url = self.s3.generate_presigned_url(
+                'upload_part',
+                Params={'Bucket': self.bucket, 'Key': key, 'UploadId': upload['uploadId'], 'PartNumber': number},
+                ExpiresIn=PRESIGNED_URL_EXPIRY_SECONDS
+            )
+            etag = http_put(url, body)
+            with progress_lock:
+                sent += len(body)
+                if on_progress:
+                    on_progress(sent, size)
+            return number, etag
+
+        missing = [number for number in range(1, part_count + 1) if number not in etags]
+        with ThreadPoolExecutor(max_workers=max(1, min(UPLOAD_CONCURRENCY, len(missing)))) as executor:
+            for future in as_completed([executor.submit(upload_part, number) for number in missing]):
+                number, etag = future.result()
+                etags[number] = etag
+
+        self.s3.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=key,
+            UploadId=upload['uploadId'],
+            MultipartUpload={'Parts': [{'PartNumber': number, 'ETag': etags[number]} for number in sorted(etags)]}
+        )
+        state.clear()
+        logger.info(f"Uploaded {key} in {part_count} part(s)")
+
+    def uploaded_parts(self, upload, key):
+        """
+        {part number: ETag} of the parts S3 already has for a saved upload,
+        or None when there is no upload to resume
+        """
+        if not upload or upload.get('key') != key:
+            return None
+        parts = {}
+        request = {'Bucket': self.bucket, 'Key': key, 'UploadId': upload['uploadId']}
+        try:
+            while True:
+                response = self.s3.list_parts(**request)
+                for part in response.get('Parts', []):
+                    parts[part['PartNumber']] = part['ETag']
+                if not response.get('IsTruncated'):
+                    return parts
+                request['PartNumberMarker'] = response['NextPartNumberMarker']
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') == 'NoSuchUpload':
+                return None
+            raise
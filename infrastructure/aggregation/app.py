@@ -0,0 +1,309 @@
+"""
+MIT No Attribution
+
+Copyright 2024 Amazon Web Services
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+
+Hourly claim aggregates maintained from the stream of the claims table.
+
+Every stream record changes the aggregates by the contribution of its new
+image minus the contribution of its old image, so a claim moves between the
+status, decision and blueprint counters as it progresses, and a claim decided
+again by readjudication is only counted once. The changes of a batch are
+coalesced per aggregate item and written with one ADD update per item, so a
+batch of hundreds of records costs a handful of writes.
+
+Aggregate items are keyed by dimension ("all" or "blueprint#<name>") and the
+UTC hour the claim was created in (e.g. 2025-06-01T14), so a day of one
+dimension is a single Query. Claims are counted under their blueprint once
+they have been validated. Attributes:
+
+    claims                         claims created in the hour
+    status#<status>                claims by BDA job status
+    decided, decision#<decision>   decided claims, by decision
+    triage#<result>                validated claims, by triage result (accepted or rejected)
+    amount, amount#<decision>      sum of the decided claim amounts, by decision
+    latency#<stage>#le<ms>         claims per latency bucket (LATENCY_BUCKETS_MS, then inf)
+    latency#<stage>#sum            sum of the stage latencies in milliseconds
+
+The approval rate of an hour is decision#approved / decided. The stages are
+submission (upload to BDA submission), processing (BDA job and validation,
+up to the first decision) and total (upload to first decision).
+
+Lambda retries a failed batch from its first record. Each aggregate update is
+written in a transaction with a marker item, keyed by that first record and
+the aggregate, holding the last record applied; a retry only applies the
+records after it.
+"""
+
+import logging
+import os
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from botocore.exceptions import ClientError
+
+import clients
+import instrumentation
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+AGGREGATES_TABLE_NAME = os.environ.get('AGGREGATES_TABLE_NAME')
+
+ALL_DIMENSION = 'all'
+LATENCY_BUCKETS_MS = [1000, 5000, 15000, 30000, 60000, 120000, 300000, 900000]
+# (stage, start attribute, end attribute) of the claim item
+LATENCY_STAGES = [
+    ('submission', 'uploadedAt', 'createdAt'),
+    ('processing', 'createdAt', 'decidedAt'),
+    ('total', 'uploadedAt', 'decidedAt')
+]
+
+# Markers only matter while Lambda can still retry a batch; stream records are kept for 24 hours
+MARKER_TTL_SECONDS = 2 * 86400
+MARKER_PREFIX = 'applied#'
+# TransactWriteItems accepts 100 items: one update and one marker per aggregate
+TRANSACTION_MAX_AGGREGATES = 50
+MAX_TRANSACTION_ATTEMPTS = int(os.environ.get('MAX_TRANSACTION_ATTEMPTS', '5'))
+BACKOFF_BASE_SECONDS = 0.05
+# Batches of other shards update the same aggregates at the same time
+RETRYABLE_CANCELLATION_CODES = {'TransactionConflict', 'ThrottlingError', 'ProvisionedThroughputExceeded'}
+# Stream sequence numbers are decimal strings of varying length; padded they compare as strings
+SEQUENCE_WIDTH = 40
+
+
+@instrumentation.handler('aggregation')
+def lambda_handler(event, context):
+    records = event.get('Records', [])
+    if not records:
+        return {'records': 0, 'aggregates': 0}
+
+    first_sequence = sequence_number(records[0])
+    pending = coalesce(records)
+    logger.info(f"{len(records)} stream record(s) change {len(pending)} aggregate(s)")
+
+    keys = sorted(pending)
+    for start in range(0, len(keys), TRANSACTION_MAX_AGGREGATES):
+        chunk = {key: pending[key] for key in keys[start:start + TRANSACTION_MAX_AGGREGATES]}
+        with instrumentation.span('TransactWriteItems', aggregates=len(chunk)):
+            apply_changes(first_sequence, chunk)
+
+    instrumentation.put_metric('StreamRecords', len(records))
+    instrumentation.put_metric('AggregateUpdates', len(pending))
+    # A raised error fails the whole batch, which Lambda retries from the same first record
+    return {'records': len(records), 'aggregates': len(pending)}
+
+
+def sequence_number(record):
+    return record['dynamodb']['SequenceNumber'].zfill(SEQUENCE_WIDTH)
+
+
+def attribute(image, name):
+    value = image.get(name)
+    if not value:
+        return None
+    if 'N' in value:
+        return Decimal(value['N'])
+    return value.get('S')
+
+
+def parse_time(value):
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def contributions(image):
+    """
+    {(dimension, hour): {attribute: value}} that one claim item adds to the aggregates
+    """
+    created_at = parse_time(attribute(image, 'createdAt'))
+    if not image or created_at is None:
+        return {}
+
+    counters = {'claims': Decimal(1)}
+    status = attribute(image, 'status')
+    if status:
+        counters[f"status#{status}"] = Decimal(1)
+    decision = attribute(image, 'decision')
+    if decision:
+        counters['decided'] = Decimal(1)
+        counters[f"decision#{decision}"] = Decimal(1)
+        amount = attribute(image, 'amount')
+        if isinstance(amount, Decimal):
+            counters['amount'] = amount
+            counters[f"amount#{decision}"] = amount
+
+    triage_result = image.get('triage', {}).get('M', {}).get('result', {}).get('S')
+    if triage_result:
+        counters[f"triage#{triage_result}"] = Decimal(1)
+
+    for stage, start_name, end_name in LATENCY_STAGES:
+        start, end = parse_time(attribute(image, start_name)), parse_time(attribute(image, end_name))
+        if start is None or end is None:
+            continue
+        latency_ms = max(0, round((end - start).total_seconds() * 1000))
+        bucket = next((f"le{bound}" for bound in LATENCY_BUCKETS_MS if latency_ms <= bound), 'leinf')
+        counters[f"latency#{stage}#{bucket}"] = Decimal(1)
+        counters[f"latency#{stage}#sum"] = Decimal(latency_ms)
+
+    hour = created_at.astimezone(timezone.utc).strftime('%Y-%m-%dT%H')
+    dimensions = [ALL_DIMENSION]
+    blue_print_name = attribute(image, 'bluePrintName')
+    if blue_print_name:
+        dimensions.append(f"blueprint#{blue_print_name}")
+    return {(dimension, hour): counters for dimension in dimensions}
+
+
+def record_changes(record):
+    """
+    {(dimension, hour): {attribute: delta}} of one stream record, without zero deltas
+    """
+    images = record.get('dynamodb', {})
+    changes = defaultdict(lambda: defaultdict(Decimal))
+    for key, counters in contributions(images.get('NewImage', {})).items():
+        for name, value in counters.items():
+            changes[key][name] += value
+    for key, counters in contributions(images.get('OldImage', {})).items():
+        for name, value in counters.items():
+            changes[key][name] -= value
+
+    return {
+        key: {name: delta for name, delta in deltas.items() if delta}
+        for key, deltas in changes.items()
+        if any(deltas.values())
+    }
+
+
+def coalesce(records):
+    """
+    {(dimension, hour): [(sequence number, {attribute: delta})]} in stream order
+    """
+    pending = defaultdict(list)
+    for record in records:
+        sequence = sequence_number(record)
+        for key, deltas in record_changes(record).items():
+            pending[key].append((sequence, deltas))
+    return pending
+
+
+def apply_changes(first_sequence, pending):
+    """
+    Add the changes to their aggregates in one transaction. A marker that already
+    exists means an earlier attempt of the batch applied the records up to the
+    sequence number it holds, so only the later records are applied again.
+    """
+    applied = {}
+    for attempt in range(1, MAX_TRANSACTION_ATTEMPTS + 1):
+        transact_items = []
+        keys = []
+        for key, entries in pending.items():
+            remaining = [deltas for sequence, deltas in entries if key not in applied or sequence > applied[key]]
+            if remaining:
+                transact_items.extend(transaction_items(first_sequence, key, entries[-1][0], remaining, applied.get(key)))
+                keys.append(key)
+        if not transact_items:
+            return
+
+        try:
+            clients.get_client('dynamodb').transact_write_items(TransactItems=transact_items)
+            return
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') != 'TransactionCanceledException':
+                raise
+            reasons = e.response.get('CancellationReasons', [])
+            conflicts = [(keys[index // 2], reason) for index, reason in enumerate(reasons)
+                         if index % 2 == 1 and reason.get('Code') == 'ConditionalCheckFailed']
+            retryable = any(reason.get('Code') in RETRYABLE_CANCELLATION_CODES for reason in reasons)
+            if not conflicts and not retryable:
+                raise
+            for key, reason in conflicts:
+                applied[key] = reason.get('Item', {}).get('lastSequence', {}).get('S') or read_marker(first_sequence, key)
+            if conflicts:
+                logger.info(f"{len(conflicts)} aggregate(s) already updated by an earlier attempt of the batch")
+            else:
+                delay = random.uniform(0, BACKOFF_BASE_SECONDS * (2 ** attempt))
+                logger.warning(f"Aggregate transaction cancelled ({e}), retrying in {delay:.2f}s (attempt {attempt})")
+                time.sleep(delay)
+
+    raise RuntimeError(f"Aggregates of the batch starting at {first_sequence} not updated after {MAX_TRANSACTION_ATTEMPTS} attempts")
+
+
+def marker_key(first_sequence, key):
+    dimension, hour = key
+    return {'dimension': {'S': f"{MARKER_PREFIX}{first_sequence}"}, 'hour': {'S': f"{dimension}#{hour}"}}
+
+
+def read_marker(first_sequence, key):
+    response = clients.get_client('dynamodb').get_item(
+        TableName=AGGREGATES_TABLE_NAME,
+        Key=marker_key(first_sequence, key),
+        ConsistentRead=True
+    )
+    return response.get('Item', {}).get('lastSequence', {}).get('S')
+
+
+def transaction_items(first_sequence, key, last_sequence, changes, applied_sequence):
+    """
+    The ADD update of one aggregate and the put of its marker
+    """
+    totals = defaultdict(Decimal)
+    for deltas in changes:
+        for name, delta in deltas.items():
+            totals[name] += delta
+    totals = {name: total for name, total in totals.items() if total}
+
+    dimension, hour = key
+    names = {'#updatedAt': 'updatedAt'}
+    values = {':now': {'S': datetime.now(timezone.utc).isoformat()}}
+    additions = []
+    for index, (name, total) in enumerate(sorted(totals.items())):
+        names[f"#a{index}"] = name
+        values[f":a{index}"] = {'N': str(total)}
+        additions.append(f"#a{index} :a{index}")
+    update_expression = "SET #updatedAt = :now" + (f" ADD {', '.join(additions)}" if additions else "")
+
+    marker = {
+        'TableName': AGGREGATES_TABLE_NAME,
+        'Item': {
+            **marker_key(first_sequence, key),
+            'lastSequence': {'S': last_sequence},
+            'expiresAt': {'N': str(int(time.time()) + MARKER_TTL_SECONDS)}
+        },
+        'ExpressionAttributeNames': {'#lastSequence': 'lastSequence'},
+        'ReturnValuesOnConditionCheckFailure': 'ALL_OLD'
+    }
+    if applied_sequence is None:
+        marker['ConditionExpression'] = 'attribute_not_exists(#lastSequence)'
+    else:
+        marker['ConditionExpression'] = '#lastSequence = :applied'
+        marker['ExpressionAttributeValues'] = {':applied': {'S': applied_sequence}}
+
+    return [
+        {'Update': {
+            'TableName': AGGREGATES_TABLE_NAME,
+            'Key': {'dimension': {'S': dimension}, 'hour': {'S': hour}},
+            'UpdateExpression': update_expression,
+            'ExpressionAttributeNames': names,
+            'ExpressionAttributeValues': values
+        }},
+        {'Put': marker}
+    ]
@@ -0,0 +1,252 @@
+"""
+MIT No Attribution
+
+Copyright 2024 Amazon Web Services
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+
+
+Admission control of BDA job submissions.
+
+BDA runs a limited number of jobs per account at a time. Every submission
+first takes one of MAX_BDA_JOBS_IN_FLIGHT slots with a conditional ADD on a
+counter item of the admission table. When no slot is free, the upload goes
+to the backlog in the same table instead of being sent and rejected. Every
+BDA completion event gives its slot back, and the extraction Lambda then
+admits the next uploads of the backlog: highest priority first and, within a
+priority, oldest upload first. Priorities are the key prefixes of
+ADMISSION_PRIORITY_PREFIXES in decreasing order; other keys come last.
+
+Completion events can be lost, and a function can stop between taking a slot
+and submitting. On a schedule the counter is therefore lowered to the claims
+still STARTED in the claims table (updated within
+ADMISSION_JOB_TIMEOUT_SECONDS). It is never raised from the table, because
+claims whose job has finished stay STARTED until they are validated.
+"""
+
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+
+from botocore.exceptions import ClientError
+
+import claims_table
+
+logger = logging.getLogger()
+
+ADMISSION_TABLE_NAME = os.environ.get('ADMISSION_TABLE_NAME')
+MAX_BDA_JOBS_IN_FLIGHT = int(os.environ.get('MAX_BDA_JOBS_IN_FLIGHT', '25'))
+ADMISSION_PRIORITY_PREFIXES = [
+    prefix.strip() for prefix in os.environ.get('ADMISSION_PRIORITY_PREFIXES', '').split(',') if prefix.strip()
+]
+ADMISSION_JOB_TIMEOUT_SECONDS = int(os.environ.get('ADMISSION_JOB_TIMEOUT_SECONDS', '3600'))
+
+COUNTER_KEY = {'partition': {'S': 'inflight'}, 'position': {'S': 'bda'}}
+BACKLOG_PARTITION = 'backlog'
+STARTED = 'STARTED'
+
+
+class QueuedDocument(NamedTuple):
+    position: str
+    bucket: str
+    key: str
+    uploaded_at: str
+    hash_key: str
+
+
+def priority(key):
+    for index, prefix in enumerate(ADMISSION_PRIORITY_PREFIXES):
+        if key.startswith(prefix):
+            return index
+    return len(ADMISSION_PRIORITY_PREFIXES)
+
+
+def queued_document(bucket, key, uploaded_at, hash_key=None):
+    """
+    Backlog entry of an upload; its position sorts by priority, then upload time
+    """
+    uploaded_at = uploaded_at or datetime.now(timezone.utc).isoformat()
+    return QueuedDocument(f"{priority(key):02d}#{uploaded_at}#{bucket}/{key}", bucket, key, uploaded_at, hash_key)
+
+
+def try_acquire(dynamodb):
+    """
+    Take a BDA job slot. False when MAX_BDA_JOBS_IN_FLIGHT jobs are already running.
+    """
+    if not ADMISSION_TABLE_NAME:
+        return True
+    try:
+        dynamodb.update_item(
+            TableName=ADMISSION_TABLE_NAME,
+            Key=COUNTER_KEY,
+            UpdateExpression="ADD #jobs :one",
+            ConditionExpression="attribute_not_exists(#jobs) OR #jobs < :limit",
+            ExpressionAttributeNames={'#jobs': 'jobs'},
+            ExpressionAttributeValues={':one': {'N': '1'}, ':limit': {'N': str(MAX_BDA_JOBS_IN_FLIGHT)}}
+        )
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise
+
+
+def release(dynamodb):
+    """
+    Give a BDA job slot back
+    """
+    if not ADMISSION_TABLE_NAME:
+        return
+    try:
+        dynamodb.update_item(
+            TableName=ADMISSION_TABLE_NAME,
+            Key=COUNTER_KEY,
+            UpdateExpression="ADD #jobs :minusOne",
+            ConditionExpression="#jobs > :zero",
+            ExpressionAttributeNames={'#jobs': 'jobs'},
+            ExpressionAttributeValues={':minusOne': {'N': '-1'}, ':zero': {'N': '0'}}
+        )
+    except ClientError as e:
+        # Already lowered by reconcile, or the job was submitted before admission control
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+
+
+def enqueue(dynamodb, document):
+    dynamodb.put_item(
+        TableName=ADMISSION_TABLE_NAME,
+        Item={
+            'partition': {'S': BACKLOG_PARTITION},
+            'position': {'S': document.position},
+            'bucket': {'S': document.bucket},
+            'fileName': {'S': document.key},
+            'uploadedAt': {'S': document.uploaded_at},
+            'queuedAt': {'S': datetime.now(timezone.utc).isoformat()},
+            **({'hashKey': {'S': document.hash_key}} if document.hash_key else {})
+        }
+    )
+    logger.info(f"No BDA job slot free, s3://{document.bucket}/{document.key} added to the backlog")
+
+
+def peek(dynamodb, limit):
+    """
+    The first uploads of the backlog, in admission order
+    """
+    response = dynamodb.query(
+        TableName=ADMISSION_TABLE_NAME,
+        KeyConditionExpression="#partition = :backlog",
+        ExpressionAttributeNames={'#partition': 'partition'},
+        ExpressionAttributeValues={':backlog': {'S': BACKLOG_PARTITION}},
+        Limit=limit
+    )
+    return [
+        QueuedDocument(
+            item['position']['S'],
+            item['bucket']['S'],
+            item['fileName']['S'],
+            item['uploadedAt']['S'],
+            item.get('hashKey', {}).get('S')
+        )
+        for item in response.get('Items', [])
+    ]
+
+
+def take(dynamodb, document):
+    """
+    Remove an upload from the backlog. False when another invocation took it first.
+    """
+    try:
+        dynamodb.delete_item(
+            TableName=ADMISSION_TABLE_NAME,
+            Key={'partition': {'S': BACKLOG_PARTITION}, 'position': {'S': document.position}},
+            ConditionExpression="attribute_exists(#position)",
+            ExpressionAttributeNames={'#position': 'position'}
+        )
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise
+
+
+def count(dynamodb, **query):
+    total = 0
+    while True:
+        response = dynamodb.query(Select='COUNT', **query)
+        total += response['Count']
+        if 'LastEvaluatedKey' not in response:
+            return total
+        query['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def backlog_depth(dynamodb):
+    if not ADMISSION_TABLE_NAME:
+        return 0
+    return count(
+        dynamodb,
+        TableName=ADMISSION_TABLE_NAME,
+        KeyConditionExpression="#partition = :backlog",
+        ExpressionAttributeNames={'#partition': 'partition'},
+        ExpressionAttributeValues={':backlog': {'S': BACKLOG_PARTITION}}
+    )
+
+
+def jobs_in_flight(dynamodb):
+    if not ADMISSION_TABLE_NAME:
+        return 0
+    response = dynamodb.get_item(TableName=ADMISSION_TABLE_NAME, Key=COUNTER_KEY, ConsistentRead=True)
+    return int(response.get('Item', {}).get('jobs', {}).get('N', '0'))
+
+
+def started_claims(dynamodb, claims_table_name):
+    """
+    Claims whose BDA job was submitted within ADMISSION_JOB_TIMEOUT_SECONDS and that are not validated yet
+    """
+    since = datetime.now(timezone.utc) - timedelta(seconds=ADMISSION_JOB_TIMEOUT_SECONDS)
+    return count(
+        dynamodb,
+        TableName=claims_table_name,
+        IndexName=claims_table.STATUS_DATE_INDEX,
+        KeyConditionExpression="#status = :started AND #updatedAt >= :since",
+        ExpressionAttributeNames={'#status': 'status', '#updatedAt': 'updatedAt'},
+        ExpressionAttributeValues={':started': {'S': STARTED}, ':since': {'S': since.isoformat()}}
+    )
+
+
+def reconcile(dynamodb, claims_table_name):
+    """
+    Lower the counter to the claims still STARTED. Returns the number of slots freed.
+    """
+    if not ADMISSION_TABLE_NAME:
+        return 0
+    started = started_claims(dynamodb, claims_table_name)
+    try:
+        response = dynamodb.update_item(
+            TableName=ADMISSION_TABLE_NAME,
+            Key=COUNTER_KEY,
+            UpdateExpression="SET #jobs = :started",
+            ConditionExpression="#jobs > :started",
+            ExpressionAttributeNames={'#jobs': 'jobs'},
+            ExpressionAttributeValues={':started': {'N': str(started)}},
+            ReturnValues='UPDATED_OLD'
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return 0
+        raise
+    freed = int(response['Attributes']['jobs']['N']) - started
+    logger.warning(f"{freed} BDA job slot(s) were never released, {started} claim(s) still started")
+    return freed
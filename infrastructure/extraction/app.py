@@ -19,111 +19,427 @@ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
 """
 
 import json
-import boto3
 import os
 import logging
+import random
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from botocore.exceptions import ClientError
+
+import admission
+import bda
+import claims_table
+import clients
+import dedup
+import instrumentation
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Get region from boto3 session
-region = boto3.session.Session().region_name
+# Upper bound on BDA submissions in flight at the same time within one invocation
+MAX_CONCURRENT_SUBMISSIONS = int(os.environ.get('MAX_CONCURRENT_SUBMISSIONS', '8'))
+MAX_SUBMISSION_ATTEMPTS = int(os.environ.get('MAX_SUBMISSION_ATTEMPTS', '5'))
+BACKOFF_BASE_SECONDS = 0.2
+BACKOFF_MAX_SECONDS = 5.0
+THROTTLING_ERROR_CODES = {'ThrottlingException', 'TooManyRequestsException', 'ServiceQuotaExceededException'}
+DYNAMODB_THROTTLING_ERROR_CODES = {'ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded'}
+
+BDA_PROFILE_NAME = 'us.data-automation-v1'
+
+_bda_profile_arn = os.environ.get('BDA_PROFILE_ARN')
 
-# Get account ID using STS
-sts_client = boto3.client('sts')
-account_id = sts_client.get_caller_identity()["Account"]
-bda_profile_arn = f'arn:aws:bedrock:{region}:{account_id}:data-automation-profile/us.data-automation-v1'
 
-bda_runtime = boto3.client(service_name='bedrock-data-automation-runtime')
+class SubmissionError(Exception):
+    """
+    Uploads of the S3 event could be neither submitted to BDA nor put in the backlog
+    """
 
-s3_client = boto3.client('s3')
 
-dynamodb = boto3.client('dynamodb')
+def get_bda_profile_arn(context):
+    """
+    Resolve the data automation profile ARN without a blocking STS call when possible.
+    Order: BDA_PROFILE_ARN environment variable, the invoked function ARN, then STS (cached).
+    """
+    global _bda_profile_arn
+    if _bda_profile_arn:
+        return _bda_profile_arn
 
+    function_arn = getattr(context, 'invoked_function_arn', None)
+    if function_arn:
+        # arn:aws:lambda:<region>:<account-id>:function:<name>
+        arn_parts = function_arn.split(':')
+        region, account_id = arn_parts[3], arn_parts[4]
+    else:
+        sts = clients.get_client('sts')
+        region = sts.meta.region_name
+        account_id = sts.get_caller_identity()["Account"]
 
+    _bda_profile_arn = f'arn:aws:bedrock:{region}:{account_id}:data-automation-profile/{BDA_PROFILE_NAME}'
+    logger.info(f"BDA Profile ARN: {_bda_profile_arn}")
+    return _bda_profile_arn
+
+
+@instrumentation.handler('extraction')
 def lambda_handler(event, context):
-    #logger.debug("Extraction Lambda")
+    bda_project_arn = os.environ.get('BDA_PROJECT_ARN')
+    logger.info(f"BDA Project ARN: {bda_project_arn}")
+
+    extraction_bucket = os.environ.get('EXTRACTION_BUCKET_NAME')
+    output_bucket_prefix = "s3://" + extraction_bucket + "/output"
+    logger.info(f"Output bucket prefix: {output_bucket_prefix}")
+
+    bda_profile_arn = get_bda_profile_arn(context)
+
+    # A BDA job finished: its slot goes to the next upload of the backlog
+    if event.get('source') == 'aws.bedrock':
+        admission.release(clients.get_client('dynamodb'))
+        return admit_backlog(bda_project_arn, bda_profile_arn, output_bucket_prefix)
+
+    if event.get('detail-type') == 'Scheduled Event':
+        dynamodb = clients.get_client('dynamodb')
+        freed = admission.reconcile(dynamodb, os.getenv('BDA_TABLE_NAME'))
+        response = admit_backlog(bda_project_arn, bda_profile_arn, output_bucket_prefix)
+        # Backlog depth is the metric to scale BDA and validation capacity on
+        instrumentation.put_metric('AdmissionBacklog', admission.backlog_depth(dynamodb), operation='Admission')
+        instrumentation.put_metric('JobsInFlight', admission.jobs_in_flight(dynamodb), operation='Admission')
+        instrumentation.put_metric('SlotsReclaimed', freed, operation='Admission')
+        return response
+
+    # Every record of the S3 notification is processed, not only the first one
+    records = event.get('Records', [])
+    logger.info(f"Received {len(records)} record(s)")
+
+    submitted = []
+    linked = []
+    queued = []
+    failures = []
 
-    #print('boto3.__version_: ', boto3.__version__)
+    if records:
+        max_workers = min(MAX_CONCURRENT_SUBMISSIONS, len(records))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+            for record in records:
+                ingestion_bucket = record['s3']['bucket']['name']
+                # Keys in S3 notifications are URL encoded, with spaces as '+'
+                key = urllib.parse.unquote_plus(record['s3']['object']['key'])
+                future = executor.submit(instrumentation.propagate(submit_document), ingestion_bucket, key, record['s3']['object'], record.get('eventTime'), bda_project_arn, bda_profile_arn, output_bucket_prefix)
+                futures[future] = (ingestion_bucket, key, record.get('eventTime'))
 
-    # Get bucket and key from the S3 event
-    ingestion_bucket = event['Records'][0]['s3']['bucket']['name']
-    key = event['Records'][0]['s3']['object']['key']
+            for future in as_completed(futures):
+                ingestion_bucket, key, uploaded_at = futures[future]
+                try:
+                    invocation_arn, duplicate_of = future.result()
+                    if duplicate_of:
+                        linked.append({'key': key, 'duplicateOf': duplicate_of['fileName'], 'invocationArn': duplicate_of['invocationArn']})
+                        continue
+                    if invocation_arn is None:
+                        queued.append(key)
+                        continue
+                    submitted.append({
+                        'invocationArn': invocation_arn,
+                        'bucket': ingestion_bucket,
+                        'key': key,
+                        'uploadedAt': uploaded_at
+                    })
+                except Exception as e:
+                    logger.error(f"Error submitting s3://{ingestion_bucket}/{key}: {e}")
+                    # The async S3 invocation ignores the response, so the upload is retried from the backlog
+                    if requeue_document(ingestion_bucket, key, uploaded_at):
+                        queued.append(key)
+                    else:
+                        failures.append({'bucket': ingestion_bucket, 'key': key, 'error': str(e)})
 
-    logger.info(f"Bucket: {ingestion_bucket}")
-    logger.info(f"Key: {key}")
+    unsubmitted = len(failures)
+    if submitted:
+        for row in store_in_dynamodb(submitted, "STARTED"):
+            failures.append({
+                'bucket': row['bucket'],
+                'key': row['key'],
+                'invocationArn': row['invocationArn'],
+                'error': 'Item was not written to the table'
+            })
+
+    instrumentation.put_metric('DocumentsSubmitted', len(submitted))
+    instrumentation.put_metric('DuplicatesLinked', len(linked))
+    instrumentation.put_metric('DocumentsQueued', len(queued))
+    logger.info(f"Submitted: {len(submitted)}, Linked to earlier uploads: {len(linked)}, Queued: {len(queued)}, Failed: {len(failures)}")
+
+    if unsubmitted:
+        # Lambda retries the event, then sends it to the on-failure destination
+        raise SubmissionError(f"{unsubmitted} upload(s) were neither submitted nor queued: {failures}")
+
+    if not failures:
+        status_code = 200
+    elif len(failures) < len(records):
+        status_code = 207
+    else:
+        status_code = 500
+
+    return {
+        'statusCode': status_code,
+        'body': json.dumps({
+            'submitted': [row['key'] for row in submitted],
+            'linked': linked,
+            'queued': queued,
+            'failures': failures
+        })
+    }
+
+def admit_backlog(bda_project_arn, bda_profile_arn, output_bucket_prefix):
+    """
+    Submit uploads of the backlog, in admission order, while BDA job slots are free
+    """
+    dynamodb = clients.get_client('dynamodb')
+    submitted = []
+    failures = []
+    slots_free = bool(admission.ADMISSION_TABLE_NAME)
+    while slots_free:
+        documents = admission.peek(dynamodb, MAX_CONCURRENT_SUBMISSIONS)
+        admitted = []
+        for document in documents:
+            if not admission.try_acquire(dynamodb):
+                slots_free = False
+                break
+            if admission.take(dynamodb, document):
+                admitted.append(document)
+            else:
+                admission.release(dynamodb)
+        if not admitted:
+            break
+
+        with ThreadPoolExecutor(max_workers=len(admitted)) as executor:
+            futures = {
+                executor.submit(instrumentation.propagate(start_job), document.bucket, document.key, document.hash_key, document.uploaded_at, bda_project_arn, bda_profile_arn, output_bucket_prefix): document
+                for document in admitted
+            }
+            for future in as_completed(futures):
+                document = futures[future]
+                try:
+                    invocation_arn = future.result()
+                except Exception as e:
+                    logger.error(f"Error submitting s3://{document.bucket}/{document.key} from the backlog: {e}")
+                    failures.append({'bucket': document.bucket, 'key': document.key, 'error': str(e)})
+                    continue
+                if invocation_arn is None:
+                    # Throttled again and back in the backlog
+                    slots_free = False
+                    continue
+                submitted.append({
+                    'invocationArn': invocation_arn,
+                    'bucket': document.bucket,
+                    'key': document.key,
+                    'uploadedAt': document.uploaded_at
+                })
+
+    if submitted:
+        for row in store_in_dynamodb(submitted, "STARTED"):
+            failures.append({
+                'bucket': row['bucket'],
+                'key': row['key'],
+                'invocationArn': row['invocationArn'],
+                'error': 'Item was not written to the table'
+            })
+
+    instrumentation.put_metric('DocumentsAdmitted', len(submitted), operation='Admission')
+    logger.info(f"Admitted from the backlog: {len(submitted)}, Failed: {len(failures)}")
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'submitted': [row['key'] for row in submitted],
+            'failures': failures
+        })
+    }
+
+def submit_document(ingestion_bucket, key, s3_object, uploaded_at, bda_project_arn, bda_profile_arn, output_bucket_prefix):
+    """
+    Start a BDA job for the document unless the same content was already submitted.
+    Returns (invocation_arn, None) for a new job, (None, existing_entry) for a duplicate
+    and (None, None) when it waits in the admission backlog.
+    """
+    hash_key = dedup.content_hash(s3_object) if dedup.DEDUP_TABLE_NAME else None
+    if hash_key:
+        try:
+            duplicate_of = dedup.reserve(clients.get_client('dynamodb'), hash_key, ingestion_bucket, key)
+        except Exception as e:
+            # Without the dedup table the document is still processed, possibly twice
+            logger.error(f"Error checking {key} for duplicates, submitting it: {e}")
+            hash_key = None
+            duplicate_of = None
+        if duplicate_of:
+            return None, duplicate_of
 
     try:
+        acquired = admission.try_acquire(clients.get_client('dynamodb'))
+    except Exception:
+        if hash_key:
+            dedup.release(clients.get_client('dynamodb'), hash_key)
+        raise
+    if not acquired:
+        queue_document(ingestion_bucket, key, uploaded_at, hash_key)
+        return None, None
+    return start_job(ingestion_bucket, key, hash_key, uploaded_at, bda_project_arn, bda_profile_arn, output_bucket_prefix), None
 
-        bda_project_arn = os.environ.get('BDA_PROJECT_ARN')
-
-        logger.info(f"BDA Project ARN: {bda_project_arn}")
-
-        extraction_bucket = os.environ.get('EXTRACTION_BUCKET_NAME')
-
-        input_bucket_prefix = "s3://" + ingestion_bucket + "/" + key
-        output_bucket_prefix = "s3://" + extraction_bucket + "/output"
-
-        logger.info(f"Input bucket prefix: {input_bucket_prefix}")
-        logger.info(f"Output bucket prefix: {output_bucket_prefix}")
-
-        # Invoke the data automation project
-        response = bda_runtime.invoke_data_automation_async(
-            inputConfiguration =
-            {
-                's3Uri':  input_bucket_prefix
-            },
-            outputConfiguration = 
-            {
-                's3Uri': output_bucket_prefix
-            },
-            dataAutomationConfiguration = 
-            { 
-                'dataAutomationProjectArn' : bda_project_arn, 
-                'stage': "LIVE"
-            },
-            notificationConfiguration = {
-                'eventBridgeConfiguration' : {
-                    'eventBridgeEnabled' : True
-                }
-            },
-            dataAutomationProfileArn=bda_profile_arn
-        )
-
-        logger.info(f"Response: {response}")
-        invocation_arn = response['invocationArn']
-        logger.info(f"Invocation ARN: {invocation_arn}")
+def start_job(ingestion_bucket, key, hash_key, uploaded_at, bda_project_arn, bda_profile_arn, output_bucket_prefix):
+    """
+    Submit a document that holds a BDA job slot. Returns the invocation ARN, or None
+    when BDA kept throttling it and it was put in the backlog instead.
+    """
+    try:
+        invocation_arn = invoke_data_automation(ingestion_bucket, key, bda_project_arn, bda_profile_arn, output_bucket_prefix)
+    except Exception as e:
+        admission.release(clients.get_client('dynamodb'))
+        throttled = isinstance(e, ClientError) and e.response.get('Error', {}).get('Code') in THROTTLING_ERROR_CODES
+        if throttled and admission.ADMISSION_TABLE_NAME:
+            queue_document(ingestion_bucket, key, uploaded_at, hash_key)
+            return None
+        if hash_key:
+            dedup.release(clients.get_client('dynamodb'), hash_key)
+        raise
 
+    if hash_key:
+        dedup.record_invocation(clients.get_client('dynamodb'), hash_key, invocation_arn)
+    return invocation_arn
 
-        store_in_dynamodb(invocation_arn, key, ingestion_bucket, "STARTED")
+def queue_document(ingestion_bucket, key, uploaded_at, hash_key):
+    """
+    Put an upload in the admission backlog until a BDA job slot is free
+    """
+    try:
+        admission.enqueue(clients.get_client('dynamodb'), admission.queued_document(ingestion_bucket, key, uploaded_at, hash_key))
+    except Exception:
+        if hash_key:
+            dedup.release(clients.get_client('dynamodb'), hash_key)
+        raise
+    if hash_key:
+        dedup.mark_queued(clients.get_client('dynamodb'), hash_key)
 
+def requeue_document(ingestion_bucket, key, uploaded_at):
+    """
+    Put an upload whose submission failed in the backlog. False when there is no backlog or it cannot be written.
+    """
+    if not admission.ADMISSION_TABLE_NAME:
+        return False
+    try:
+        queue_document(ingestion_bucket, key, uploaded_at, None)
     except Exception as e:
-        logger.error(f"Error:, {e}")
-        return {
-            'statusCode': 500,
-            'body': json.dumps({
-                'error': str(e)
-            })
-        }
-    
-def store_in_dynamodb(invocation_arn, object_key, bucket_name, status):
+        logger.error(f"Error adding s3://{ingestion_bucket}/{key} to the backlog: {e}")
+        return False
+    return True
+
+def invoke_data_automation(ingestion_bucket, key, bda_project_arn, bda_profile_arn, output_bucket_prefix):
+    """
+    Submit one document to the data automation project, backing off and retrying while throttled
+    """
+    input_bucket_prefix = "s3://" + ingestion_bucket + "/" + key
+    logger.info(f"Input bucket prefix: {input_bucket_prefix}")
+
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            # Invoke the data automation project
+            with instrumentation.span('InvokeDataAutomationAsync', key=key, attempt=attempt):
+                response = clients.get_client('bedrock-data-automation-runtime').invoke_data_automation_async(
+                    inputConfiguration =
+                    {
+                        's3Uri':  input_bucket_prefix
+                    },
+                    outputConfiguration = 
+                    {
+                        's3Uri': output_bucket_prefix
+                    },
+                    dataAutomationConfiguration = 
+                    { 
+                        'dataAutomationProjectArn' : bda_project_arn, 
+                        'stage': "LIVE"
+                    },
+                    notificationConfiguration = {
+                        'eventBridgeConfiguration' : {
+                            'eventBridgeEnabled' : True
+                        }
+                    },
+                    dataAutomationProfileArn=bda_profile_arn
+                )
+                # The invocation id is the correlation id of the claim through validation and integration
+                instrumentation.set_correlation_id(bda.invocation_id(response['invocationArn']))
+        except ClientError as e:
+            error_code = e.response.get('Error', {}).get('Code')
+            if error_code not in THROTTLING_ERROR_CODES or attempt >= MAX_SUBMISSION_ATTEMPTS:
+                raise
+            delay = backoff_delay(attempt)
+            logger.warning(f"Throttled submitting {key} ({error_code}), retrying in {delay:.2f}s (attempt {attempt})")
+            time.sleep(delay)
+            continue
+
+        invocation_arn = response['invocationArn']
+        logger.info(f"Invocation ARN: {invocation_arn} for s3://{ingestion_bucket}/{key}")
+        return invocation_arn
+
+def backoff_delay(attempt):
+    """
+    Exponential backoff with full jitter
+    """
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)))
+
+def store_in_dynamodb(rows, status):
+    """
+    Write one item per submitted document using UpdateItem.
+    Status and createdAt are only set when absent, so a validation result that was
+    stored before this write is kept. Returns the rows that could not be written.
+    """
     table_name = os.getenv('BDA_TABLE_NAME')
     logger.info(f"Table Name: {table_name}")
-    invocation_id = invocation_arn.split('/')[-1]
-    logger.info(f"Invocation ID: {invocation_id}")
-    try:
-        dynamodb.put_item(
-            TableName=table_name,
-            # TODO: DynamoDB model can be improved
-            Item = {
-                'invocationId': {'S': invocation_id},
-                'invocationArn': {'S': invocation_arn},            
-                'fileName': {'S': object_key},            
-                'filePath': {'S': f"s3://{bucket_name}/{object_key}"},
-                'status': {'S': status}
-            }
-        )
-    except Exception as e:
-        logger.error(f"Error:, {e}")
-        logger.error(f"Exception while inserting the details into the table:, {table_name}")
-        raise e
+
+    now = datetime.now(timezone.utc).isoformat()
+    unprocessed = []
+    for row in rows:
+        invocation_id = bda.invocation_id(row['invocationArn'])
+        logger.info(f"Invocation ID: {invocation_id}")
+
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                with instrumentation.span('UpdateItem') as write_span:
+                    response = clients.get_client('dynamodb').update_item(
+                        TableName=table_name,
+                        # Item model: infrastructure/validation/claims_model.py
+                        Key={
+                            'invocationId': {'S': invocation_id},
+                            'fileName': {'S': row['key']}
+                        },
+                        UpdateExpression=(
+                            "SET invocationArn = :invocationArn, filePath = :filePath, schemaVersion = :schemaVersion, "
+                            "#status = if_not_exists(#status, :status), createdAt = if_not_exists(createdAt, :now), "
+                            "updatedAt = if_not_exists(updatedAt, :now), uploadedAt = if_not_exists(uploadedAt, :uploadedAt)"
+                        ),
+                        ExpressionAttributeNames={'#status': 'status'},
+                        ExpressionAttributeValues={
+                            ':invocationArn': {'S': row['invocationArn']},
+                            ':filePath': {'S': f"s3://{row['bucket']}/{row['key']}"},
+                            ':schemaVersion': {'N': str(claims_table.SCHEMA_VERSION)},
+                            ':status': {'S': status},
+                            ':now': {'S': now},
+                            # Start of the end-to-end claim latency recorded by the validation lambda
+                            ':uploadedAt': {'S': row.get('uploadedAt') or now}
+                        },
+                        ReturnConsumedCapacity='TOTAL'
+                    )
+                    write_span.metric('WriteCapacityUnits', response.get('ConsumedCapacity', {}).get('CapacityUnits', 0))
+                break
+            except ClientError as e:
+                error_code = e.response.get('Error', {}).get('Code')
+                if error_code in DYNAMODB_THROTTLING_ERROR_CODES and attempt < MAX_SUBMISSION_ATTEMPTS:
+                    time.sleep(backoff_delay(attempt))
+                    continue
+                logger.error(f"Exception while inserting the details into the table {table_name}: {e}")
+            except Exception as e:
+                logger.error(f"Exception while inserting the details into the table {table_name}: {e}")
+            unprocessed.append(row)
+            break
+
+    if unprocessed:
+        logger.error(f"{len(unprocessed)} item(s) were not written to the table: {table_name}")
+    return unprocessed
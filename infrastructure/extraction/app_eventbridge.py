@@ -19,95 +19,43 @@ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
 """
 
 import json
-import boto3
 import logging
 
+import bda
+import clients
+import instrumentation
+
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 
-logger.debug(f"boto3.__version_: {boto3.__version__}")
-
-s3_client = boto3.client('s3')
-
+@instrumentation.handler('extraction-eventbridge')
 def lambda_handler(event, context):
-    logger.debug(f"boto3.__version_: {boto3.__version__}")
-    logger.debug(f"BDA_EVENT_RECEIVED: {event}")
-
-    # TODO implement
-    #read BDA_invocation_Id from the event
-    bda_invocation_details = event['detail']
-    logger.info('bda_invocation_details: ', bda_invocation_details)
-    bda_invocation_id = bda_invocation_details['job_id']
-    logger.info('bda_invocation_id: ', bda_invocation_id)
-
-    job_status = bda_invocation_details['job_status']
-    logger.info('job_status: ', job_status)
-
-    output_s3_location = bda_invocation_details['output_s3_location']
-    logger.info('output_s3_location: ', output_s3_location)
-
-    bucket_name = output_s3_location['s3_bucket']
-    logger.info('bucket_name:', bucket_name)
+    instrumentation.log_payload('BDA_EVENT_RECEIVED', event)
 
-    bda_output_path = output_s3_location['name']
-    logger.info('bda_output_path: ', bda_output_path)
+    job = bda.parse_job_event(event)
+    bda_invocation_id = job.job_id
+    instrumentation.set_correlation_id(bda_invocation_id)
+    logger.info(f"bda_invocation_id: {bda_invocation_id}")
+    logger.info(f"job_status: {job.job_status}")
 
-    bda_result_suffix = '/custom_output/0/result.json'
-    bda_result_object_key = bda_output_path+''+bda_result_suffix
+    bucket_name = job.output_bucket
+    bda_result_object_key = bda.custom_output_key(job.output_path)
     logger.info(bda_result_object_key)
     
-    response = s3_client.get_object(Bucket=bucket_name, Key=bda_result_object_key)
-    data = response['Body'].read().decode('utf-8')
-    json_data = json.loads(data)
-    logger.info(json_data)
+    with instrumentation.span('GetObject', key=bda_result_object_key) as get_span:
+        response = clients.get_client('s3').get_object(Bucket=bucket_name, Key=bda_result_object_key)
+        data = response['Body'].read().decode('utf-8')
+        get_span.metric('BytesRead', len(data), 'Bytes')
+    bda_result = bda.parse_result(json.loads(data))
 
-    results = json_data['inference_result']
-    logger.info('results: ', results)
+    results = bda_result.inference_result
+    instrumentation.log_payload('results', results)
 
-    confidence_results = process_explainability_info(json_data)
-    logger.info('confidence_results: ', confidence_results)
+    confidence_results = {f"{field_confidence.field}_confidence": field_confidence.confidence for field_confidence in bda_result.field_confidences if field_confidence.confidence is not None}
+    logger.info(f"confidence_results: {confidence_results}")
 
     return {
         'statusCode': 200,
         'body': results
     }
-
-def process_explainability_info(json_response):
-    """
-    Process and print explainability information from the JSON response
-    """
-    try:
-        explainability_info = json_response['explainability_info'][0]
-        results = {}
-
-        # Process each field in explainability_info
-        for field, data in explainability_info.items():
-            # Get confidence if it exists
-            if 'confidence' in data:
-                results[f"{field}_confidence"] = data['confidence']
-
-            # Get success if it exists
-            if 'success' in data:
-                results[f"{field}_success"] = data['success']
-
-            # Get value if it exists
-            if 'value' in data:
-                results[f"{field}_value"] = data['value']
-
-        # Print results in a formatted way
-        # print("\nExplainability Information:")
-        # print("-" * 50)
-        #
-        # # Print confidence values
-        # print("\nConfidence Scores:")
-        confidence_scores = {k: v for k, v in results.items() if k.endswith('_confidence')}
-
-        return confidence_scores
-
-    except KeyError as e:
-        logger.error(f"Error: Missing key in JSON response: {e}")
-        return None
-    except Exception as e:
-        logger.error(f"Error processing explainability info: {e}")
-        return None
\ No newline at end of file
@@ -0,0 +1,156 @@
+"""
+MIT No Attribution
+
+Copyright 2024 Amazon Web Services
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+
+Content-hash deduplication of uploads before they are sent to BDA.
+
+The hash is the ETag and size from the S3 notification, so no object is
+read. The ETag of a multipart upload depends on the part size as well, so
+the frontend uploads a file of a given size in the same parts (its part
+size and multipart threshold are fixed in frontend/uploads.py).
+
+The first upload of some content reserves the hash with a conditional put
+and starts the BDA job; any later upload of the same bytes fails the
+condition and is linked to the existing invocation with a single ADD to
+linkedKeys. A reservation that never got its invocation (the function died,
+or the submission failed without cleanup) can be taken over after
+DEDUP_STALE_SECONDS; one that waits in the admission backlog is marked
+QUEUED so that it is not. Entries expire through the table TTL after
+DEDUP_TTL_SECONDS, after which the content is processed again.
+"""
+
+import logging
+import os
+import time
+
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger()
+
+DEDUP_TABLE_NAME = os.environ.get('DEDUP_TABLE_NAME')
+DEDUP_TTL_SECONDS = int(os.environ.get('DEDUP_TTL_SECONDS', str(7 * 24 * 3600)))
+DEDUP_STALE_SECONDS = int(os.environ.get('DEDUP_STALE_SECONDS', '900'))
+
+STATUS_PENDING = 'PENDING'
+STATUS_QUEUED = 'QUEUED'
+STATUS_SUBMITTED = 'SUBMITTED'
+
+
+def content_hash(s3_object):
+    """
+    Hash of an uploaded object from its S3 notification, or None when the event has no ETag
+    """
+    etag = (s3_object.get('eTag') or '').strip('"')
+    if not etag:
+        return None
+    return f"etag:{etag}:{s3_object.get('size', '')}"
+
+
+def reserve(dynamodb, hash_key, bucket, key):
+    """
+    Reserve hash_key for this upload. Returns None when reserved (the caller
+    starts the BDA job), otherwise the existing entry after linking key to it.
+    A retried invocation takes back the pending reservation of its own upload.
+    """
+    now = int(time.time())
+    try:
+        dynamodb.put_item(
+            TableName=DEDUP_TABLE_NAME,
+            Item={
+                'contentHash': {'S': hash_key},
+                'status': {'S': STATUS_PENDING},
+                'bucket': {'S': bucket},
+                'fileName': {'S': key},
+                'reservedAt': {'N': str(now)},
+                'expiresAt': {'N': str(now + DEDUP_TTL_SECONDS)}
+            },
+            ConditionExpression="attribute_not_exists(#contentHash) OR (#status = :pending AND "
+                                "(#reservedAt < :stale OR (#bucket = :bucket AND #fileName = :key)))",
+            ExpressionAttributeNames={'#contentHash': 'contentHash', '#status': 'status', '#reservedAt': 'reservedAt',
+                                      '#bucket': 'bucket', '#fileName': 'fileName'},
+            ExpressionAttributeValues={':pending': {'S': STATUS_PENDING}, ':stale': {'N': str(now - DEDUP_STALE_SECONDS)},
+                                       ':bucket': {'S': bucket}, ':key': {'S': key}}
+        )
+        return None
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+
+    response = dynamodb.update_item(
+        TableName=DEDUP_TABLE_NAME,
+        Key={'contentHash': {'S': hash_key}},
+        UpdateExpression="ADD #linkedKeys :key",
+        ExpressionAttributeNames={'#linkedKeys': 'linkedKeys'},
+        ExpressionAttributeValues={':key': {'SS': [f"s3://{bucket}/{key}"]}},
+        ReturnValues="ALL_NEW"
+    )
+    entry = response['Attributes']
+    logger.info(f"Duplicate upload s3://{bucket}/{key} linked to {entry['fileName']['S']}")
+    return {
+        'fileName': entry['fileName']['S'],
+        'invocationArn': entry.get('invocationArn', {}).get('S'),
+        'status': entry['status']['S']
+    }
+
+
+def record_invocation(dynamodb, hash_key, invocation_arn):
+    try:
+        dynamodb.update_item(
+            TableName=DEDUP_TABLE_NAME,
+            Key={'contentHash': {'S': hash_key}},
+            UpdateExpression="SET #status = :submitted, #invocationArn = :invocationArn",
+            ExpressionAttributeNames={'#status': 'status', '#invocationArn': 'invocationArn'},
+            ExpressionAttributeValues={':submitted': {'S': STATUS_SUBMITTED}, ':invocationArn': {'S': invocation_arn}}
+        )
+    except Exception as e:
+        # The reservation turns stale and the next duplicate submits again
+        logger.error(f"Error recording the invocation for {hash_key}: {e}")
+
+
+def mark_queued(dynamodb, hash_key):
+    """
+    Keep the reservation of an upload in the admission backlog from turning stale
+    """
+    try:
+        dynamodb.update_item(
+            TableName=DEDUP_TABLE_NAME,
+            Key={'contentHash': {'S': hash_key}},
+            UpdateExpression="SET #status = :queued",
+            ConditionExpression="#status = :pending",
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={':queued': {'S': STATUS_QUEUED}, ':pending': {'S': STATUS_PENDING}}
+        )
+    except Exception as e:
+        # The reservation can turn stale and a duplicate may be submitted on its own
+        logger.error(f"Error marking {hash_key} as queued: {e}")
+
+
+def release(dynamodb, hash_key):
+    """
+    Drop a reservation whose BDA submission failed, so that a retry is not linked to it
+    """
+    try:
+        dynamodb.delete_item(
+            TableName=DEDUP_TABLE_NAME,
+            Key={'contentHash': {'S': hash_key}},
+            ConditionExpression="#status IN (:pending, :queued)",
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={':pending': {'S': STATUS_PENDING}, ':queued': {'S': STATUS_QUEUED}}
+        )
+    except Exception as e:
+        logger.error(f"Error releasing the reservation for {hash_key}: {e}")
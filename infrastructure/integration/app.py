@@ -20,47 +20,174 @@ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
 
 import os
 import json
-import boto3
 import logging
+import random
+import time
+
+import clients
+import instrumentation
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Initialize SNS client
-sns_client = boto3.client('sns')
+# PublishBatch limits: 10 entries and 256 KB per request
+PUBLISH_BATCH_MAX_ENTRIES = 10
+PUBLISH_BATCH_MAX_BYTES = 256 * 1024
+PUBLISH_MAX_ATTEMPTS = int(os.environ.get('PUBLISH_MAX_ATTEMPTS', '4'))
+
+# Claims per notification; several claims arriving in one batch are sent as a digest
+DIGEST_MAX_CLAIMS = int(os.environ.get('DIGEST_MAX_CLAIMS', '10'))
+DIGEST_MAX_BYTES = 64 * 1024
 
+@instrumentation.handler('integration')
 def lambda_handler(event, context):
     logger.info("Integration Lambda")
-    logger.info(f"Event: {event}")
+    instrumentation.log_payload('Event', event)
 
     # Get the SNS topic ARN from environment variables
     sns_topic_arn = os.environ.get('NOTIFICATION_TOPIC_ARN')
     
     if not sns_topic_arn:
         raise ValueError("NOTIFICATION_TOPIC_ARN environment variable is not set")
-   
-    # Extract relevant information from the event
-    event_detail = event.get('detail', {})
-    
-    # Create message for SNS notification
-    message = {
-        'message': 'Benefit claim validation completed',
-        'detail': event_detail
-    }
-    
-    # Publish message to SNS topic
-    try:
-        response = sns_client.publish(
-            TopicArn=sns_topic_arn,
-            Message=json.dumps(message),
-            Subject='Benefit Claim Validation Status'
-        )
-        logger.info(f"Message published to SNS topic. MessageId: {response['MessageId']}")
-    except Exception as e:
-        logger.error(f"Error publishing to SNS topic: {str(e)}")
-        raise
-    
+
+    # Either a batch of SQS messages carrying EventBridge events, or a single EventBridge event
+    is_sqs_batch = 'Records' in event
+    claims = parse_claims(event)
+    logger.info(f"Claims received: {len(claims)}")
+    if len(claims) == 1:
+        instrumentation.set_correlation_id(claims[0][1].get('bda_invocation_id'))
+
+    digests = build_digests(claims)
+    failed_digests = publish_digests(sns_topic_arn, digests)
+
+    if is_sqs_batch:
+        # Only the messages whose digest was not published are returned to the queue
+        return {
+            'batchItemFailures': [
+                {'itemIdentifier': message_id}
+                for digest in failed_digests
+                for message_id in digest['message_ids']
+            ]
+        }
+
+    if failed_digests:
+        raise RuntimeError("Error publishing to SNS topic")
+
     return {
         'statusCode': 200,
         'body': json.dumps('Message published successfully')
     }
+
+def parse_claims(event):
+    """
+    Return (message_id, event_detail) for every claim in the event
+    """
+    if 'Records' not in event:
+        # Extract relevant information from the event
+        return [(None, event.get('detail', {}))]
+
+    claims = []
+    for record in event['Records']:
+        body = json.loads(record['body'])
+        claims.append((record['messageId'], body.get('detail', {})))
+    return claims
+
+def build_digests(claims):
+    """
+    Group claims into notification messages of up to DIGEST_MAX_CLAIMS claims
+    """
+    digests = []
+    current = []
+    current_bytes = 0
+    for message_id, detail in claims:
+        detail_bytes = len(json.dumps(detail))
+        if current and (len(current) == DIGEST_MAX_CLAIMS or current_bytes + detail_bytes > DIGEST_MAX_BYTES):
+            digests.append(make_digest(len(digests), current))
+            current = []
+            current_bytes = 0
+        current.append((message_id, detail))
+        current_bytes += detail_bytes
+    if current:
+        digests.append(make_digest(len(digests), current))
+    instrumentation.put_metric('ClaimsNotified', len(claims))
+    return digests
+
+def make_digest(index, claims):
+    correlation_ids = [detail.get('bda_invocation_id') for _, detail in claims if detail.get('bda_invocation_id')]
+    if len(claims) == 1:
+        # Create message for SNS notification
+        message = {
+            'message': 'Benefit claim validation completed',
+            'detail': claims[0][1]
+        }
+        subject = 'Benefit Claim Validation Status'
+    else:
+        message = {
+            'message': f"{len(claims)} benefit claim validations completed",
+            'claims': [detail for _, detail in claims]
+        }
+        subject = f"Benefit Claim Validation Status ({len(claims)} claims)"
+
+    entry = {
+        'Id': str(index),
+        'Message': json.dumps(message),
+        'Subject': subject
+    }
+    # Subscribers can filter on and trace the BDA invocation id of a single-claim notification
+    if len(correlation_ids) == 1:
+        entry['MessageAttributes'] = {'correlationId': {'DataType': 'String', 'StringValue': correlation_ids[0]}}
+
+    return {
+        'id': str(index),
+        'message_ids': [message_id for message_id, _ in claims if message_id],
+        'correlation_ids': correlation_ids,
+        'entry': entry
+    }
+
+def publish_digests(sns_topic_arn, digests):
+    """
+    Publish digests with PublishBatch, retrying only failed entries. Returns the digests that were not published.
+    """
+    failed = []
+    batch = []
+    batch_bytes = 0
+    for digest in digests:
+        entry_bytes = len(digest['entry']['Message'].encode('utf-8')) + len(digest['entry']['Subject'])
+        if batch and (len(batch) == PUBLISH_BATCH_MAX_ENTRIES or batch_bytes + entry_bytes > PUBLISH_BATCH_MAX_BYTES):
+            failed.extend(publish_batch(sns_topic_arn, batch))
+            batch = []
+            batch_bytes = 0
+        batch.append(digest)
+        batch_bytes += entry_bytes
+    if batch:
+        failed.extend(publish_batch(sns_topic_arn, batch))
+    return failed
+
+def publish_batch(sns_topic_arn, batch):
+    attempt = 0
+    while batch:
+        attempt += 1
+        # Publish message to SNS topic
+        try:
+            with instrumentation.span('PublishBatch', entries=len(batch), attempt=attempt,
+                                      correlationIds=[cid for digest in batch for cid in digest['correlation_ids']]):
+                response = clients.get_client('sns').publish_batch(
+                    TopicArn=sns_topic_arn,
+                    PublishBatchRequestEntries=[digest['entry'] for digest in batch]
+                )
+        except Exception as e:
+            logger.error(f"Error publishing to SNS topic: {str(e)}")
+            retry = batch
+        else:
+            for successful in response.get('Successful', []):
+                logger.info(f"Message published to SNS topic. MessageId: {successful['MessageId']}")
+            failed_ids = {failure['Id'] for failure in response.get('Failed', [])}
+            for failure in response.get('Failed', []):
+                logger.error(f"Error publishing to SNS topic: {failure.get('Code')} {failure.get('Message')}")
+            retry = [digest for digest in batch if digest['id'] in failed_ids]
+
+        if not retry or attempt >= PUBLISH_MAX_ATTEMPTS:
+            return retry
+        batch = retry
+        time.sleep(random.uniform(0, 0.1 * (2 ** attempt)))
+    return []
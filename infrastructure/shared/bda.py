@@ -0,0 +1,130 @@
+"""
+MIT No Attribution
+
+Copyright 2025 Amazon Web Services
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+
+Typed views of the Bedrock Data Automation completion event and result.
+
+BdaJobEvent carries the fields of the EventBridge "Bedrock Data Automation Job
+Succeeded" (or Failed) event of a finished BDA job that the functions use.
+BdaResult is the custom output (result.json) of one segment: the matched
+blueprint, the inference result and a FieldConfidence per extracted field,
+collected from explainability_info in a single pass. All are NamedTuples, so
+they have no per-instance __dict__ and cost no more than a tuple.
+
+The S3 layout of the output (CUSTOM_OUTPUT_KEY_FORMAT) is defined here only.
+"""
+
+import logging
+from typing import List, NamedTuple, Optional
+
+logger = logging.getLogger()
+
+# Custom output of a segment, relative to the output path of the job
+CUSTOM_OUTPUT_KEY_FORMAT = '{output_path}/custom_output/{index}/result.json'
+
+
+class BdaJobEvent(NamedTuple):
+    job_id: str
+    job_status: str
+    input_bucket: Optional[str]
+    input_key: str
+    output_bucket: str
+    output_path: str
+
+
+class FieldConfidence(NamedTuple):
+    field: str
+    confidence: Optional[float]
+    success: Optional[bool]
+
+
+class BdaResult(NamedTuple):
+    blueprint_name: str
+    blueprint_confidence: Optional[float]
+    inference_result: dict
+    field_confidences: List[FieldConfidence]
+
+
+def parse_job_event(event):
+    """
+    BdaJobEvent of an EventBridge BDA job event. Raises KeyError when a required field is missing.
+    """
+    detail = event['detail']
+    input_s3_object = detail['input_s3_object']
+    output_s3_location = detail['output_s3_location']
+    return BdaJobEvent(
+        job_id=detail['job_id'],
+        job_status=detail['job_status'],
+        input_bucket=input_s3_object.get('s3_bucket'),
+        input_key=input_s3_object['name'],
+        output_bucket=output_s3_location['s3_bucket'],
+        output_path=output_s3_location['name']
+    )
+
+
+def invocation_id(invocation_arn):
+    """
+    The job id at the end of an InvokeDataAutomationAsync invocation ARN
+    """
+    return invocation_arn.split('/')[-1]
+
+
+def custom_output_key(output_path, index=0):
+    return CUSTOM_OUTPUT_KEY_FORMAT.format(output_path=output_path.rstrip('/'), index=index)
+
+
+def parse_result(json_response):
+    """
+    BdaResult of a parsed custom output. Raises KeyError when it has no matched blueprint.
+    """
+    matched_blueprint = json_response['matched_blueprint']
+    return BdaResult(
+        blueprint_name=matched_blueprint['name'],
+        blueprint_confidence=matched_blueprint.get('confidence'),
+        inference_result=json_response.get('inference_result') or {},
+        field_confidences=process_explainability_info(json_response)
+    )
+
+
+def process_explainability_info(json_response):
+    """
+    Collect the confidence of every extracted field in a single pass over explainability_info.
+    Nested fields are reported with dotted names, e.g. LineItems.0.Amount
+    """
+    field_confidences = []
+    try:
+        explainability_info = json_response['explainability_info'][0]
+    except (KeyError, IndexError, TypeError) as e:
+        logger.error(f"Error: Missing key in JSON response: {e}")
+        return field_confidences
+
+    for field, data in explainability_info.items():
+        collect_field_confidences(field, data, field_confidences)
+    return field_confidences
+
+
+def collect_field_confidences(field, data, field_confidences):
+    if isinstance(data, dict):
+        if 'confidence' in data or 'success' in data:
+            field_confidences.append(FieldConfidence(field, data.get('confidence'), data.get('success')))
+            return
+        for name, value in data.items():
+            collect_field_confidences(f"{field}.{name}", value, field_confidences)
+    elif isinstance(data, list):
+        for index, value in enumerate(data):
+            collect_field_confidences(f"{field}.{index}", value, field_confidences)
@@ -0,0 +1,33 @@
+"""
+MIT No Attribution
+
+Copyright 2025 Amazon Web Services
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+
+Keys of the benefit claims table shared by the functions that write it.
+
+The extraction function puts the STARTED item of every BDA job and the
+validation function completes it; both stamp schemaVersion with
+SCHEMA_VERSION. The full item model is in validation/claims_model.py.
+"""
+
+# Version of the item layout; tools/migrate_claims_table.py upgrades older items
+SCHEMA_VERSION = 2
+
+STATUS_DATE_INDEX = 'StatusDateIndex'
+DECISION_DATE_INDEX = 'DecisionDateIndex'
+BLUEPRINT_DATE_INDEX = 'BlueprintDateIndex'
+FILE_NAME_INDEX = 'FileNameIndex'
@@ -0,0 +1,67 @@
+"""
+MIT No Attribution
+
+Copyright 2025 Amazon Web Services
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+
+boto3 clients shared by the functions, built on first use.
+
+get_client returns one client per service and configuration for the life of
+the container. boto3 is imported by the first call rather than at module
+import, and a client is only built when a code path needs it, so the init
+phase does no AWS work and an invocation only pays for the clients it uses.
+Every client pools MAX_POOL_CONNECTIONS connections and retries up to
+CLIENT_MAX_ATTEMPTS times in standard mode; callers that handle failures
+themselves pass their own max_attempts.
+"""
+
+import os
+import threading
+
+MAX_POOL_CONNECTIONS = int(os.environ.get('MAX_POOL_CONNECTIONS', '10'))
+CLIENT_MAX_ATTEMPTS = int(os.environ.get('CLIENT_MAX_ATTEMPTS', '3'))
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(service_name, max_attempts=None, read_timeout=None):
+    """
+    Return a cached boto3 client, creating it on first use.
+    Client creation is not thread safe, so it is serialized with a lock.
+    """
+    key = (service_name, max_attempts, read_timeout)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = create_client(service_name, max_attempts, read_timeout)
+                _clients[key] = client
+    return client
+
+
+def create_client(service_name, max_attempts=None, read_timeout=None):
+    import boto3
+    from botocore.config import Config
+
+    options = {
+        'max_pool_connections': MAX_POOL_CONNECTIONS,
+        'retries': {'max_attempts': max_attempts or CLIENT_MAX_ATTEMPTS, 'mode': 'standard'}
+    }
+    if read_timeout:
+        options['read_timeout'] = read_timeout
+    return boto3.client(service_name, config=Config(**options))
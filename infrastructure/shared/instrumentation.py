@@ -0,0 +1,211 @@
+"""
+MIT No Attribution
+
+Copyright 2025 Amazon Web Services
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+
+Metrics, trace spans and sampled payload logs for the extraction, validation,
+integration and aggregation functions. Deployed to all of them as the shared
+layer.
+
+Every external call runs inside span(), which writes one JSON line with the
+duration, outcome and correlation id (the BDA invocation id) and records
+Latency and Errors metrics for the operation. Metrics are buffered for the
+invocation and written to stdout in CloudWatch Embedded Metric Format when
+the handler returns, one document per operation, so no PutMetricData calls
+are made.
+
+The service, correlation id and sampling decision live in context variables.
+Work handed to a thread pool must be wrapped with propagate() to keep them.
+"""
+
+import contextvars
+import functools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger()
+
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'BenefitClaims')
+# Share of invocations whose payloads (events, inference results, model output) are logged in full
+PAYLOAD_LOG_SAMPLE_RATE = float(os.environ.get('PAYLOAD_LOG_SAMPLE_RATE', '0'))
+
+# EMF accepts at most 100 values per metric in one document
+EMF_MAX_VALUES = 100
+
+_service = contextvars.ContextVar('service', default=os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'local'))
+_correlation_id = contextvars.ContextVar('correlation_id', default=None)
+_payload_sampled = contextvars.ContextVar('payload_sampled', default=False)
+
+# (service, operation) -> {metric name: (unit, [values])}
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+def write(document):
+    """
+    Output of metric documents and spans. Lambda ships stdout lines to CloudWatch Logs as they are.
+    """
+    print(json.dumps(document, default=str), flush=True)
+
+
+def set_correlation_id(correlation_id):
+    _correlation_id.set(correlation_id)
+
+
+def get_correlation_id():
+    return _correlation_id.get()
+
+
+def propagate(fn):
+    """
+    Wrap fn so that it runs with the caller's service, correlation id and sampling
+    decision when it is executed on another thread
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        # A context can only be entered by one thread at a time, so every call gets its own copy
+        return context.copy().run(fn, *args, **kwargs)
+    return wrapper
+
+
+def put_metric(name, value, unit='Count', operation='Invocation'):
+    key = (_service.get(), operation)
+    with _metrics_lock:
+        metrics = _metrics.setdefault(key, {})
+        metrics.setdefault(name, (unit, []))[1].append(value)
+
+
+class Span:
+    def __init__(self, operation, attributes):
+        self.operation = operation
+        self.attributes = attributes
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def metric(self, name, value, unit='Count'):
+        """
+        Record a metric for the span's operation and add it to the span line
+        """
+        put_metric(name, value, unit, self.operation)
+        self.attributes[name] = value
+
+
+@contextmanager
+def span(operation, **attributes):
+    """
+    Time the enclosed call and record its outcome
+    """
+    current = Span(operation, attributes)
+    error = None
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        put_metric('Latency', duration_ms, 'Milliseconds', operation)
+        put_metric('Errors', 1 if error is not None else 0, 'Count', operation)
+        record = {
+            'span': operation,
+            'service': _service.get(),
+            'correlationId': _correlation_id.get(),
+            'durationMs': round(duration_ms, 2),
+            'outcome': 'ok' if error is None else 'error',
+            **current.attributes
+        }
+        if error is not None:
+            record['error'] = type(error).__name__
+        write(record)
+
+
+def flush_metrics():
+    """
+    Write the buffered metrics as EMF documents and clear the buffer
+    """
+    with _metrics_lock:
+        buffered = dict(_metrics)
+        _metrics.clear()
+
+    timestamp = int(time.time() * 1000)
+    for (service, operation), metrics in buffered.items():
+        longest = max(len(values) for _, values in metrics.values())
+        for start in range(0, longest, EMF_MAX_VALUES):
+            chunk = {
+                name: (unit, values[start:start + EMF_MAX_VALUES])
+                for name, (unit, values) in metrics.items()
+                if values[start:start + EMF_MAX_VALUES]
+            }
+            document = {
+                '_aws': {
+                    'Timestamp': timestamp,
+                    'CloudWatchMetrics': [{
+                        'Namespace': METRICS_NAMESPACE,
+                        'Dimensions': [['Service', 'Operation']],
+                        'Metrics': [{'Name': name, 'Unit': unit} for name, (unit, _) in chunk.items()]
+                    }]
+                },
+                'Service': service,
+                'Operation': operation,
+                **{name: values for name, (_, values) in chunk.items()}
+            }
+            write(document)
+
+
+def handler(service):
+    """
+    Decorator for a Lambda handler: names the service, decides payload sampling,
+    times the invocation and flushes the metrics when it returns
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(event, context):
+            tokens = (
+                _service.set(service),
+                _correlation_id.set(None),
+                _payload_sampled.set(random.random() < PAYLOAD_LOG_SAMPLE_RATE)
+            )
+            try:
+                with span('Invocation'):
+                    return fn(event, context)
+            finally:
+                flush_metrics()
+                for variable, token in zip((_service, _correlation_id, _payload_sampled), tokens):
+                    variable.reset(token)
+        return wrapper
+    return decorator
+
+
+def payload_logging_enabled():
+    return _payload_sampled.get() or logger.isEnabledFor(logging.DEBUG)
+
+
+def log_payload(label, payload):
+    """
+    Log a payload in full for sampled invocations only; otherwise it is not even serialized
+    """
+    if payload_logging_enabled():
+        logger.info(f"{label} [{_correlation_id.get()}]: {json.dumps(payload, default=str)}")
@@ -0,0 +1,324 @@
+"""
+MIT No Attribution
+
+Copyright 2024 Amazon Web Services
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+
+Adjudication of a claim across one or more models.
+
+ADJUDICATION_MODELS lists the models in order of preference, each with an
+optional timeout in seconds, e.g. "amazon.nova-lite-v1:0@8,amazon.nova-micro-v1:0@5".
+The first model is the primary, the others are fallbacks.
+
+By default the claim goes to the primary. If it has not answered after
+HEDGE_AFTER_MS, the same request is also sent to the next model (a hedged
+request) and the first valid answer wins. A model that is throttled, times
+out, fails or answers without a valid decision is replaced by the next one
+at once. Model calls take a token without waiting; only when every model is
+out of local capacity does the primary wait for its rate limiter.
+
+Claims with an amount of at least CONSENSUS_AMOUNT_THRESHOLD are instead sent
+to CONSENSUS_MODEL_COUNT models in parallel; the decision stands only if they
+all agree, otherwise the claim goes to review.
+
+Every model has a circuit breaker: after CIRCUIT_FAILURE_THRESHOLD
+consecutive failures (throttling included) it is skipped for
+CIRCUIT_RESET_SECONDS, then a single trial request is let through.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import NamedTuple
+
+from botocore.exceptions import ClientError
+
+import instrumentation
+import rate_limiter
+import segments
+from rules import REVIEW_NEEDED
+
+logger = logging.getLogger()
+
+ADJUDICATION_MODELS = os.environ.get('ADJUDICATION_MODELS') or os.environ.get('KNOWLEDGE_BASE_MODEL_ID', '')
+MODEL_TIMEOUT_SECONDS = float(os.environ.get('MODEL_TIMEOUT_SECONDS', '10'))
+# 0 disables hedging
+HEDGE_AFTER_MS = int(os.environ.get('HEDGE_AFTER_MS', '3000'))
+# 0 disables consensus
+CONSENSUS_AMOUNT_THRESHOLD = float(os.environ.get('CONSENSUS_AMOUNT_THRESHOLD', '0'))
+CONSENSUS_MODEL_COUNT = int(os.environ.get('CONSENSUS_MODEL_COUNT', '2'))
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('CIRCUIT_FAILURE_THRESHOLD', '5'))
+CIRCUIT_RESET_SECONDS = float(os.environ.get('CIRCUIT_RESET_SECONDS', '30'))
+ADJUDICATION_MAX_WORKERS = int(os.environ.get('ADJUDICATION_MAX_WORKERS', '16'))
+
+THROTTLING_ERROR_CODES = {'ThrottlingException', 'TooManyRequestsException', 'ServiceQuotaExceededException',
+                          'ModelNotReadyException'}
+
+# Attempt outcomes
+LIMITED = 'limited'        # no token in this container's rate limiter
+THROTTLED = 'throttled'    # throttled by Bedrock, or the circuit is open
+INVALID = 'invalid'        # answered without a valid decision
+FAILED = 'failed'          # error or timeout
+
+
+class InvalidAnswer(Exception):
+    """
+    The model answered without a valid decision
+    """
+
+
+class ModelsThrottled(Exception):
+    """
+    No model had capacity for the claim
+    """
+
+
+class AdjudicationFailed(Exception):
+    """
+    No model produced a valid decision
+    """
+
+    def __init__(self, message, invalid_answers_only=False):
+        super().__init__(message)
+        self.invalid_answers_only = invalid_answers_only
+
+
+class ModelSpec(NamedTuple):
+    model_id: str
+    timeout: float
+
+
+def parse_models(spec):
+    models = []
+    for entry in spec.split(','):
+        model_id, _, timeout = entry.strip().partition('@')
+        if model_id:
+            models.append(ModelSpec(model_id, float(timeout) if timeout else MODEL_TIMEOUT_SECONDS))
+    return models
+
+
+class CircuitBreaker:
+    """
+    Closed until failure_threshold consecutive failures, then open for reset_seconds,
+    then half open: one trial request decides whether it closes or opens again
+    """
+
+    def __init__(self, failure_threshold, reset_seconds):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_seconds or self.trial_in_flight:
+                return False
+            self.trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        """
+        The allowed request was not sent
+        """
+        with self._lock:
+            self.trial_in_flight = False
+
+
+class Adjudicator:
+    def __init__(self, models):
+        self.models = models
+        self.breakers = {
+            model.model_id: CircuitBreaker(CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS)
+            for model in models
+        }
+        self.executor = ThreadPoolExecutor(max_workers=ADJUDICATION_MAX_WORKERS)
+
+    def max_timeout(self):
+        return max((model.timeout for model in self.models), default=MODEL_TIMEOUT_SECONDS)
+
+    def adjudicate(self, call, amount=None):
+        """
+        Decide the claim with call(model_id), which returns the validated answer
+        or raises. Returns the answer as {"decision", "reason"} JSON text.
+        """
+        if not self.models:
+            raise AdjudicationFailed("No adjudication models are configured")
+        if (CONSENSUS_AMOUNT_THRESHOLD > 0 and amount is not None and amount >= CONSENSUS_AMOUNT_THRESHOLD
+                and len(self.models) > 1):
+            return self.consensus(call)
+
+        outcomes = []
+        answer = self.race(call, outcomes, blocking=False)
+        if answer is None and LIMITED in outcomes:
+            # Every model was out of local capacity: wait for a token like a single-model setup would
+            answer = self.race(call, outcomes, blocking=True)
+        if answer is not None:
+            return answer
+
+        if all(outcome in (LIMITED, THROTTLED) for outcome in outcomes):
+            raise ModelsThrottled(f"No model capacity ({', '.join(outcomes)})")
+        failures = [outcome for outcome in outcomes if outcome not in (LIMITED, THROTTLED)]
+        raise AdjudicationFailed(f"No valid decision from any model ({', '.join(outcomes)})",
+                                 invalid_answers_only=all(outcome == INVALID for outcome in failures))
+
+    def launch(self, call, candidates, pending, outcomes, blocking):
+        """
+        Start an attempt on the first candidate with a closed circuit and a token, waiting for
+        the token only when blocking. Candidates without a token stay in the list for a later
+        fallback or hedge. Returns False when no attempt was started.
+        """
+        for model in list(candidates):
+            breaker = self.breakers[model.model_id]
+            if not breaker.allow():
+                candidates.remove(model)
+                instrumentation.put_metric('CircuitOpen', 1, operation='Adjudication')
+                outcomes.append(THROTTLED)
+                continue
+            max_wait = rate_limiter.RATE_LIMIT_MAX_WAIT_SECONDS if blocking else 0
+            try:
+                rate_limiter.limiter_for(model.model_id).acquire(max_wait)
+            except rate_limiter.RateLimitExceeded:
+                breaker.release()
+                outcomes.append(LIMITED)
+                if blocking:
+                    candidates.remove(model)
+                continue
+            candidates.remove(model)
+            future = self.executor.submit(instrumentation.propagate(call), model.model_id)
+            pending[future] = (model, time.monotonic() + model.timeout)
+            return True
+        return False
+
+    def race(self, call, outcomes, blocking):
+        """
+        Try the models in order, hedging a slow attempt once, until one gives a valid answer
+        """
+        candidates = list(self.models)
+        pending = {}
+        hedge_at = time.monotonic() + HEDGE_AFTER_MS / 1000 if HEDGE_AFTER_MS > 0 else None
+
+        self.launch(call, candidates, pending, outcomes, blocking)
+        while pending:
+            wake_at = min(deadline for _, deadline in pending.values())
+            if hedge_at is not None:
+                wake_at = min(wake_at, hedge_at)
+            done, _ = wait(pending, timeout=max(0.0, wake_at - time.monotonic()), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                model, _ = pending.pop(future)
+                try:
+                    answer = future.result()
+                except Exception as e:
+                    outcomes.append(self.record_failure(model, e))
+                else:
+                    self.breakers[model.model_id].record_success()
+                    logger.info(f"Claim decided by {model.model_id}")
+                    return answer
+
+            now = time.monotonic()
+            for future, (model, deadline) in list(pending.items()):
+                if now >= deadline:
+                    # The call keeps running in the background; its answer is ignored
+                    del pending[future]
+                    logger.warning(f"{model.model_id} did not answer within {model.timeout}s")
+                    instrumentation.put_metric('Timeouts', 1, operation='Adjudication')
+                    self.breakers[model.model_id].record_failure()
+                    outcomes.append(FAILED)
+
+            if hedge_at is not None and now >= hedge_at:
+                hedge_at = None
+                if pending and self.launch(call, candidates, pending, outcomes, blocking=False):
+                    instrumentation.put_metric('Hedges', 1, operation='Adjudication')
+            if not pending and self.launch(call, candidates, pending, outcomes, blocking):
+                instrumentation.put_metric('Fallbacks', 1, operation='Adjudication')
+        return None
+
+    def record_failure(self, model, error):
+        self.breakers[model.model_id].record_failure()
+        if isinstance(error, ClientError) and error.response.get('Error', {}).get('Code') in THROTTLING_ERROR_CODES:
+            logger.warning(f"{model.model_id} throttled: {error}")
+            return THROTTLED
+        if isinstance(error, InvalidAnswer):
+            logger.warning(f"{model.model_id}: {error}")
+            return INVALID
+        logger.error(f"{model.model_id} failed: {error}")
+        return FAILED
+
+    def consensus(self, call):
+        """
+        Ask several models in parallel; a decision needs every answer to agree
+        """
+        candidates = list(self.models)
+        pending = {}
+        outcomes = []
+        while candidates and len(pending) < CONSENSUS_MODEL_COUNT:
+            self.launch(call, candidates, pending, outcomes, blocking=True)
+
+        answers = []
+        for future, (model, deadline) in pending.items():
+            try:
+                answer = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except TimeoutError:
+                self.breakers[model.model_id].record_failure()
+                instrumentation.put_metric('Timeouts', 1, operation='Adjudication')
+                outcomes.append(FAILED)
+            except Exception as e:
+                outcomes.append(self.record_failure(model, e))
+            else:
+                self.breakers[model.model_id].record_success()
+                answers.append((model.model_id, segments.parse_decision(answer)))
+
+        if not answers:
+            if all(outcome in (LIMITED, THROTTLED) for outcome in outcomes):
+                raise ModelsThrottled(f"No model capacity for consensus ({', '.join(outcomes)})")
+            raise AdjudicationFailed(f"No valid decision for consensus ({', '.join(outcomes)})",
+                                     invalid_answers_only=all(outcome == INVALID for outcome in outcomes))
+
+        decisions = {answer['decision'] for _, answer in answers}
+        model_ids = [model_id for model_id, _ in answers]
+        if len(answers) >= 2 and len(decisions) == 1:
+            return json.dumps({'decision': decisions.pop(), 'reason': answers[0][1]['reason'], 'models': model_ids})
+
+        instrumentation.put_metric('ConsensusFailures', 1, operation='Adjudication')
+        if len(answers) < 2:
+            reason = f"High-value claim answered by {len(answers)} model(s), consensus needs at least 2: "
+        else:
+            reason = "Models disagree on a high-value claim: "
+        reason += '; '.join(f"{model_id}: {answer['decision']} - {answer['reason']}" for model_id, answer in answers)
+        return json.dumps({'decision': REVIEW_NEEDED, 'reason': reason, 'models': model_ids})
+
+
+adjudicator = Adjudicator(parse_models(ADJUDICATION_MODELS))
@@ -19,223 +19,444 @@ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
 """
 
 import json
-import boto3
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from botocore.exceptions import ClientError
+from datetime import datetime
+
+import adjudication
+import bda
+import claims_model
+import clients
+import decision_cache
+import instrumentation
+import publisher
+import prompts
+import result_parser
+import routing
+import rules
+import segments
+import sop_context
+import triage
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-BLUE_PRINT_NAME_CHECK = "US-Bank-Check"
-BLUE_PRINT_NAME_RECEIPT = "Receipt"
+# Published after the SOP documents are re-synced into the knowledge base
+KB_SYNC_EVENT_SOURCE = "benefit-claim-kb-sync"
 
+# Upper bound on claims of one SQS batch validated at the same time
+MAX_CLAIM_WORKERS = int(os.environ.get('MAX_CLAIM_WORKERS', '4'))
+# Upper bound on segments fetched and validated at the same time
+MAX_SEGMENT_WORKERS = int(os.environ.get('MAX_SEGMENT_WORKERS', '4'))
 
-logger.debug('boto3.__version_: ', boto3.__version__)
+THROTTLING_ERROR_CODES = {'ThrottlingException', 'TooManyRequestsException', 'ServiceQuotaExceededException'}
+DYNAMODB_THROTTLING_ERROR_CODES = {'ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded'}
 
- # Initialize the Bedrock Agent Runtime client
-bedrock_agent_runtime = boto3.client(service_name="bedrock-agent-runtime")
 
-s3_client = boto3.client('s3')
+class ClaimThrottledError(Exception):
+    """
+    Bedrock or DynamoDB had no capacity for the claim; the SQS message is retried later
+    """
 
-eventbridge = boto3.client('events')
 
-dynamodb = boto3.client('dynamodb')
+def bedrock_runtime():
+    """
+    Other models take over from a failed call, so botocore does not retry; the read timeout is the longest model timeout
+    """
+    return clients.get_client('bedrock-runtime', max_attempts=1, read_timeout=adjudication.adjudicator.max_timeout())
 
+@instrumentation.handler('validation')
 def lambda_handler(event, context):
-    logger.debug('boto3.__version_: ', boto3.__version__)
-    logger.info('BDA_EVENT_RECEIVED: ',event)
-
-    # TODO implement
-    #read BDA_invocation_Id from the event
-    bda_invocation_details = event['detail']
-    logger.info(f"bda_invocation_details: {bda_invocation_details}")
-    bda_invocation_id = bda_invocation_details['job_id']
-    logger.info(f"bda_invocation_id: {bda_invocation_id}")
+    instrumentation.log_payload('BDA_EVENT_RECEIVED', event)
+
+    if event.get('source') == KB_SYNC_EVENT_SOURCE:
+        generation = decision_cache.invalidate()
+        sop_context.invalidate()
+        return {
+            'statusCode': 200,
+            'body': {'generation': generation}
+        }
 
-    job_status = bda_invocation_details['job_status']
-    logger.info(f"job_status: {job_status}")
+    if event.get('detail-type') == 'Scheduled Event':
+        published, failed = publisher.relay_pending_outbox(clients.get_client('events'), clients.get_client('dynamodb'), os.getenv('BDA_TABLE_NAME'))
+        return {
+            'statusCode': 200,
+            'body': {'published': published, 'failed': failed}
+        }
 
-    object_key = bda_invocation_details['input_s3_object']['name']
+    # BDA completion events arrive in batches through the validation queue
+    if 'Records' in event:
+        return process_sqs_batch(event['Records'])
 
-    output_s3_location = bda_invocation_details['output_s3_location']
-    logger.info(f"output_s3_location: {output_s3_location}")
+    event_publisher = publisher.EventPublisher(clients.get_client('events'), clients.get_client('dynamodb'), os.getenv('BDA_TABLE_NAME'))
+    results = process_claim(event, event_publisher)
+    event_publisher.flush()
+    logger.info('event published to eventbridge')
 
-    bucket_name = output_s3_location['s3_bucket']
-    logger.info(f"bucket_name: {bucket_name}")
+    return {
+        'statusCode': 200,
+        'body': results
+    }
 
-    bda_output_path = output_s3_location['name']
-    logger.info(f"bda_output_path: {bda_output_path}")
-  
-    bda_result_suffix = '/custom_output/0/result.json'
-    bda_result_object_key = bda_output_path+''+bda_result_suffix
-    logger.info(bda_result_object_key)
-    
-    response = s3_client.get_object(Bucket=bucket_name, Key=bda_result_object_key)
-    data = response['Body'].read().decode('utf-8')
-    json_data = json.loads(data)
-    logger.info(json_data)
-
-    blue_print_name = json_data['matched_blueprint']['name']
-    logger.info(f"blue_print_name: {blue_print_name}")
+def process_sqs_batch(records):
+    """
+    Validate a batch of BDA completion events with bounded concurrency.
+    Failed messages are reported back so that only they are retried.
+    """
+    event_publisher = publisher.EventPublisher(clients.get_client('events'), clients.get_client('dynamodb'), os.getenv('BDA_TABLE_NAME'))
+    batch_item_failures = []
 
-    results = json_data['inference_result']
-    logger.info(f"results: {results}")
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_CLAIM_WORKERS, len(records)))) as executor:
+        futures = {
+            executor.submit(instrumentation.propagate(process_claim), json.loads(record['body']), event_publisher): record['messageId']
+            for record in records
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except ClaimThrottledError as e:
+                logger.warning(f"Claim throttled, message {futures[future]} will be retried: {e}")
+                batch_item_failures.append({'itemIdentifier': futures[future]})
+            except Exception as e:
+                logger.error(f"Error processing message {futures[future]}: {e}")
+                batch_item_failures.append({'itemIdentifier': futures[future]})
+
+    # Decision events of the whole batch go out in PutEvents batches
+    event_publisher.flush()
+    logger.info(f"Batch processed: {len(records) - len(batch_item_failures)} succeeded, {len(batch_item_failures)} failed")
+
+    return {'batchItemFailures': batch_item_failures}
+
+def process_claim(event, event_publisher):
+    """
+    Validate the claim of one BDA completion event and queue its decision event
+    """
+    job = bda.parse_job_event(event)
+    bda_invocation_id = job.job_id
+    # The BDA invocation id is the correlation id set by the extraction lambda
+    instrumentation.set_correlation_id(bda_invocation_id)
+    logger.info(f"bda_invocation_id: {bda_invocation_id}")
 
-    update_in_dynamodb(bda_invocation_id, object_key, job_status, results, blue_print_name)
+    job_status = job.job_status
+    logger.info(f"job_status: {job_status}")
 
-    confidence_results = process_explainability_info(json_data)
-    logger.info(f"confidence_results: ', {confidence_results}")
+    object_key = job.input_key
+    logger.info(f"bucket_name: {job.output_bucket}")
+    logger.info(f"bda_output_path: {job.output_path}")
+  
+    # A multi-document upload is split by BDA into one custom output per segment
+    result_segments = segments.find_result_segments(clients.get_client('s3'), job.output_bucket, job.output_path)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_SEGMENT_WORKERS, len(result_segments)))) as executor:
+        segment_results = list(executor.map(instrumentation.propagate(validate_segment), result_segments))
 
-    approval_response = validateBenefitClaim(results, blue_print_name)
-    logger.info(f"approval response: ',{approval_response}")
+    # Segments rejected at triage only decide the claim when none was accepted
+    decided_segments = accepted_segments(segment_results)
+    approval_response = segments.aggregate_decisions(decided_segments)
+    logger.info(f"approval response: {approval_response}")
 
+    results = decided_segments[0]['inference_result']
     detail = {
         'bda_invocation_id': bda_invocation_id,
         'inference_result': results,
         'validation_result': approval_response
     }
-
-    eventbridge.put_events(
-        Entries=[
+    if len(segment_results) > 1:
+        detail['segments'] = [
             {
-                'Source': 'benefit-claim-validation-function',
-                'DetailType': 'Benefit Claim Validation Completed',
-                'Detail': json.dumps(detail)
+                'blueprint': segment_result['blueprint'],
+                'inference_result': segment_result['inference_result'],
+                'validation_result': segment_result['validation_result']
             }
+            for segment_result in segment_results
         ]
-    )
-    logger.info('event published to eventbridge')
-    
+
+    # The decision and its outbox event are written together, then the event is published.
+    # A failed write raises, so the message is retried and no event goes out for an unstored decision.
+    outbox_created_at = update_in_dynamodb(bda_invocation_id, object_key, job_status, segment_results, approval_response, detail)
+    outbox_key = {'invocationId': {'S': bda_invocation_id}, 'fileName': {'S': object_key}}
+
+    event_publisher.add(detail, publisher.OutboxEntry(outbox_key, outbox_created_at))
+    return results
+
+def accepted_segments(segment_results):
+    """
+    The segments accepted at triage, or all of them when every segment was rejected
+    """
+    accepted = [segment_result for segment_result in segment_results
+                if segment_result['triage'].result == triage.TRIAGE_ACCEPTED]
+    return accepted or segment_results
+
+def validate_segment(segment):
+    """
+    Fetch one custom output segment, triage it and validate it
+    """
+    if segment['custom_output_key'] is None:
+        bda_result = bda.BdaResult(triage.UNMATCHED_BLUEPRINT, None, {}, [])
+    else:
+        logger.info(f"Fetching segment {segment['index']}: {segment['custom_output_key']}")
+        try:
+            with instrumentation.span('GetObject', key=segment['custom_output_key']) as get_span:
+                response = clients.get_client('s3').get_object(Bucket=segment['bucket'], Key=segment['custom_output_key'])
+                # Streams the body and keeps only the blueprint, inference result and confidences
+                bda_result = bda.parse_result(result_parser.parse_result(response['Body']))
+                get_span.metric('BytesRead', response.get('ContentLength', 0), 'Bytes')
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'NoSuchKey':
+                raise
+            # A job that produced no custom output has nothing to validate: it goes to review
+            logger.warning(f"Custom output {segment['custom_output_key']} not found, routing the segment to review")
+            return missing_output_result(segment)
+
+    # Rules, prompts, thresholds and SOP queries are keyed on the rule key of the blueprint
+    blue_print_name = rules.blueprint_key(bda_result.blueprint_name)
+    logger.info(f"blue_print_name: {blue_print_name}")
+
+    results = bda_result.inference_result
+    instrumentation.log_payload('results', results)
+
+    # Uploads that are not claims are rejected before any knowledge base or model call
+    segment_triage = triage.triage_segment(blue_print_name, lambda: read_standard_output(segment))
+    if segment_triage.result == triage.TRIAGE_REJECTED:
+        instrumentation.put_metric('TriageRejections', 1, operation='Claim')
+        route = routing.Route(triage.ROUTE_REJECTED, [], segment_triage.reason)
+        validation_result = triage.rejection_decision(segment_triage)
+    else:
+        route = routing.route_claim(blue_print_name, bda_result.field_confidences, results)
+        logger.info(f"route: {route.route}")
+
+        # Low-confidence extractions go to review without spending a knowledge base call
+        if route.route == routing.ROUTE_REVIEW:
+            validation_result = routing.review_decision(route)
+        else:
+            validation_result = validateBenefitClaim(results, blue_print_name)
+
     return {
-        'statusCode': 200,
-        'body': results
+        'index': segment['index'],
+        'blueprint': blue_print_name,
+        'inference_result': results,
+        'route': route,
+        'triage': segment_triage,
+        'validation_result': validation_result
     }
 
-def process_explainability_info(json_response):
+def missing_output_result(segment):
     """
-    Process and print explainability information from the JSON response
+    Result of a segment whose custom output does not exist
     """
-    try:
-        explainability_info = json_response['explainability_info'][0]
-        results = {}
-
-        # Process each field in explainability_info
-        for field, data in explainability_info.items():
-            # Get confidence if it exists
-            if 'confidence' in data:
-                results[f"{field}_confidence"] = data['confidence']
-
-            # Get success if it exists
-            if 'success' in data:
-                results[f"{field}_success"] = data['success']
-
-            # Get value if it exists
-            if 'value' in data:
-                results[f"{field}_value"] = data['value']
-
-        # Print results in a formatted way
-        # print("\nExplainability Information:")
-        # print("-" * 50)
-        #
-        # # Print confidence values
-        # print("\nConfidence Scores:")
-        confidence_scores = {k: v for k, v in results.items() if k.endswith('_confidence')}
-
-        return confidence_scores
-
-    except KeyError as e:
-        logger.error(f"Error: Missing key in JSON response: {e}")
+    route = routing.Route(routing.ROUTE_REVIEW, [], "BDA produced no custom output for the document")
+    return {
+        'index': segment['index'],
+        'blueprint': triage.UNMATCHED_BLUEPRINT,
+        'inference_result': {},
+        'route': route,
+        'triage': triage.ACCEPTED,
+        'validation_result': routing.review_decision(route)
+    }
+
+def read_standard_output(segment):
+    """
+    Statistics and text of the standard output of a segment, None when it is not available
+    """
+    if not segment['standard_output_key']:
         return None
-    except Exception as e:
-        logger.error(f"Error processing explainability info: {e}")
+    try:
+        with instrumentation.span('GetObject', key=segment['standard_output_key']) as get_span:
+            response = clients.get_client('s3').get_object(Bucket=segment['bucket'], Key=segment['standard_output_key'])
+            standard_output = result_parser.parse_standard_output(response['Body'])
+            # The parser stops at the statistics; release the connection without reading the rest
+            response['Body'].close()
+            get_span.metric('BytesRead', response.get('ContentLength', 0), 'Bytes')
+    except (ClientError, ValueError) as e:
+        logger.warning(f"Standard output {segment['standard_output_key']} not available ({e}), skipping the text check")
         return None
+    return standard_output
 
-def update_in_dynamodb(invocation_id, object_key, status, inference_result, blue_print_name):
+def update_in_dynamodb(invocation_id, object_key, status, segment_results, validation_result, outbox_event):
+    """
+    Store the decision and its outbox event. Returns the outboxCreatedAt of the event.
+    Raises ClaimThrottledError when DynamoDB is throttled and the client error otherwise.
+    """
     table_name = os.getenv('BDA_TABLE_NAME')
     logger.info(f"Table Name: {table_name}")
     logger.info(f"invocationId: {invocation_id}")
-    logger.info(f"inference_result: {inference_result}")
-    inference_result_str = json.dumps(inference_result)
+
+    # A single segment keeps the original item shape; multiple segments store the list of results
+    if len(segment_results) == 1:
+        inference_result = segment_results[0]['inference_result']
+    else:
+        inference_result = [segment_result['inference_result'] for segment_result in segment_results]
+    instrumentation.log_payload('inference_result', inference_result)
+    decided_segments = accepted_segments(segment_results)
+    blue_print_name = decided_segments[0]['blueprint']
+    claim_triage, rejected_segments = triage.claim_triage(segment_results)
+
+    low_confidence_fields = []
+    for segment_result in segment_results:
+        prefix = f"{segment_result['index']}:" if len(segment_results) > 1 else ""
+        low_confidence_fields.extend(prefix + field for field in segment_result['route'].low_confidence_fields)
+    routes = [segment_result['route'] for segment_result in decided_segments]
+    route = next((r for r in routes if r.route == routing.ROUTE_REVIEW), routes[0])
+
     key = {
         'invocationId': {'S': invocation_id},
         'fileName': {'S': object_key}
     }
-    update_expression = f"SET #status = :status, #inferenceResult = :inferenceResult, #bluePrintName = :bluePrintName"
+    # Decision, blueprint, claimant, vendor, amount and the native-map inference result.
+    # Derived attributes come from the first accepted segment, never from a page rejected at triage.
+    claim_attributes = claims_model.claim_attributes(blue_print_name, inference_result, validation_result,
+                                                     decided_segments[0]['inference_result'])
+    claim_expression = ", ".join(f"#{name} = :{name}" for name in claim_attributes)
+
+    now = claims_model.now_iso()
+    outbox_expression, outbox_names, outbox_values = publisher.outbox_attributes(outbox_event, now)
+    update_expression = f"SET #status = :status, #routing = :routing, #triage = :triage, #segmentCount = :segmentCount, #validationResult = :validationResult, #updatedAt = :now, #createdAt = if_not_exists(#createdAt, :now), #decidedAt = if_not_exists(#decidedAt, :now), {claim_expression}, {outbox_expression}"
     expression_names = {
         '#status': 'status',
-        '#inferenceResult' : 'inferenceResult',
-        '#bluePrintName': 'bluePrintName'
+        '#routing': 'routing',
+        '#triage': 'triage',
+        '#segmentCount': 'segmentCount',
+        '#validationResult': 'validationResult',
+        '#updatedAt': 'updatedAt',
+        '#createdAt': 'createdAt',
+        '#decidedAt': 'decidedAt',
+        **{f"#{name}": name for name in claim_attributes},
+        **outbox_names
     }
     expression_values = {
         ':status': {'S': status},
-        ':inferenceResult': {'S': inference_result_str},
-        ':bluePrintName': {'S': blue_print_name}
-    }    
+        ':now': {'S': now},
+        **{f":{name}": value for name, value in claim_attributes.items()},
+        ':routing': {'M': {
+            'route': {'S': route.route},
+            'reason': {'S': route.reason},
+            'lowConfidenceFields': {'L': [{'S': field} for field in low_confidence_fields]}
+        }},
+        ':triage': {'M': {
+            'result': {'S': claim_triage.result},
+            'reason': {'S': claim_triage.reason},
+            'rejectedSegments': {'N': str(rejected_segments)}
+        }},
+        ':segmentCount': {'N': str(len(segment_results))},
+        ':validationResult': {'S': validation_result or ''},
+        **outbox_values
+    }
+    if len(segment_results) > 1:
+        # Blueprint and triage result of every entry of inferenceResult, to decide the claim again later
+        update_expression += ", #segments = :segments"
+        expression_names['#segments'] = 'segments'
+        expression_values[':segments'] = {'L': [
+            {'M': {
+                'blueprint': {'S': segment_result['blueprint']},
+                'triage': {'S': segment_result['triage'].result}
+            }}
+            for segment_result in segment_results
+        ]}
     try:
-        dynamodb.update_item(
-            TableName=table_name,
-            Key = key,
-            UpdateExpression=update_expression,
-            ExpressionAttributeValues=expression_values,
-            ExpressionAttributeNames=expression_names,
-            ReturnValues="UPDATED_NEW"
-        )
-    except Exception as e:
-        logger.error(f"Error:, {e}")
+        with instrumentation.span('UpdateItem') as update_span:
+            response = clients.get_client('dynamodb').update_item(
+                TableName=table_name,
+                Key = key,
+                UpdateExpression=update_expression,
+                ExpressionAttributeValues=expression_values,
+                ExpressionAttributeNames=expression_names,
+                # The old item carries the upload time for the end-to-end latency
+                ReturnValues="ALL_OLD",
+                ReturnConsumedCapacity="TOTAL"
+            )
+            update_span.metric('WriteCapacityUnits', response.get('ConsumedCapacity', {}).get('CapacityUnits', 0))
+    except ClientError as e:
+        logger.error(f"Error updating the claim {invocation_id}: {e}")
+        if e.response.get('Error', {}).get('Code') in DYNAMODB_THROTTLING_ERROR_CODES:
+            raise ClaimThrottledError(str(e)) from e
+        raise
+
+    record_claim_latency(response.get('Attributes', {}), now)
+    return now
+
+def record_claim_latency(old_item, decided_at):
+    """
+    Record the time from upload to decision. Only the first decision of a claim is counted.
+    """
+    if 'validationResult' in old_item:
+        return
+    uploaded_at = old_item.get('uploadedAt', old_item.get('createdAt', {})).get('S')
+    if not uploaded_at:
+        return
+    try:
+        latency = datetime.fromisoformat(decided_at) - datetime.fromisoformat(uploaded_at)
+    except ValueError:
+        return
+    instrumentation.put_metric('ClaimLatency', latency.total_seconds() * 1000, 'Milliseconds', 'Claim')
 
 def validateBenefitClaim(claimReceiptData, blue_print_name):
-    # Define the input for the retrieve_and_generate request
-    # receipt =   {"benefitClaimsReceipt": {
-    #     "PAYMENTDETAILS":{"TOTAL": 202.97, "SUBTOTAL": 202.97, "TAX": [0], "AMOUNTPAID": 202.97},
-    #     "VENDORDETAILS": {"VENDORADDRESS": "670 51 10736 384601 9702", "VENDORPHONE": "", "VENDORNAME": "LOCAL DRUGS"},
-    #     "RECEIPT_ID": "", "expire": "True", "RECEIPT_DATE": "07/22/2020",
-    #     "LINEITEMS": [{"PRODUCT": "Pain Killer", "QTY": 1, "AMT": 2.99}, {"PRODUCT": "Corona Medication", "QTY": 2, "AMT": 199.98}]
-    # }
-    # }
-
-    if blue_print_name == BLUE_PRINT_NAME_CHECK:
-        context = f"""here is a benefit claim check: ${claimReceiptData}"""
-        input_text = f"""${context}. Should claim for this check be approved? Generate your response in JSON format with following fields: decision (approved/not approved/ review needed) and reason (why approved/why not approved/or why review is needed)"""
-    elif blue_print_name == BLUE_PRINT_NAME_RECEIPT:
-        context = f"""here is a benefit claim receipt: ${claimReceiptData}"""
-        input_text = f"""${context}. Should claim for this pharmacy receipt be approved? Generate your response in JSON format with following fields: decision (approved/not approved/ review needed) and reason (why approved/why not approved/or why review is needed)"""
-    else:
-        context = f"""here is a benefit claim document: ${claimReceiptData}"""
-        input_text = f"""${context}. Should claim for this document be approved? Generate your response in JSON format with following fields: decision (approved/not approved/ review needed) and reason (why approved/why not approved/or why review is needed)"""
+    # Clear-cut claims are decided by the deterministic rules without calling the knowledge base
+    rules_response = rules.evaluate(claimReceiptData, blue_print_name)
+    if rules_response is not None:
+        instrumentation.put_metric('RuleDecisions', 1, operation='Claim')
+        return rules_response
 
+    kb_id = os.environ['KNOWLEDGE_BASE_ID']
 
+    # Compact canonical text of the fields the SOPs need, within the prompt token budget
+    input_text = prompts.build_prompt(claimReceiptData, blue_print_name)
 
-    kb_id = os.environ['KNOWLEDGE_BASE_ID']
-    modelId = os.environ['KNOWLEDGE_BASE_MODEL_ID']
+    # Claims that render to the same prompt get the decision made for the first one
+    cache_key = decision_cache.cache_key(blue_print_name, input_text, kb_id, adjudication.ADJUDICATION_MODELS)
+    cached_response = decision_cache.get(cache_key)
+    if cached_response is not None:
+        instrumentation.put_metric('CachedDecisions', 1, operation='Claim')
+        return cached_response
+
+    # The SOP passages are retrieved once per blueprint and reused for every claim
     try:
-        # Define the configuration for retrieval and generation
-        retrieve_and_generate_config = {
-            "knowledgeBaseConfiguration": {
-                "knowledgeBaseId": kb_id,
-                "modelArn": modelId
-            },
-            "type": "KNOWLEDGE_BASE"
-            # Add any other configurations as needed
-        }
-        
-        # Call the retrieve_and_generate method
-        response = bedrock_agent_runtime.retrieve_and_generate(
-            input={"text": input_text},
-            retrieveAndGenerateConfiguration=retrieve_and_generate_config,
-        )
-        # Process the response
-        validation_response = ""
-        if "output" in response and "text" in response["output"]:
-            validation_response = response["output"]["text"]
-            logger.info(f"Generated Text:, {validation_response}")
-
-            if "retrievedReferences" in response:
-                logger.info("Retrieved References:")
-                for ref in response["retrievedReferences"]:
-                    logger.info(f"  - Source: {ref['content']['text']}")
-        else:
-            logger.info("No output or text found in the response.")
-        return validation_response
-    except Exception as e:
-        logger.error(f"Error:, {e}")
-        return validation_response
+        passages = sop_context.get_passages(clients.get_client('bedrock-agent-runtime'), kb_id, blue_print_name)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in THROTTLING_ERROR_CODES:
+            raise ClaimThrottledError(str(e)) from e
+        raise
+    if not passages:
+        raise adjudication.AdjudicationFailed(f"No SOP passages retrieved for {blue_print_name}")
+    system_prompt = prompts.system_prompt(passages)
+
+    def converse(model_id):
+        with instrumentation.span('Converse', blueprint=blue_print_name, model=model_id) as model_span:
+            response = bedrock_runtime().converse(
+                modelId=model_id,
+                system=[{"text": system_prompt}],
+                messages=[{"role": "user", "content": [{"text": input_text}]}],
+                inferenceConfig=prompts.inference_configuration()
+            )
+            usage = response.get("usage", {})
+            model_span.metric('InputTokens', usage.get("inputTokens", 0))
+            model_span.metric('OutputTokens', usage.get("outputTokens", 0))
+        content = response.get("output", {}).get("message", {}).get("content", [])
+        generated_text = "".join(block.get("text", "") for block in content)
+        instrumentation.log_payload('Generated Text', generated_text)
+        answer = prompts.parse_response(generated_text)
+        if answer is None:
+            raise adjudication.InvalidAnswer("The answer has no valid decision")
+        return answer
+
+    # High-value claims can be decided by several models (CONSENSUS_AMOUNT_THRESHOLD)
+    amount = claims_model.claim_amount(blue_print_name, rules.flatten_fields(claimReceiptData)) \
+        if isinstance(claimReceiptData, dict) else None
+    try:
+        with instrumentation.span('Adjudicate', blueprint=blue_print_name):
+            validation_response = adjudication.adjudicator.adjudicate(converse, amount)
+    except adjudication.ModelsThrottled as e:
+        # No capacity must not turn into an empty decision; the claim is retried instead
+        raise ClaimThrottledError(str(e)) from e
+    except adjudication.AdjudicationFailed as e:
+        if not e.invalid_answers_only:
+            # Raised so that the message is retried and ends in the dead-letter queue, not published empty
+            raise
+        # An answer without a valid decision is not cached; a person decides the claim
+        logger.warning(f"No valid model answer for a {blue_print_name} claim: {e}")
+        instrumentation.put_metric('UnparseableAnswers', 1, operation='Claim')
+        return json.dumps({'decision': rules.REVIEW_NEEDED, 'reason': 'The model answer had no valid decision'})
+
+    decision_cache.put(cache_key, validation_response)
+    return validation_response
@@ -0,0 +1,163 @@
+"""
+MIT No Attribution
+
+Copyright 2024 Amazon Web Services
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+
+Item model of the benefit claims table.
+
+Items are keyed by invocationId + fileName. Next to the BDA job status every
+validated claim carries the attributes used by the query indexes:
+
+    status, updatedAt        StatusDateIndex
+    decision, updatedAt      DecisionDateIndex
+    bluePrintName, updatedAt BlueprintDateIndex
+    fileName, createdAt      FileNameIndex (claim progress of an upload)
+
+plus createdAt, decidedAt (time of the first decision), claimant, vendor,
+amount and triage (result, reason and number of rejected segments). Timestamps
+are ISO 8601 UTC strings, so a day is a begins_with / BETWEEN on the sort key.
+inferenceResult is stored as a native map (a list of maps for multi-segment
+claims) instead of a JSON string, with null values dropped. Multi-segment
+claims also carry segments, the blueprint and triage result of each entry.
+
+Claims decided again by tools/readjudicate_claims.py also carry
+previousDecision and readjudicatedAt.
+"""
+
+import functools
+import json
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import rules
+import segments
+from claims_table import (  # noqa: F401
+    BLUEPRINT_DATE_INDEX, DECISION_DATE_INDEX, FILE_NAME_INDEX, SCHEMA_VERSION, STATUS_DATE_INDEX
+)
+
+AMOUNT_FIELDS = {
+    rules.BLUE_PRINT_NAME_CHECK: rules.CHECK_AMOUNT_FIELDS,
+    rules.BLUE_PRINT_NAME_RECEIPT: rules.RECEIPT_TOTAL_FIELDS
+}
+CLAIMANT_FIELDS = ['payto', 'paytotheorderof', 'payee', 'payeename', 'customername', 'patientname', 'claimant']
+VENDOR_FIELDS = ['vendorname', 'merchantname', 'storename', 'payername']
+
+
+@functools.cache
+def type_serializers():
+    """
+    (TypeSerializer, TypeDeserializer), imported on first use like the boto3 clients
+    """
+    from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+    return TypeSerializer(), TypeDeserializer()
+
+
+def now_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def compact(value):
+    """
+    Drop null members recursively; DynamoDB does not need to store them
+    """
+    if isinstance(value, dict):
+        return {key: compact(member) for key, member in value.items() if member is not None}
+    if isinstance(value, list):
+        return [compact(member) for member in value if member is not None]
+    return value
+
+
+def to_attribute_value(value):
+    """
+    Serialize a JSON-like value to a DynamoDB attribute value (floats become Decimal numbers)
+    """
+    value = json.loads(json.dumps(compact(value), default=str), parse_float=Decimal)
+    return type_serializers()[0].serialize(value)
+
+
+def from_attribute_value(attribute_value):
+    """
+    Deserialize an attribute value back to plain JSON types
+    """
+    return _plain(type_serializers()[1].deserialize(attribute_value))
+
+
+def from_item(item):
+    return {name: from_attribute_value(value) for name, value in item.items()}
+
+
+def _plain(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, dict):
+        return {key: _plain(member) for key, member in value.items()}
+    if isinstance(value, (list, set)):
+        return [_plain(member) for member in value]
+    return value
+
+
+def first_text(fields, field_names):
+    for field_name in field_names:
+        value = fields.get(field_name)
+        if isinstance(value, str) and value.strip():
+            return value.strip()
+    return None
+
+
+def claim_attributes(blue_print_name, inference_result, validation_result, decided_result=None):
+    """
+    Query attributes of a validated claim. Claimant, vendor and amount are read
+    from decided_result, the inference result of the segment the claim was decided
+    on (by default the first one). Attributes that cannot be read from the
+    document are left out rather than stored empty, so the items stay out of
+    sparse indexes on them.
+    """
+    if decided_result is None:
+        results = inference_result if isinstance(inference_result, list) else [inference_result]
+        decided_result = results[0]
+    fields = rules.flatten_fields(decided_result or {})
+
+    attributes = {
+        'bluePrintName': {'S': blue_print_name},
+        'decision': {'S': segments.normalize_decision(segments.parse_decision(validation_result).get('decision'))},
+        'inferenceResult': to_attribute_value(inference_result),
+        'schemaVersion': {'N': str(SCHEMA_VERSION)}
+    }
+
+    claimant = first_text(fields, CLAIMANT_FIELDS)
+    if claimant:
+        attributes['claimant'] = {'S': claimant}
+    vendor = first_text(fields, VENDOR_FIELDS)
+    if vendor:
+        attributes['vendor'] = {'S': vendor}
+
+    amount = claim_amount(blue_print_name, fields)
+    if amount is not None:
+        attributes['amount'] = {'N': str(Decimal(str(round(amount, 2))))}
+
+    return attributes
+
+
+def claim_amount(blue_print_name, fields):
+    """
+    Amount of the claim from the flattened fields of its inference result, or None
+    """
+    for field_name in AMOUNT_FIELDS.get(blue_print_name, rules.CHECK_AMOUNT_FIELDS + rules.RECEIPT_TOTAL_FIELDS):
+        amount = rules.parse_amount(fields.get(rules.normalize_name(field_name)))
+        if amount is not None:
+            return amount
+    return None
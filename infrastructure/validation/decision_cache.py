@@ -0,0 +1,220 @@
+"""
+MIT No Attribution
+
+Copyright 2024 Amazon Web Services
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+
+Content-addressed cache for benefit claim decisions.
+
+Decisions are keyed on a SHA-256 of the canonical JSON of the blueprint name,
+claim prompt (prompts.py renders it canonically), knowledge base id, model id
+and the knowledge base generation.
+Lookups go to an in-process LRU first and then to the DynamoDB cache table.
+
+Re-syncing the knowledge base bumps the generation stored in the cache table,
+so every key computed afterwards is new. Containers re-read the generation
+every GENERATION_REFRESH_SECONDS; entries from older generations are never
+read again and expire through the table TTL.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import clients
+
+logger = logging.getLogger()
+
+DECISION_CACHE_TABLE_NAME = os.environ.get('DECISION_CACHE_TABLE_NAME')
+DECISION_CACHE_TTL_SECONDS = int(os.environ.get('DECISION_CACHE_TTL_SECONDS', '86400'))
+DECISION_CACHE_MAX_ENTRIES = int(os.environ.get('DECISION_CACHE_MAX_ENTRIES', '256'))
+GENERATION_REFRESH_SECONDS = int(os.environ.get('DECISION_CACHE_GENERATION_REFRESH_SECONDS', '60'))
+
+GENERATION_CACHE_KEY = '__kb_generation__'
+
+class LRUCache:
+    """
+    Thread safe LRU with a per-entry expiry time
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_cache = LRUCache(DECISION_CACHE_MAX_ENTRIES)
+
+_generation = None
+_generation_read_at = 0.0
+
+
+def cache_key(blue_print_name, claim, kb_id, model_id):
+    """
+    Canonical hash of everything that determines a decision
+    """
+    canonical = json.dumps(
+        {
+            'blueprint': blue_print_name,
+            'claim': claim,
+            'kb_id': kb_id,
+            'model_id': model_id,
+            'generation': current_generation()
+        },
+        sort_keys=True,
+        separators=(',', ':'),
+        ensure_ascii=False,
+        default=str
+    )
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def current_generation():
+    """
+    Knowledge base generation, re-read from the cache table at most every GENERATION_REFRESH_SECONDS
+    """
+    global _generation, _generation_read_at
+    now = time.time()
+    if _generation is not None and now - _generation_read_at < GENERATION_REFRESH_SECONDS:
+        return _generation
+
+    generation = 0
+    if DECISION_CACHE_TABLE_NAME:
+        try:
+            response = clients.get_client('dynamodb').get_item(
+                TableName=DECISION_CACHE_TABLE_NAME,
+                Key={'cacheKey': {'S': GENERATION_CACHE_KEY}},
+                ConsistentRead=True
+            )
+            generation = int(response.get('Item', {}).get('generation', {}).get('N', '0'))
+        except Exception as e:
+            logger.error(f"Error reading the knowledge base generation: {e}")
+            generation = _generation or 0
+
+    if generation != _generation:
+        local_cache.clear()
+    _generation = generation
+    _generation_read_at = now
+    return generation
+
+
+def get(key):
+    """
+    Return the cached decision for key, or None
+    """
+    decision = local_cache.get(key)
+    if decision is not None:
+        logger.info(f"Decision cache hit (memory): {key}")
+        return decision
+
+    if not DECISION_CACHE_TABLE_NAME:
+        return None
+
+    try:
+        response = clients.get_client('dynamodb').get_item(
+            TableName=DECISION_CACHE_TABLE_NAME,
+            Key={'cacheKey': {'S': key}}
+        )
+    except Exception as e:
+        logger.error(f"Error reading the decision cache: {e}")
+        return None
+
+    item = response.get('Item')
+    if not item:
+        return None
+    # TTL deletion is lazy, so expired items can still be returned by GetItem
+    expires_at = int(item['expiresAt']['N'])
+    if expires_at <= time.time():
+        return None
+
+    decision = item['decision']['S']
+    local_cache.put(key, decision, expires_at)
+    logger.info(f"Decision cache hit (table): {key}")
+    return decision
+
+
+def put(key, decision):
+    """
+    Store decision in both cache tiers
+    """
+    expires_at = int(time.time()) + DECISION_CACHE_TTL_SECONDS
+    local_cache.put(key, decision, expires_at)
+
+    if not DECISION_CACHE_TABLE_NAME:
+        return
+    try:
+        clients.get_client('dynamodb').put_item(
+            TableName=DECISION_CACHE_TABLE_NAME,
+            Item={
+                'cacheKey': {'S': key},
+                'decision': {'S': decision},
+                'expiresAt': {'N': str(expires_at)}
+            }
+        )
+    except Exception as e:
+        logger.error(f"Error writing the decision cache: {e}")
+
+
+def invalidate():
+    """
+    Invalidate every cached decision, e.g. after the knowledge base is re-synced
+    """
+    global _generation, _generation_read_at
+    local_cache.clear()
+    if not DECISION_CACHE_TABLE_NAME:
+        _generation = (_generation or 0) + 1
+        _generation_read_at = time.time()
+        return _generation
+
+    response = clients.get_client('dynamodb').update_item(
+        TableName=DECISION_CACHE_TABLE_NAME,
+        Key={'cacheKey': {'S': GENERATION_CACHE_KEY}},
+        UpdateExpression='ADD #generation :one',
+        ExpressionAttributeNames={'#generation': 'generation'},
+        ExpressionAttributeValues={':one': {'N': '1'}},
+        ReturnValues='UPDATED_NEW'
+    )
+    _generation = int(response['Attributes']['generation']['N'])
+    _generation_read_at = time.time()
+    logger.info(f"Decision cache invalidated, knowledge base generation is now {_generation}")
+    return _generation
@@ -0,0 +1,223 @@
+"""
+MIT No Attribution
+
+Copyright 2024 Amazon Web Services
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+
+Prompts for knowledge base adjudication and parsing of the model's answer.
+
+A claim is rendered as compact canonical text: one "name: value" line per
+field the SOPs need (PROMPT_FIELDS), amounts rounded to cents, and line
+items sorted by amount, largest first. Blueprints without a field list get
+all their scalar fields, sorted by path. The same claim therefore always
+produces the same prompt, whatever the key order or formatting of the
+extraction, and the prompt is also the decision cache key.
+
+The claim text is kept within PROMPT_TOKEN_BUDGET (estimated at
+CHARS_PER_TOKEN characters per token) by dropping the smallest line items,
+then trailing fields, and saying how many were left out.
+"""
+
+import json
+import logging
+import math
+import os
+
+import rules
+import segments
+
+logger = logging.getLogger()
+
+# Estimated tokens available for the claim text; the instructions come on top
+PROMPT_TOKEN_BUDGET = int(os.environ.get('PROMPT_TOKEN_BUDGET', '300'))
+# Upper bound on the tokens of the model's answer
+RESPONSE_MAX_TOKENS = int(os.environ.get('RESPONSE_MAX_TOKENS', '200'))
+CHARS_PER_TOKEN = 4
+MAX_VALUE_CHARS = 80
+
+DECISIONS = (rules.APPROVED, rules.NOT_APPROVED, rules.REVIEW_NEEDED)
+
+DOCUMENT_NOUNS = {
+    rules.BLUE_PRINT_NAME_CHECK: 'check',
+    rules.BLUE_PRINT_NAME_RECEIPT: 'pharmacy receipt'
+}
+
+# (label, normalized field names in order of preference, kind), per blueprint
+PROMPT_FIELDS = {
+    rules.BLUE_PRINT_NAME_CHECK: [
+        ('amount', rules.CHECK_AMOUNT_FIELDS, 'amount'),
+        ('date', ['date', 'checkdate'], 'text')
+    ],
+    rules.BLUE_PRINT_NAME_RECEIPT: [
+        ('total', rules.RECEIPT_TOTAL_FIELDS, 'amount'),
+        ('receipt date', ['receiptdate', 'date'], 'text'),
+        ('vendor', ['vendorname', 'merchantname', 'storename'], 'text')
+    ]
+}
+LINE_ITEM_FIELDS = ['lineitems', 'items']
+LINE_ITEM_PRODUCT_FIELDS = ['product', 'description', 'item', 'name']
+LINE_ITEM_QUANTITY_FIELDS = ['quantity', 'qty']
+LINE_ITEM_AMOUNT_FIELDS = ['amount', 'amt', 'price']
+
+INSTRUCTIONS = (
+    "Decide this benefit claim for a {noun} by the standard operating procedures.\n"
+    "{claim}\n"
+    "Answer with only a JSON object: "
+    '{{"decision": "approved" | "not approved" | "review needed", "reason": "<one sentence>"}}'
+)
+
+# System prompt of the model call; the SOP passages are the same for every claim of a blueprint
+SYSTEM_PROMPT = (
+    "You adjudicate employee benefit claims using these standard operating procedures:\n"
+    "{passages}\n"
+    "Respond with a single JSON object and nothing else."
+)
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def format_value(value, kind='text'):
+    if kind == 'amount':
+        amount = rules.parse_amount(value)
+        if amount is not None:
+            return f"{amount:.2f}"
+    text = ' '.join(str(value).split())
+    return text if len(text) <= MAX_VALUE_CHARS else text[:MAX_VALUE_CHARS - 3] + '...'
+
+
+def first_value(fields, names):
+    for name in names:
+        value = fields.get(name)
+        if not rules.is_blank(value):
+            return value
+    return None
+
+
+def line_items(fields):
+    """
+    (amount, line) per line item, largest amount first, then by line text
+    """
+    items = first_value(fields, LINE_ITEM_FIELDS)
+    if not isinstance(items, list):
+        return []
+
+    rendered = []
+    for item in items:
+        item_fields = rules.flatten_fields(item)
+        amount = rules.parse_amount(first_value(item_fields, LINE_ITEM_AMOUNT_FIELDS))
+        parts = [format_value(first_value(item_fields, LINE_ITEM_PRODUCT_FIELDS) or 'unknown item')]
+        quantity = first_value(item_fields, LINE_ITEM_QUANTITY_FIELDS)
+        if quantity is not None:
+            parts.append(f"qty {format_value(quantity)}")
+        if amount is not None:
+            parts.append(f"{amount:.2f}")
+        rendered.append((amount or 0.0, '- ' + ' | '.join(parts)))
+    return sorted(rendered, key=lambda item: (-item[0], item[1]))
+
+
+def scalar_fields(value, path=''):
+    """
+    (path, value) for every scalar in a nested inference result
+    """
+    if isinstance(value, dict):
+        for name, child in value.items():
+            yield from scalar_fields(child, f"{path}.{name}" if path else str(name))
+    elif isinstance(value, list):
+        for index, child in enumerate(value):
+            yield from scalar_fields(child, f"{path}.{index}")
+    elif not rules.is_blank(value):
+        yield path, value
+
+
+def claim_lines(inference_result, blue_print_name):
+    """
+    Field lines and line item lines of the canonical claim text
+    """
+    if not isinstance(inference_result, dict):
+        return [format_value(json.dumps(inference_result, sort_keys=True, default=str))], []
+
+    spec = PROMPT_FIELDS.get(blue_print_name)
+    if spec is None:
+        return [f"{path}: {format_value(value)}" for path, value in sorted(scalar_fields(inference_result))], []
+
+    fields = rules.flatten_fields(inference_result)
+    lines = []
+    for label, names, kind in spec:
+        value = first_value(fields, [rules.normalize_name(name) for name in names])
+        if value is not None:
+            lines.append(f"{label}: {format_value(value, kind)}")
+    return lines, line_items(fields)
+
+
+def render_claim(inference_result, blue_print_name, token_budget=PROMPT_TOKEN_BUDGET):
+    """
+    Canonical claim text within the token budget
+    """
+    lines, items = claim_lines(inference_result, blue_print_name)
+    budget = token_budget * CHARS_PER_TOKEN
+
+    def render(kept_lines, kept_items):
+        text = kept_lines[:]
+        if kept_items or items:
+            text.append(f"line items ({len(items)}):")
+            text.extend(line for _, line in kept_items)
+            if len(kept_items) < len(items):
+                omitted = items[len(kept_items):]
+                text.append(f"- {len(omitted)} more totalling {sum(amount for amount, _ in omitted):.2f}")
+        if len(kept_lines) < len(lines):
+            text.append(f"({len(lines) - len(kept_lines)} more fields omitted)")
+        return '\n'.join(text)
+
+    kept_lines, kept_items = lines, items
+    text = render(kept_lines, kept_items)
+    while len(text) > budget and kept_items:
+        kept_items = kept_items[:-1]
+        text = render(kept_lines, kept_items)
+    while len(text) > budget and len(kept_lines) > 1:
+        kept_lines = kept_lines[:-1]
+        text = render(kept_lines, kept_items)
+    if len(kept_lines) < len(lines) or len(kept_items) < len(items):
+        logger.info(f"Claim text truncated to {estimate_tokens(text)} tokens: "
+                    f"{len(lines) - len(kept_lines)} field(s), {len(items) - len(kept_items)} line item(s) left out")
+    return text
+
+
+def build_prompt(inference_result, blue_print_name):
+    noun = DOCUMENT_NOUNS.get(blue_print_name, 'document')
+    return INSTRUCTIONS.format(noun=noun, claim=render_claim(inference_result, blue_print_name))
+
+
+def system_prompt(passages):
+    return SYSTEM_PROMPT.format(passages='\n'.join(f"- {passage}" for passage in passages))
+
+
+def inference_configuration():
+    return {'maxTokens': RESPONSE_MAX_TOKENS, 'temperature': 0}
+
+
+def parse_response(text):
+    """
+    Validate the model's answer. Returns the canonical {"decision", "reason"} JSON text,
+    or None when the answer has no valid decision.
+    """
+    parsed = segments.parse_decision(text)
+    decision = ' '.join(str(parsed.get('decision') or '').lower().split())
+    reason = parsed.get('reason')
+    if decision not in DECISIONS or not isinstance(reason, str) or not reason.strip():
+        return None
+    return json.dumps({'decision': decision, 'reason': reason.strip()})
@@ -0,0 +1,213 @@
+"""
+MIT No Attribution
+
+Copyright 2024 Amazon Web Services
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+
+Buffered EventBridge publishing with a DynamoDB outbox.
+
+The decision event is written to the claim item (outboxEvent, with
+outboxStatus = PENDING) in the same UpdateItem that stores the decision.
+After PutEvents succeeds the outbox attributes are removed, unless the item
+has been decided again since (its outboxCreatedAt is no longer the one of the
+published event). If the function dies in between, relay_pending_outbox (run
+on a schedule) finds the item through the sparse outbox index and publishes it
+again.
+"""
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+
+from botocore.exceptions import ClientError
+
+import instrumentation
+
+logger = logging.getLogger()
+
+EVENT_SOURCE = 'benefit-claim-validation-function'
+EVENT_DETAIL_TYPE = 'Benefit Claim Validation Completed'
+
+# PutEvents limits: 10 entries and 256 KB per request
+PUT_EVENTS_MAX_ENTRIES = 10
+PUT_EVENTS_MAX_BYTES = 256 * 1024
+PUBLISH_MAX_ATTEMPTS = int(os.environ.get('PUBLISH_MAX_ATTEMPTS', '4'))
+
+OUTBOX_STATUS_PENDING = 'PENDING'
+OUTBOX_INDEX_NAME = os.environ.get('OUTBOX_INDEX_NAME', 'OutboxIndex')
+# Items younger than this may still be published by the invocation that wrote them
+OUTBOX_RELAY_GRACE_SECONDS = int(os.environ.get('OUTBOX_RELAY_GRACE_SECONDS', '120'))
+
+
+class OutboxEntry(NamedTuple):
+    key: dict
+    created_at: str
+
+
+def outbox_attributes(detail, created_at):
+    """
+    Update expression parts that record the event in the outbox, to be merged into the decision update
+    """
+    return (
+        "#outboxEvent = :outboxEvent, #outboxStatus = :outboxStatus, #outboxCreatedAt = :outboxCreatedAt",
+        {
+            '#outboxEvent': 'outboxEvent',
+            '#outboxStatus': 'outboxStatus',
+            '#outboxCreatedAt': 'outboxCreatedAt'
+        },
+        {
+            ':outboxEvent': {'S': json.dumps(detail)},
+            ':outboxStatus': {'S': OUTBOX_STATUS_PENDING},
+            ':outboxCreatedAt': {'S': created_at}
+        }
+    )
+
+
+class EventPublisher:
+    """
+    Buffers decision events and publishes them with PutEvents in batches,
+    retrying only the entries that failed. Published outbox items are cleared.
+    """
+
+    def __init__(self, eventbridge, dynamodb, table_name):
+        self.eventbridge = eventbridge
+        self.dynamodb = dynamodb
+        self.table_name = table_name
+        self.pending = []
+        self._lock = threading.Lock()
+
+    def add(self, detail, outbox=None):
+        entry = {
+            'Source': EVENT_SOURCE,
+            'DetailType': EVENT_DETAIL_TYPE,
+            'Detail': json.dumps(detail)
+        }
+        with self._lock:
+            self.pending.append((entry, outbox))
+
+    def flush(self):
+        """
+        Publish everything buffered. Returns the outbox entries of events that could not be published.
+        """
+        with self._lock:
+            pending, self.pending = self.pending, []
+        failed = []
+        for batch in self.batches(pending):
+            published, unpublished = self.put_events(batch)
+            self.clear_outbox([outbox for _, outbox in published if outbox])
+            failed.extend(outbox for _, outbox in unpublished)
+        if failed:
+            logger.error(f"{len(failed)} event(s) were not published, they stay in the outbox")
+        return failed
+
+    @staticmethod
+    def batches(pending):
+        batch = []
+        batch_bytes = 0
+        for entry, outbox in pending:
+            entry_bytes = len(entry['Source']) + len(entry['DetailType']) + len(entry['Detail'].encode('utf-8'))
+            if batch and (len(batch) == PUT_EVENTS_MAX_ENTRIES or batch_bytes + entry_bytes > PUT_EVENTS_MAX_BYTES):
+                yield batch
+                batch = []
+                batch_bytes = 0
+            batch.append((entry, outbox))
+            batch_bytes += entry_bytes
+        if batch:
+            yield batch
+
+    def put_events(self, batch):
+        published = []
+        attempt = 0
+        while batch:
+            attempt += 1
+            try:
+                with instrumentation.span('PutEvents', entries=len(batch), attempt=attempt):
+                    response = self.eventbridge.put_events(Entries=[entry for entry, _ in batch])
+            except Exception as e:
+                logger.error(f"Error publishing events: {e}")
+                retry = batch
+            else:
+                retry = []
+                # Result entries are in the same order as the request entries
+                for (entry, outbox), result in zip(batch, response['Entries']):
+                    if result.get('ErrorCode'):
+                        logger.warning(f"Event not published: {result['ErrorCode']} {result.get('ErrorMessage')}")
+                        retry.append((entry, outbox))
+                    else:
+                        published.append((entry, outbox))
+            if not retry or attempt >= PUBLISH_MAX_ATTEMPTS:
+                return published, retry
+            batch = retry
+            time.sleep(random.uniform(0, 0.1 * (2 ** attempt)))
+        return published, []
+
+    def clear_outbox(self, outbox_entries):
+        for outbox in outbox_entries:
+            try:
+                self.dynamodb.update_item(
+                    TableName=self.table_name,
+                    Key=outbox.key,
+                    UpdateExpression="REMOVE #outboxStatus, #outboxEvent SET #outboxPublishedAt = :now",
+                    # A newer decision written since keeps its own pending event
+                    ConditionExpression="#outboxCreatedAt = :sent",
+                    ExpressionAttributeNames={
+                        '#outboxStatus': 'outboxStatus',
+                        '#outboxEvent': 'outboxEvent',
+                        '#outboxPublishedAt': 'outboxPublishedAt',
+                        '#outboxCreatedAt': 'outboxCreatedAt'
+                    },
+                    ExpressionAttributeValues={
+                        ':now': {'S': datetime.now(timezone.utc).isoformat()},
+                        ':sent': {'S': outbox.created_at}
+                    }
+                )
+            except Exception as e:
+                if isinstance(e, ClientError) and e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                    logger.info(f"Outbox of {outbox.key} holds a newer event, left for its publisher")
+                    continue
+                # The relay publishes it again; consumers must tolerate duplicates
+                logger.error(f"Error clearing the outbox for {outbox.key}: {e}")
+
+
+def relay_pending_outbox(eventbridge, dynamodb, table_name):
+    """
+    Publish outbox events left behind by invocations that failed after writing the decision
+    """
+    cutoff = (datetime.now(timezone.utc) - timedelta(seconds=OUTBOX_RELAY_GRACE_SECONDS)).isoformat()
+    publisher = EventPublisher(eventbridge, dynamodb, table_name)
+
+    paginator = dynamodb.get_paginator('query')
+    for page in paginator.paginate(
+        TableName=table_name,
+        IndexName=OUTBOX_INDEX_NAME,
+        KeyConditionExpression="#outboxStatus = :pending AND #outboxCreatedAt < :cutoff",
+        ExpressionAttributeNames={'#outboxStatus': 'outboxStatus', '#outboxCreatedAt': 'outboxCreatedAt'},
+        ExpressionAttributeValues={':pending': {'S': OUTBOX_STATUS_PENDING}, ':cutoff': {'S': cutoff}}
+    ):
+        for item in page['Items']:
+            outbox_key = {'invocationId': item['invocationId'], 'fileName': item['fileName']}
+            outbox = OutboxEntry(outbox_key, item['outboxCreatedAt']['S'])
+            publisher.add(json.loads(item['outboxEvent']['S']), outbox)
+
+    relayed = len(publisher.pending)
+    failed = publisher.flush()
+    logger.info(f"Outbox relay: {relayed - len(failed)} event(s) published, {len(failed)} failed")
+    return relayed - len(failed), len(failed)
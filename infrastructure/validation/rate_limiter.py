@@ -0,0 +1,83 @@
+"""
+MIT No Attribution
+
+Copyright 2024 Amazon Web Services
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+
+Token bucket that keeps model calls within the Bedrock quota.
+
+The account quota (MODEL_REQUESTS_PER_MINUTE) is shared by every container,
+so each container gets quota / VALIDATION_MAX_CONCURRENCY, which matches the
+maximum concurrency of the SQS event source. Every model has its own quota
+and therefore its own bucket (limiter_for).
+"""
+
+import os
+import threading
+import time
+
+MODEL_REQUESTS_PER_MINUTE = float(os.environ.get('MODEL_REQUESTS_PER_MINUTE', '100'))
+VALIDATION_MAX_CONCURRENCY = int(os.environ.get('VALIDATION_MAX_CONCURRENCY', '2'))
+RATE_LIMIT_BURST = float(os.environ.get('RATE_LIMIT_BURST', '2'))
+RATE_LIMIT_MAX_WAIT_SECONDS = float(os.environ.get('RATE_LIMIT_MAX_WAIT_SECONDS', '20'))
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+class TokenBucket:
+    """
+    Thread safe token bucket refilled at rate tokens per second up to burst tokens
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, max_wait=RATE_LIMIT_MAX_WAIT_SECONDS):
+        """
+        Take one token, waiting for it at most max_wait seconds
+        """
+        deadline = time.monotonic() + max_wait
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            if now + wait > deadline:
+                raise RateLimitExceeded(f"No model capacity within {max_wait} seconds")
+            time.sleep(wait)
+
+
+_model_limiters = {}
+_model_limiters_lock = threading.Lock()
+
+
+def limiter_for(model_id):
+    with _model_limiters_lock:
+        limiter = _model_limiters.get(model_id)
+        if limiter is None:
+            limiter = TokenBucket(MODEL_REQUESTS_PER_MINUTE / 60 / VALIDATION_MAX_CONCURRENCY, RATE_LIMIT_BURST)
+            _model_limiters[model_id] = limiter
+        return limiter
@@ -0,0 +1,233 @@
+"""
+MIT No Attribution
+
+Copyright 2024 Amazon Web Services
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+
+Streaming, field-selective parser for BDA result.json (custom or standard).
+
+Only the top-level keys in KEPT_KEYS (STANDARD_OUTPUT_KEPT_KEYS for standard
+output) are kept. Every "geometry" member (bounding boxes and vertices, most
+of the bytes of a result) and every other top-level key is skipped by scanning
+its brackets and strings, without decoding it. The body is read in CHUNK_SIZE
+pieces and objects are walked key by key, while kept leaf values are decoded
+by the C JSON scanner. Memory stays proportional to the kept fields rather
+than to the size of the document.
+
+Standard output is only read until the statistics of the document or image
+have been seen; the pages and elements after them are never downloaded.
+"""
+
+import codecs
+import re
+from json import JSONDecodeError, JSONDecoder
+
+CHUNK_SIZE = 64 * 1024
+
+KEPT_KEYS = frozenset(['matched_blueprint', 'inference_result', 'explainability_info'])
+# Standard output: the statistics and text of the document or image, without pages and elements
+STANDARD_OUTPUT_KEPT_KEYS = frozenset(['document', 'image', 'statistics'])
+DROPPED_KEYS = frozenset(['geometry'])
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+# Skipping: the next bracket or string, and the rest of a string up to its closing quote
+STRUCTURE = re.compile(r'["\[\]{}]')
+STRING_BODY = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.DOTALL)
+DECODER = JSONDecoder()
+
+
+class _Reader:
+    def __init__(self, body, chunk_size):
+        self.body = body
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, size=0):
+        """
+        Drop the consumed text and append at least the next chunk. Returns False at end of input.
+        """
+        if self.eof:
+            return False
+        chunk = self.body.read(max(self.chunk_size, size))
+        if not chunk:
+            self.eof = True
+            text = self.decoder.decode(b'', final=True)
+        else:
+            text = self.decoder.decode(chunk)
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """
+        Skip whitespace and return the next character without consuming it
+        """
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                raise JSONDecodeError('Unexpected end of input', self.buffer, self.pos)
+
+    def expect(self, character):
+        if self.peek() != character:
+            raise JSONDecodeError(f"Expected {character!r}", self.buffer, self.pos)
+        self.pos += 1
+
+    def parse_value(self):
+        character = self.peek()
+        if character == '{':
+            return self.parse_object()
+        if character == '[':
+            return self.parse_array()
+        return self.decode_value()
+
+    def decode_value(self):
+        """
+        Decode one complete value with the C JSON scanner, reading more input while it is truncated
+        """
+        while True:
+            try:
+                value, end = DECODER.raw_decode(self.buffer, self.pos)
+            except JSONDecodeError:
+                # Truncated value: double the pending text so that large values are re-scanned only log(n) times
+                if not self.fill(len(self.buffer) - self.pos):
+                    raise
+                continue
+            # A number that ends the buffer, or stops before '.', 'e' or a sign, may continue in the next chunk
+            if (not self.eof and isinstance(value, (int, float)) and not isinstance(value, bool)
+                    and self.buffer[end:end + 1] in ('', '.', 'e', 'E', '+', '-')):
+                self.fill()
+                continue
+            self.pos = end
+            return value
+
+    def parse_object(self, kept_keys=None, until=None):
+        """
+        Parse an object, keeping only kept_keys when given. When until(result) holds
+        after a kept member, the result is returned without reading the rest of the input.
+        """
+        self.expect('{')
+        result = {}
+        if self.peek() == '}':
+            self.pos += 1
+            return result
+        while True:
+            key = self.parse_string()
+            self.expect(':')
+            if key in DROPPED_KEYS or (kept_keys is not None and key not in kept_keys):
+                self.skip_value()
+            else:
+                result[key] = self.parse_value()
+                if until is not None and until(result):
+                    return result
+            character = self.peek()
+            self.pos += 1
+            if character == '}':
+                return result
+            if character != ',':
+                raise JSONDecodeError("Expected ',' or '}'", self.buffer, self.pos - 1)
+
+    def parse_array(self):
+        self.expect('[')
+        result = []
+        if self.peek() == ']':
+            self.pos += 1
+            return result
+        while True:
+            result.append(self.parse_value())
+            character = self.peek()
+            self.pos += 1
+            if character == ']':
+                return result
+            if character != ',':
+                raise JSONDecodeError("Expected ',' or ']'", self.buffer, self.pos - 1)
+
+    def parse_string(self):
+        if self.peek() != '"':
+            raise JSONDecodeError('Expected a string', self.buffer, self.pos)
+        return self.decode_value()
+
+    def skip_value(self):
+        """
+        Consume one value without decoding it: containers are scanned to their closing
+        bracket and strings to their closing quote, dropping the text as it is passed
+        """
+        if self.peek() not in '{["':
+            self.decode_value()
+            return
+        depth = 0
+        while True:
+            match = STRUCTURE.search(self.buffer, self.pos)
+            if match is None:
+                self.pos = len(self.buffer)
+                if not self.fill():
+                    raise JSONDecodeError('Unexpected end of input', self.buffer, self.pos)
+                continue
+            self.pos = match.end()
+            character = match.group()
+            if character == '"':
+                self.skip_string()
+            elif character in '{[':
+                depth += 1
+            else:
+                depth -= 1
+            if depth == 0:
+                return
+
+    def skip_string(self):
+        """
+        Consume the rest of a string whose opening quote has been read
+        """
+        while True:
+            # Stops at the closing quote, or at the end of the buffer (possibly on a backslash)
+            self.pos = STRING_BODY.match(self.buffer, self.pos).end()
+            if self.buffer.startswith('"', self.pos):
+                self.pos += 1
+                return
+            if not self.fill():
+                raise JSONDecodeError('Unterminated string', self.buffer, self.pos)
+
+
+def parse_result(body, chunk_size=CHUNK_SIZE):
+    """
+    Parse a BDA result.json from a binary stream (e.g. the S3 StreamingBody),
+    returning only matched_blueprint, inference_result and explainability_info
+    without geometry.
+    """
+    reader = _Reader(body, chunk_size)
+    return reader.parse_object(kept_keys=KEPT_KEYS)
+
+
+def parse_standard_output(body, chunk_size=CHUNK_SIZE):
+    """
+    Parse a BDA standard output result.json from a binary stream, returning only
+    its document, image and statistics members without geometry. Reading stops
+    as soon as the statistics have been seen.
+    """
+    reader = _Reader(body, chunk_size)
+    return reader.parse_object(kept_keys=STANDARD_OUTPUT_KEPT_KEYS, until=has_statistics)
+
+
+def has_statistics(standard_output):
+    """
+    Whether the standard output read so far carries the statistics of the document or image
+    """
+    sections = (standard_output, standard_output.get('document'), standard_output.get('image'))
+    return any(isinstance(section, dict) and 'statistics' in section for section in sections)
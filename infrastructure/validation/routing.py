@@ -0,0 +1,165 @@
+"""
+MIT No Attribution
+
+Copyright 2024 Amazon Web Services
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+
+Confidence-gated routing of extracted claims.
+
+Claims where a field the SOPs depend on was extracted below its confidence
+threshold (or not extracted at all) go straight to "review needed". All other
+claims continue to the rules and knowledge base. A field counts as extracted
+when any of its aliases has a value in the inference result.
+
+Thresholds are per blueprint and per field, and only list the fields the SOP
+rules read: the amount or total, the receipt date and the line item products.
+Other fields are not gated. CONFIDENCE_THRESHOLDS (JSON, same shape as
+DEFAULT_CONFIDENCE_THRESHOLDS) replaces the defaults.
+"""
+
+import json
+import logging
+import os
+from typing import NamedTuple
+
+from rules import (
+    BLUE_PRINT_NAME_CHECK, BLUE_PRINT_NAME_RECEIPT, CHECK_AMOUNT_FIELDS, RECEIPT_TOTAL_FIELDS, REVIEW_NEEDED,
+    blueprint_key, is_blank, normalize_name
+)
+
+logger = logging.getLogger()
+
+ROUTE_REVIEW = "review"
+ROUTE_ADJUDICATE = "adjudicate"
+
+# Field names are normalized like the rule fields, aliases included
+DEFAULT_CONFIDENCE_THRESHOLDS = {
+    BLUE_PRINT_NAME_CHECK: dict.fromkeys(CHECK_AMOUNT_FIELDS, 0.8),
+    BLUE_PRINT_NAME_RECEIPT: {
+        **dict.fromkeys(RECEIPT_TOTAL_FIELDS, 0.8),
+        "receiptdate": 0.7,
+        "date": 0.7,
+        "product": 0.5
+    }
+}
+
+
+# Aliases of the same SOP field; one of each group with a threshold has to be extracted
+SOP_FIELD_GROUPS = [
+    CHECK_AMOUNT_FIELDS,
+    RECEIPT_TOTAL_FIELDS,
+    ["receiptdate", "date"],
+    ["product"]
+]
+
+
+class Route(NamedTuple):
+    route: str
+    low_confidence_fields: list
+    reason: str
+
+
+def load_thresholds():
+    thresholds = DEFAULT_CONFIDENCE_THRESHOLDS
+    if os.environ.get('CONFIDENCE_THRESHOLDS'):
+        thresholds = json.loads(os.environ['CONFIDENCE_THRESHOLDS'])
+    return {
+        blueprint_key(blue_print_name): {
+            normalize_name(field): float(threshold)
+            for field, threshold in fields.items()
+        }
+        for blue_print_name, fields in thresholds.items()
+    }
+
+
+confidence_thresholds = load_thresholds()
+
+
+def route_claim(blue_print_name, field_confidences, inference_result=None):
+    """
+    Decide whether the claim can be adjudicated or needs review because an SOP field
+    was extracted with low confidence or not at all
+    """
+    thresholds = confidence_thresholds.get(blue_print_name)
+    if not thresholds:
+        return Route(ROUTE_ADJUDICATE, [], "No confidence thresholds for this blueprint")
+
+    low_confidence_fields = []
+    for field_confidence in field_confidences:
+        # Nested fields (PAYMENTDETAILS.TOTAL, LineItems.0.Amount) use the threshold of their leaf name
+        leaf_name = normalize_name(field_confidence.field.split('.')[-1])
+        threshold = thresholds.get(leaf_name)
+        if threshold is None:
+            continue
+        if field_confidence.success is False or (
+                field_confidence.confidence is not None and field_confidence.confidence < threshold):
+            low_confidence_fields.append(field_confidence.field)
+
+    not_extracted = missing_fields(thresholds, extracted_fields(inference_result)) if inference_result is not None else []
+
+    if low_confidence_fields or not_extracted:
+        reasons = []
+        if low_confidence_fields:
+            reasons.append(f"Low extraction confidence for: {', '.join(low_confidence_fields)}")
+        if not_extracted:
+            reasons.append(f"Not extracted: {', '.join(not_extracted)}")
+        reason = "; ".join(reasons)
+        logger.info(f"Routing to review: {reason}")
+        return Route(ROUTE_REVIEW, low_confidence_fields + not_extracted, reason)
+    return Route(ROUTE_ADJUDICATE, [], "All fields meet the confidence thresholds")
+
+
+def extracted_fields(inference_result):
+    """
+    Normalized names of the fields that have a value, nested objects and lists included
+    """
+    extracted = set()
+    pending = [inference_result]
+    while pending:
+        current = pending.pop()
+        if isinstance(current, list):
+            pending.extend(current)
+        elif isinstance(current, dict):
+            for name, value in current.items():
+                if isinstance(value, (dict, list)):
+                    pending.append(value)
+                elif not is_blank(value):
+                    extracted.add(normalize_name(name))
+    return extracted
+
+
+def missing_fields(thresholds, extracted):
+    """
+    The thresholded SOP fields of which no alias was extracted, each by its first thresholded alias
+    """
+    groups = [[normalize_name(field) for field in group] for group in SOP_FIELD_GROUPS]
+    # Thresholded fields outside the known groups are their own group
+    grouped = {field for group in groups for field in group}
+    groups.extend([field] for field in thresholds if field not in grouped)
+
+    missing = []
+    for group in groups:
+        thresholded = [field for field in group if field in thresholds]
+        if thresholded and not extracted.intersection(thresholded):
+            missing.append(thresholded[0])
+    return missing
+
+
+def review_decision(route):
+    """
+    Decision for a claim routed to review, in the same JSON shape as the knowledge base output
+    """
+    return json.dumps({'decision': REVIEW_NEEDED, 'reason': route.reason})
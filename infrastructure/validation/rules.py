@@ -0,0 +1,298 @@
+"""
+MIT No Attribution
+
+Copyright 2024 Amazon Web Services
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+
+Deterministic rules that adjudicate clear-cut claims without the knowledge base.
+
+Rules are declared per blueprint as plain data (DEFAULT_RULES, or a JSON file
+named by CLAIM_RULES_FILE) and compiled into predicates once per container.
+The first rule that matches decides the claim; if none matches the claim is
+inconclusive and goes to the knowledge base.
+
+Field names are matched after lower-casing and dropping non-alphanumerics, so
+"RECEIPT_DATE" and "ReceiptDate" are the same field. Nested objects such as
+PAYMENTDETAILS are searched as well.
+"""
+
+import json
+import logging
+import os
+import re
+from datetime import datetime
+
+logger = logging.getLogger()
+
+APPROVED = "approved"
+NOT_APPROVED = "not approved"
+REVIEW_NEEDED = "review needed"
+
+CLAIM_RULES_FILE = os.environ.get('CLAIM_RULES_FILE')
+# Claims whose receipt is older than this many days are denied; 0 disables the rule
+CLAIM_FILING_WINDOW_DAYS = int(os.environ.get('CLAIM_FILING_WINDOW_DAYS', '0'))
+
+DATE_FORMATS = ('%m/%d/%Y', '%m-%d-%Y', '%Y-%m-%d', '%m/%d/%y')
+
+# Rule keys of the claim blueprints
+BLUE_PRINT_NAME_CHECK = "US-Bank-Check"
+BLUE_PRINT_NAME_RECEIPT = "Receipt"
+
+# Blueprint names BDA reports, by rule key: the public check blueprint and the
+# receipt blueprint that template.yaml deploys (PharmacyReceiptBlueprint)
+BLUEPRINT_NAMES = {
+    BLUE_PRINT_NAME_CHECK: [BLUE_PRINT_NAME_CHECK],
+    BLUE_PRINT_NAME_RECEIPT: [BLUE_PRINT_NAME_RECEIPT, "benefit-claims-pharmacy-receipt-blueprint"]
+}
+BLUEPRINT_KEYS = {name: key for key, names in BLUEPRINT_NAMES.items() for name in names}
+
+CHECK_AMOUNT_FIELDS = ['amount', 'checkamount', 'amountinnumbers', 'numericamount', 'dollaramount']
+RECEIPT_TOTAL_FIELDS = ['total', 'amountpaid', 'subtotal']
+
+# Based on the AnyCompany Benefit Checks / Benefit Claims SOPs in assets/others.
+# Keys are rule keys; blueprint names are resolved to them by blueprint_key.
+DEFAULT_RULES = {
+    BLUE_PRINT_NAME_CHECK: [
+        {
+            "name": "check-amount-missing",
+            "op": "missing",
+            "fields": CHECK_AMOUNT_FIELDS,
+            "decision": REVIEW_NEEDED,
+            "reason": "The check amount could not be read from the document"
+        },
+        {
+            "name": "check-tier-4",
+            "op": "gt",
+            "fields": CHECK_AMOUNT_FIELDS,
+            "value": 10000,
+            "decision": NOT_APPROVED,
+            "reason": "Check amount {value} is greater than $10,000 (Tier 4), which is automatically denied"
+        },
+        {
+            "name": "check-tier-3",
+            "op": "gt",
+            "fields": CHECK_AMOUNT_FIELDS,
+            "value": 100,
+            "decision": REVIEW_NEEDED,
+            "reason": "Check amount {value} is greater than $100 (Tier 3), which requires mandatory review"
+        },
+        {
+            "name": "check-tier-1",
+            "op": "lt",
+            "fields": CHECK_AMOUNT_FIELDS,
+            "value": 50,
+            "decision": APPROVED,
+            "reason": "Check amount {value} is less than $50 (Tier 1), which is auto-approved"
+        }
+    ],
+    BLUE_PRINT_NAME_RECEIPT: [
+        {
+            "name": "receipt-total-missing",
+            "op": "missing",
+            "fields": RECEIPT_TOTAL_FIELDS,
+            "decision": REVIEW_NEEDED,
+            "reason": "The receipt total could not be read from the document"
+        },
+        {
+            "name": "receipt-past-filing-window",
+            "op": "older_than_days",
+            "fields": ["receiptdate", "date"],
+            "value": CLAIM_FILING_WINDOW_DAYS,
+            "decision": NOT_APPROVED,
+            "reason": "Receipt date {value} is outside the " + str(CLAIM_FILING_WINDOW_DAYS) + " day filing window"
+        },
+        {
+            "name": "receipt-covid-medication",
+            "op": "all_items_match",
+            "fields": ["lineitems"],
+            "item_fields": ["product"],
+            "pattern": r"covid",
+            "decision": APPROVED,
+            "reason": "All line items are Covid 19 medication, which is auto-approved regardless of the amount"
+        },
+        {
+            "name": "receipt-excluded-items",
+            "op": "all_items_match",
+            "fields": ["lineitems"],
+            "item_fields": ["product"],
+            "pattern": r"tylenol|vicks|shampoo|moisturi[sz]er|lotion|cream|deodo?rant|toiletr",
+            "decision": NOT_APPROVED,
+            "reason": "All line items are over the counter drugs or toiletries, which are not covered"
+        }
+    ]
+}
+
+
+def normalize_name(name):
+    return re.sub(r'[^a-z0-9]', '', str(name).lower())
+
+
+def flatten_fields(inference_result):
+    """
+    Map normalized field names to values, searching nested objects depth first.
+    The first occurrence of a name wins.
+    """
+    fields = {}
+    pending = [inference_result]
+    while pending:
+        current = pending.pop(0)
+        if not isinstance(current, dict):
+            continue
+        for name, value in current.items():
+            fields.setdefault(normalize_name(name), value)
+            if isinstance(value, dict):
+                pending.append(value)
+    return fields
+
+
+def is_blank(value):
+    return value is None or (isinstance(value, str) and not value.strip()) or value == []
+
+
+def parse_amount(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(re.sub(r'[^0-9.\-]', '', value))
+        except ValueError:
+            return None
+    return None
+
+
+def parse_date(value):
+    if not isinstance(value, str):
+        return None
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value.strip(), date_format)
+        except ValueError:
+            continue
+    return None
+
+
+def compile_rule(spec):
+    """
+    Turn a rule spec into a predicate taking the flattened fields.
+    The predicate returns the formatted reason when the rule matches, otherwise None.
+    """
+    field_names = [normalize_name(field) for field in spec['fields']]
+    reason = spec['reason']
+    op = spec['op']
+
+    def first_value(fields):
+        for field_name in field_names:
+            value = fields.get(field_name)
+            if not is_blank(value):
+                return value
+        return None
+
+    if op == 'missing':
+        def predicate(fields):
+            return reason if first_value(fields) is None else None
+
+    elif op in ('gt', 'lt'):
+        threshold = float(spec['value'])
+
+        def predicate(fields):
+            amount = parse_amount(first_value(fields))
+            if amount is None:
+                return None
+            matched = amount > threshold if op == 'gt' else amount < threshold
+            return reason.format(value=f"${amount:,.2f}") if matched else None
+
+    elif op == 'older_than_days':
+        max_age_days = int(spec['value'])
+        if max_age_days <= 0:
+            return None
+
+        def predicate(fields):
+            value = first_value(fields)
+            claim_date = parse_date(value)
+            if claim_date is None:
+                return None
+            return reason.format(value=value) if (datetime.now() - claim_date).days > max_age_days else None
+
+    elif op == 'all_items_match':
+        pattern = re.compile(spec['pattern'], re.IGNORECASE)
+        item_field_names = [normalize_name(field) for field in spec['item_fields']]
+
+        def predicate(fields):
+            items = first_value(fields)
+            if not isinstance(items, list) or not items:
+                return None
+            for item in items:
+                item_fields = flatten_fields(item)
+                text = " ".join(str(item_fields.get(name, "")) for name in item_field_names)
+                if not pattern.search(text):
+                    return None
+            return reason
+
+    else:
+        raise ValueError(f"Unknown rule operator: {op}")
+
+    return predicate
+
+
+def blueprint_key(blue_print_name):
+    """
+    Rule key of a blueprint name reported by BDA; other names are their own key
+    """
+    return BLUEPRINT_KEYS.get(blue_print_name, blue_print_name)
+
+
+def load_rules():
+    """
+    Compile the rules for every blueprint, once per container
+    """
+    rules = DEFAULT_RULES
+    if CLAIM_RULES_FILE:
+        with open(CLAIM_RULES_FILE) as rules_file:
+            rules = json.load(rules_file)
+
+    compiled = {}
+    for blue_print_name, specs in rules.items():
+        compiled[blueprint_key(blue_print_name)] = [
+            (spec['name'], spec['decision'], predicate)
+            for spec in specs
+            for predicate in [compile_rule(spec)]
+            if predicate is not None
+        ]
+    return compiled
+
+
+compiled_rules = load_rules()
+
+
+def evaluate(inference_result, blue_print_name):
+    """
+    Adjudicate the claim with the blueprint's rules.
+    Returns the decision as JSON text in the same shape as the knowledge base output
+    ({"decision": ..., "reason": ...}), or None when the rules are inconclusive.
+    """
+    rules = compiled_rules.get(blue_print_name)
+    if not rules or not isinstance(inference_result, dict):
+        return None
+
+    fields = flatten_fields(inference_result)
+    for name, decision, predicate in rules:
+        reason = predicate(fields)
+        if reason is not None:
+            logger.info(f"Claim decided by rule {name}: {decision}")
+            return json.dumps({'decision': decision, 'reason': reason})
+    return None
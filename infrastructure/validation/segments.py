@@ -0,0 +1,148 @@
+"""
+MIT No Attribution
+
+Copyright 2024 Amazon Web Services
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+
+Discovery of BDA output segments and aggregation of per-segment decisions.
+
+BDA splits a multi-document upload into segments and writes one custom output
+per segment. The job metadata file one level above the asset output folder
+lists every segment:
+
+    <prefix>/<job_id>/job_metadata.json
+    <prefix>/<job_id>/0/custom_output/<segment>/result.json
+"""
+
+import json
+import logging
+import re
+
+from botocore.exceptions import ClientError
+
+import bda
+import instrumentation
+from rules import APPROVED, NOT_APPROVED, REVIEW_NEEDED
+
+logger = logging.getLogger()
+
+JOB_METADATA_FILE_NAME = 'job_metadata.json'
+
+# Most severe first: one denied segment denies the claim
+DECISION_SEVERITY = [NOT_APPROVED, REVIEW_NEEDED, APPROVED]
+
+
+def split_s3_uri(s3_uri):
+    bucket, _, key = s3_uri.replace('s3://', '', 1).partition('/')
+    return bucket, key
+
+
+def find_result_segments(s3_client, bucket_name, bda_output_path):
+    """
+    Return one {'index', 'bucket', 'custom_output_key', 'standard_output_key'} per segment.
+    Falls back to the first custom output when the job metadata cannot be read or lists
+    no segment, so that there is always at least one segment to decide the claim on.
+    """
+    bda_output_path = bda_output_path.rstrip('/')
+    job_output_path = bda_output_path.rsplit('/', 1)[0]
+    metadata_key = f"{job_output_path}/{JOB_METADATA_FILE_NAME}"
+
+    try:
+        with instrumentation.span('GetObject', key=metadata_key) as get_span:
+            response = s3_client.get_object(Bucket=bucket_name, Key=metadata_key)
+            body = response['Body'].read()
+            get_span.metric('BytesRead', len(body), 'Bytes')
+        job_metadata = json.loads(body)
+    except (ClientError, ValueError) as e:
+        logger.warning(f"Job metadata {metadata_key} not available ({e}), using the first custom output")
+        return [default_segment(bucket_name, bda_output_path)]
+
+    segments = []
+    for asset in job_metadata.get('output_metadata', []):
+        for segment in asset.get('segment_metadata', []):
+            custom_output_path = segment.get('custom_output_path')
+            standard_output_path = segment.get('standard_output_path')
+            # A segment that matched no blueprint only has standard output; triage rejects it
+            if not custom_output_path and not standard_output_path:
+                continue
+            segment_bucket, custom_output_key = split_s3_uri(custom_output_path or standard_output_path)
+            segments.append({
+                'index': len(segments),
+                'bucket': segment_bucket,
+                'custom_output_key': custom_output_key if custom_output_path else None,
+                'standard_output_key': split_s3_uri(standard_output_path)[1] if standard_output_path else None
+            })
+
+    if not segments:
+        logger.warning(f"No segment in {metadata_key}, using the first custom output")
+        return [default_segment(bucket_name, bda_output_path)]
+
+    logger.info(f"Found {len(segments)} segment(s) in {metadata_key}, "
+                f"{sum(1 for segment in segments if segment['custom_output_key'] is None)} without custom output")
+    return segments
+
+
+def default_segment(bucket_name, bda_output_path):
+    return {
+        'index': 0,
+        'bucket': bucket_name,
+        'custom_output_key': bda.custom_output_key(bda_output_path),
+        'standard_output_key': None
+    }
+
+
+def parse_decision(validation_response):
+    """
+    Extract the {"decision", "reason"} object from a validation response.
+    Model output can wrap the JSON in prose or code fences.
+    """
+    if isinstance(validation_response, dict):
+        return validation_response
+    match = re.search(r'\{.*\}', validation_response or '', re.DOTALL)
+    if match:
+        try:
+            parsed = json.loads(match.group(0))
+            if isinstance(parsed, dict):
+                return parsed
+        except ValueError:
+            pass
+    return {}
+
+
+def normalize_decision(decision):
+    decision = re.sub(r'\s+', ' ', str(decision or '')).strip().lower()
+    return decision if decision in DECISION_SEVERITY else REVIEW_NEEDED
+
+
+def aggregate_decisions(segment_results):
+    """
+    Combine the per-segment validation results into one claim decision.
+    A single segment keeps its response unchanged.
+    """
+    if len(segment_results) == 1:
+        return segment_results[0]['validation_result']
+
+    decisions = []
+    reasons = []
+    for segment_result in segment_results:
+        parsed = parse_decision(segment_result['validation_result'])
+        decision = normalize_decision(parsed.get('decision'))
+        decisions.append(decision)
+        reasons.append(f"Segment {segment_result['index']} ({segment_result['blueprint']}): "
+                       f"{decision} - {parsed.get('reason', 'no reason given')}")
+
+    decision = min(decisions, key=DECISION_SEVERITY.index) if decisions else REVIEW_NEEDED
+    return json.dumps({'decision': decision, 'reason': '; '.join(reasons)})
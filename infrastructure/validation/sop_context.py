@@ -0,0 +1,121 @@
+"""
+MIT No Attribution
+
+Copyright 2024 Amazon Web Services
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+
+SOP passages retrieved from the knowledge base, cached per blueprint.
+
+The retrieval query is fixed per blueprint (RETRIEVAL_QUERIES) rather than
+built from the claim, so all claims of a blueprint share the same passages
+and a container calls Retrieve once per blueprint instead of once per claim.
+Entries are keyed on the knowledge base generation (decision_cache), so a
+knowledge base re-sync invalidates them in every container within
+GENERATION_REFRESH_SECONDS, and they expire after SOP_CONTEXT_TTL_SECONDS.
+"""
+
+import logging
+import os
+import threading
+import time
+
+import decision_cache
+import instrumentation
+import prompts
+import rules
+
+logger = logging.getLogger()
+
+SOP_RETRIEVAL_RESULTS = int(os.environ.get('SOP_RETRIEVAL_RESULTS', '5'))
+SOP_CONTEXT_TTL_SECONDS = int(os.environ.get('SOP_CONTEXT_TTL_SECONDS', '3600'))
+# Estimated tokens of retrieved passages passed to the model, at prompts.CHARS_PER_TOKEN
+SOP_CONTEXT_TOKEN_BUDGET = int(os.environ.get('SOP_CONTEXT_TOKEN_BUDGET', '1000'))
+
+RETRIEVAL_QUERIES = {
+    rules.BLUE_PRINT_NAME_CHECK: "Benefit check processing tiers and approval rules by dollar amount",
+    rules.BLUE_PRINT_NAME_RECEIPT: "Benefit claim auto approval rules, approved items and excluded items for pharmacy receipts"
+}
+DEFAULT_RETRIEVAL_QUERY = "Rules for approving or denying benefit claims"
+
+local_cache = decision_cache.LRUCache(32)
+# One retrieval per key at a time; concurrent claims of the same blueprint wait for it
+_retrieval_locks = {}
+_retrieval_locks_lock = threading.Lock()
+
+
+def retrieval_lock(key):
+    with _retrieval_locks_lock:
+        return _retrieval_locks.setdefault(key, threading.Lock())
+
+
+def select_passages(retrieval_results):
+    """
+    Passage texts in retrieval order, deduplicated and cut to the token budget
+    """
+    budget = SOP_CONTEXT_TOKEN_BUDGET * prompts.CHARS_PER_TOKEN
+    passages = []
+    used = 0
+    for result in retrieval_results:
+        text = ' '.join(result.get('content', {}).get('text', '').split())
+        if not text or text in passages:
+            continue
+        if used + len(text) > budget:
+            if not passages:
+                passages.append(text[:budget])
+            break
+        passages.append(text)
+        used += len(text)
+    return passages
+
+
+def get_passages(bedrock_agent_runtime, kb_id, blue_print_name):
+    """
+    SOP passages for the blueprint, from the cache or a Retrieve call.
+    Errors, including throttling, are raised to the caller; empty results are not cached.
+    """
+    query = RETRIEVAL_QUERIES.get(blue_print_name, DEFAULT_RETRIEVAL_QUERY)
+    key = (kb_id, query, decision_cache.current_generation())
+
+    passages = local_cache.get(key)
+    if passages is not None:
+        instrumentation.put_metric('SopContextCacheHits', 1, operation='Retrieve')
+        return passages
+
+    with retrieval_lock(key):
+        passages = local_cache.get(key)
+        if passages is not None:
+            instrumentation.put_metric('SopContextCacheHits', 1, operation='Retrieve')
+            return passages
+
+        with instrumentation.span('Retrieve', blueprint=blue_print_name) as retrieve_span:
+            response = bedrock_agent_runtime.retrieve(
+                knowledgeBaseId=kb_id,
+                retrievalQuery={'text': query},
+                retrievalConfiguration={'vectorSearchConfiguration': {'numberOfResults': SOP_RETRIEVAL_RESULTS}}
+            )
+            passages = select_passages(response.get('retrievalResults', []))
+            retrieve_span.metric('Passages', len(passages))
+
+        if passages:
+            local_cache.put(key, passages, time.time() + SOP_CONTEXT_TTL_SECONDS)
+            logger.info(f"Retrieved {len(passages)} SOP passage(s) for {blue_print_name}")
+        else:
+            logger.warning(f"No SOP passages retrieved for {blue_print_name}")
+        return passages
+
+
+def invalidate():
+    local_cache.clear()
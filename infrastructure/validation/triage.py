@@ -0,0 +1,132 @@
+"""
+MIT No Attribution
+
+Copyright 2024 Amazon Web Services
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+
+Triage of BDA segments before they are validated.
+
+Uploads that are not benefit claims are rejected before any knowledge base
+or model call, from what BDA already produced:
+
+- the blueprint: segments that matched no blueprint, or a blueprint that is
+  not in TRIAGE_CLAIM_BLUEPRINTS, are the wrong document type;
+- the standard output: a segment with fewer than TRIAGE_MIN_WORDS words of
+  text is blank or unreadable. The standard output is only read when the
+  blueprint check passes, and only its statistics and text are kept.
+
+A claim is rejected when all of its segments are; rejected segments of a
+claim with other documents are left out of its decision.
+"""
+
+import json
+import logging
+import os
+from typing import NamedTuple
+
+from rules import NOT_APPROVED, blueprint_key
+
+logger = logging.getLogger()
+
+TRIAGE_ACCEPTED = "accepted"
+TRIAGE_REJECTED = "rejected"
+ROUTE_REJECTED = "rejected"
+
+# Blueprint of segments BDA could not match to any blueprint of the project
+UNMATCHED_BLUEPRINT = "unmatched"
+
+# Blueprint names or rule keys; segments are triaged on their rule key
+CLAIM_BLUEPRINTS = frozenset(
+    blueprint_key(name.strip())
+    for name in os.environ.get('TRIAGE_CLAIM_BLUEPRINTS', 'US-Bank-Check,Receipt').split(',')
+    if name.strip()
+)
+MIN_WORDS = int(os.environ.get('TRIAGE_MIN_WORDS', '5'))
+
+
+class Triage(NamedTuple):
+    result: str
+    reason: str
+
+
+ACCEPTED = Triage(TRIAGE_ACCEPTED, "")
+
+
+def triage_segment(blue_print_name, read_standard_output):
+    """
+    Accept or reject one segment. read_standard_output() returns the parsed standard
+    output of the segment, or None when it is not available.
+    """
+    if blue_print_name == UNMATCHED_BLUEPRINT:
+        standard_output = read_standard_output()
+        if standard_output is not None and is_blank(standard_output):
+            return reject("The document is blank or unreadable")
+        return reject("The document is not a benefit claim: it matched no claim blueprint")
+
+    if blue_print_name not in CLAIM_BLUEPRINTS:
+        return reject(f"The document is not a benefit claim: it was classified as {blue_print_name}")
+
+    standard_output = read_standard_output()
+    if standard_output is not None and is_blank(standard_output):
+        return reject("The document is blank or unreadable")
+    return ACCEPTED
+
+
+def reject(reason):
+    logger.info(f"Rejected at triage: {reason}")
+    return Triage(TRIAGE_REJECTED, reason)
+
+
+def is_blank(standard_output):
+    words = word_count(standard_output)
+    return words is not None and words < MIN_WORDS
+
+
+def word_count(standard_output):
+    """
+    Words BDA read in the segment: the statistics of the document or image when present,
+    otherwise the detected words or the text. None when the output carries neither.
+    """
+    document = standard_output.get('document') or {}
+    image = standard_output.get('image') or {}
+    for section in (standard_output, document, image):
+        statistics = section.get('statistics') or {}
+        if isinstance(statistics.get('word_count'), int):
+            return statistics['word_count']
+    if isinstance(image.get('text_words'), list):
+        return len(image['text_words'])
+    text = (document.get('representation') or {}).get('text')
+    if isinstance(text, str):
+        return len(text.split())
+    return None
+
+
+def rejection_decision(triage):
+    """
+    Decision for a rejected segment, in the same JSON shape as the knowledge base output
+    """
+    return json.dumps({'decision': NOT_APPROVED, 'reason': f"Rejected at triage: {triage.reason}"})
+
+
+def claim_triage(segment_results):
+    """
+    Triage of the whole claim: accepted when any of its segments is
+    """
+    rejected = [segment_result['triage'] for segment_result in segment_results
+                if segment_result['triage'].result == TRIAGE_REJECTED]
+    if len(rejected) < len(segment_results):
+        return ACCEPTED, len(rejected)
+    return rejected[0], len(rejected)
@@ -0,0 +1,201 @@
+"""
+MIT No Attribution
+
+Copyright 2025 Amazon Web Services
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+
+Paginated claim queries on the status, decision and blueprint indexes of the
+benefit claims table (see infrastructure/validation/claims_model.py).
+
+Every accessor returns (claims, next_token). Pass next_token back to get the
+next page; it is None after the last page. Only SUMMARY_ATTRIBUTES are read
+unless a projection is given, so a query never pulls inference results.
+
+Usage:
+    python tools/claims_queries.py --table <table> decision "review needed" --day 2026-01-31
+    python tools/claims_queries.py --table <table> blueprint Receipt --vendor "LOCAL DRUGS"
+"""
+
+import argparse
+import base64
+import json
+import os
+import sys
+
+import boto3
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'infrastructure', 'validation'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'infrastructure', 'shared'))
+
+import claims_model  # noqa: E402
+
+SUMMARY_ATTRIBUTES = ['invocationId', 'fileName', 'status', 'decision', 'bluePrintName',
+                      'claimant', 'vendor', 'amount', 'createdAt', 'updatedAt']
+DEFAULT_PAGE_SIZE = 100
+
+_dynamodb = None
+
+
+def get_client():
+    global _dynamodb
+    if _dynamodb is None:
+        _dynamodb = boto3.client('dynamodb')
+    return _dynamodb
+
+
+def table_name_or_default(table_name):
+    table_name = table_name or os.environ.get('BDA_TABLE_NAME')
+    if not table_name:
+        raise ValueError('Pass table_name or set BDA_TABLE_NAME')
+    return table_name
+
+
+def encode_token(last_evaluated_key):
+    if not last_evaluated_key:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(last_evaluated_key).encode('utf-8')).decode('ascii')
+
+
+def decode_token(next_token):
+    return json.loads(base64.urlsafe_b64decode(next_token.encode('ascii')))
+
+
+def query_index(index_name, key_name, key_value, start=None, end=None, day=None, filters=None,
+                projection=None, page_size=DEFAULT_PAGE_SIZE, next_token=None, newest_first=True, table_name=None):
+    """
+    One page of claims from index_name where key_name = key_value, optionally
+    restricted to an updatedAt range (start/end, inclusive ISO 8601) or a day (YYYY-MM-DD).
+    filters is a dict of attribute = value conditions applied after the key condition;
+    DynamoDB applies them after the page limit, so filtered pages can be short.
+    """
+    names = {'#key': key_name}
+    values = {':key': {'S': key_value}}
+    key_condition = '#key = :key'
+    if day or start or end:
+        names['#updatedAt'] = 'updatedAt'
+    if day:
+        key_condition += ' AND begins_with(#updatedAt, :day)'
+        values[':day'] = {'S': day}
+    elif start and end:
+        key_condition += ' AND #updatedAt BETWEEN :start AND :end'
+        values.update({':start': {'S': start}, ':end': {'S': end}})
+    elif start:
+        key_condition += ' AND #updatedAt >= :start'
+        values[':start'] = {'S': start}
+    elif end:
+        key_condition += ' AND #updatedAt <= :end'
+        values[':end'] = {'S': end}
+
+    request = {
+        'TableName': table_name_or_default(table_name),
+        'IndexName': index_name,
+        'KeyConditionExpression': key_condition,
+        'Limit': page_size,
+        'ScanIndexForward': not newest_first
+    }
+
+    conditions = []
+    for position, (name, value) in enumerate((filters or {}).items()):
+        names[f"#f{position}"] = name
+        values[f":f{position}"] = claims_model.to_attribute_value(value)
+        conditions.append(f"#f{position} = :f{position}")
+    if conditions:
+        request['FilterExpression'] = ' AND '.join(conditions)
+
+    projection = projection or SUMMARY_ATTRIBUTES
+    for position, name in enumerate(projection):
+        names[f"#p{position}"] = name
+    request['ProjectionExpression'] = ', '.join(f"#p{position}" for position in range(len(projection)))
+    request['ExpressionAttributeNames'] = names
+    request['ExpressionAttributeValues'] = values
+    if next_token:
+        request['ExclusiveStartKey'] = decode_token(next_token)
+
+    response = get_client().query(**request)
+    claims = [claims_model.from_item(item) for item in response.get('Items', [])]
+    return claims, encode_token(response.get('LastEvaluatedKey'))
+
+
+def claims_by_status(status, **kwargs):
+    """
+    Claims by BDA job status: STARTED (submitted to BDA) or SUCCESS (extracted and validated)
+    """
+    return query_index(claims_model.STATUS_DATE_INDEX, 'status', status, **kwargs)
+
+
+def claims_by_decision(decision, **kwargs):
+    """
+    Claims by decision: approved, not approved or review needed
+    """
+    return query_index(claims_model.DECISION_DATE_INDEX, 'decision', decision, **kwargs)
+
+
+def claims_by_blueprint(blue_print_name, vendor=None, claimant=None, **kwargs):
+    """
+    Claims by blueprint, optionally for one vendor or claimant
+    """
+    filters = dict(kwargs.pop('filters', None) or {})
+    if vendor:
+        filters['vendor'] = vendor
+    if claimant:
+        filters['claimant'] = claimant
+    return query_index(claims_model.BLUEPRINT_DATE_INDEX, 'bluePrintName', blue_print_name, filters=filters, **kwargs)
+
+
+def iter_claims(accessor, *args, limit=None, **kwargs):
+    """
+    Follow next_token through every page of an accessor, yielding claims
+    """
+    next_token = kwargs.pop('next_token', None)
+    returned = 0
+    while True:
+        claims, next_token = accessor(*args, next_token=next_token, **kwargs)
+        for claim in claims:
+            yield claim
+            returned += 1
+            if limit is not None and returned >= limit:
+                return
+        if not next_token:
+            return
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query benefit claims by status, decision or blueprint')
+    parser.add_argument('--table', help='Claims table name (default: BDA_TABLE_NAME)')
+    parser.add_argument('index', choices=['status', 'decision', 'blueprint'])
+    parser.add_argument('value')
+    parser.add_argument('--day', help='YYYY-MM-DD (UTC)')
+    parser.add_argument('--start', help='ISO 8601 lower bound of updatedAt')
+    parser.add_argument('--end', help='ISO 8601 upper bound of updatedAt')
+    parser.add_argument('--vendor')
+    parser.add_argument('--claimant')
+    parser.add_argument('--limit', type=int, default=100)
+    args = parser.parse_args()
+
+    kwargs = {'day': args.day, 'start': args.start, 'end': args.end, 'table_name': args.table}
+    if args.index == 'status':
+        claims = iter_claims(claims_by_status, args.value, limit=args.limit, **kwargs)
+    elif args.index == 'decision':
+        claims = iter_claims(claims_by_decision, args.value, limit=args.limit, **kwargs)
+    else:
+        claims = iter_claims(claims_by_blueprint, args.value, vendor=args.vendor, claimant=args.claimant,
+                             limit=args.limit, **kwargs)
+    for claim in claims:
+        print(json.dumps(claim, default=str))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""
+MIT No Attribution
+
+Copyright 2025 Amazon Web Services
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+
+Backfills items written before the current item model (no schemaVersion)
+so that they show up in the status, decision and blueprint indexes.
+
+For every old item the JSON string inferenceResult becomes a native map,
+claimant, vendor and amount are derived the same way the validation lambda
+derives them, and createdAt / updatedAt are set to --timestamp (old items
+carry no timestamps; by default LEGACY_TIMESTAMP, so they sort before every
+claim written since). decision is only set for items that stored a
+validationResult; the others stay out of DecisionDateIndex. Updates are
+conditional on the item still having no schemaVersion, so claims re-validated
+during the migration are left alone.
+
+The table is read with a parallel scan. Run with --dry-run first.
+
+Usage:
+    python tools/migrate_claims_table.py --table <table> --dry-run
+    python tools/migrate_claims_table.py --table <table> --segments 8
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.exceptions import ClientError
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'infrastructure', 'validation'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'infrastructure', 'shared'))
+
+import claims_model  # noqa: E402
+
+# Marks items whose real creation time is unknown
+LEGACY_TIMESTAMP = '1970-01-01T00:00:00+00:00'
+
+dynamodb = boto3.client('dynamodb')
+
+counts = Counter()
+counts_lock = threading.Lock()
+
+
+def count(name):
+    with counts_lock:
+        counts[name] += 1
+
+
+def migrated_attributes(item, timestamp):
+    """
+    New attributes of an old item, or None when it is already migrated
+    """
+    if 'schemaVersion' in item:
+        return None
+
+    attributes = {
+        'createdAt': item.get('createdAt', {'S': timestamp}),
+        'updatedAt': item.get('updatedAt', {'S': timestamp}),
+        'schemaVersion': {'N': str(claims_model.SCHEMA_VERSION)}
+    }
+    # Items that were only extracted have no inference result or decision yet
+    if 'S' in item.get('inferenceResult', {}):
+        try:
+            inference_result = json.loads(item['inferenceResult']['S'])
+        except ValueError:
+            inference_result = None
+        if inference_result is not None:
+            validation_result = item.get('validationResult', {}).get('S')
+            attributes.update(claims_model.claim_attributes(
+                item.get('bluePrintName', {}).get('S', ''),
+                inference_result,
+                validation_result or ''
+            ))
+            if not item.get('bluePrintName', {}).get('S'):
+                del attributes['bluePrintName']
+            # Without a stored decision the claim would read as "review needed"
+            if not validation_result:
+                del attributes['decision']
+    return attributes
+
+
+def migrate_item(table_name, item, timestamp, dry_run):
+    attributes = migrated_attributes(item, timestamp)
+    if attributes is None:
+        count('already migrated')
+        return
+    if dry_run:
+        count('would migrate')
+        if counts['would migrate'] <= 3:
+            print(json.dumps({'key': [item['invocationId'], item['fileName']], 'attributes': attributes}))
+        return
+
+    try:
+        dynamodb.update_item(
+            TableName=table_name,
+            Key={'invocationId': item['invocationId'], 'fileName': item['fileName']},
+            UpdateExpression='SET ' + ', '.join(f"#{name} = :{name}" for name in attributes),
+            ConditionExpression='attribute_not_exists(#schemaVersion)',
+            ExpressionAttributeNames={f"#{name}": name for name in attributes},
+            ExpressionAttributeValues={f":{name}": value for name, value in attributes.items()}
+        )
+        count('migrated')
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            count('updated concurrently')
+        else:
+            print(f"Error migrating {item['invocationId']['S']}/{item['fileName']['S']}: {e}", file=sys.stderr)
+            count('failed')
+
+
+def scan_segment(table_name, segment, total_segments, timestamp, dry_run):
+    paginator = dynamodb.get_paginator('scan')
+    for page in paginator.paginate(TableName=table_name, Segment=segment, TotalSegments=total_segments):
+        for item in page['Items']:
+            count('scanned')
+            migrate_item(table_name, item, timestamp, dry_run)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill old benefit claim items to the current item model')
+    parser.add_argument('--table', default=os.environ.get('BDA_TABLE_NAME'), help='Claims table name')
+    parser.add_argument('--segments', type=int, default=4, help='Parallel scan segments')
+    parser.add_argument('--timestamp', default=LEGACY_TIMESTAMP,
+                        help=f"createdAt / updatedAt for items without timestamps (default: {LEGACY_TIMESTAMP})")
+    parser.add_argument('--dry-run', action='store_true', help='Report what would change without writing')
+    args = parser.parse_args()
+    if not args.table:
+        parser.error('--table or BDA_TABLE_NAME is required')
+
+    with ThreadPoolExecutor(max_workers=args.segments) as executor:
+        futures = [
+            executor.submit(scan_segment, args.table, segment, args.segments, args.timestamp, args.dry_run)
+            for segment in range(args.segments)
+        ]
+        for future in futures:
+            future.result()
+
+    for name, value in sorted(counts.items()):
+        print(f"{name}: {value}")
+
+
+if __name__ == '__main__':
+    main()
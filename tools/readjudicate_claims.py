@@ -0,0 +1,400 @@
+"""
+MIT No Attribution
+
+Copyright 2025 Amazon Web Services
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+
+Re-adjudicates past claims against the current SOPs, e.g. after a knowledge
+base re-sync.
+
+The claims table is read with a parallel scan. Every claim last updated
+before --before is decided again by validateBenefitClaim of the validation
+lambda, from the stored inferenceResult and bluePrintName, so no BDA result
+is read from S3. A multi-segment claim is decided on the segments accepted at
+triage, each with its own blueprint from the stored segments. Claims that were
+routed to review on extraction confidence, claims whose decision event is
+still in the outbox and multi-segment claims stored without their segments
+are left alone.
+Model calls go through the validation rate limiter (--model-rpm, to be
+taken from what the validation lambda leaves of the quota) and at most
+--workers claims are decided at a time.
+
+Every changed decision is written to the --report file as one JSON line
+with the old and new decision. Unless --dry-run is given, changed claims are
+written back with UpdateItem, with previousDecision and readjudicatedAt set.
+The update is conditional on the updatedAt the scan read, so a claim decided
+or changed in the meantime is counted as skipped. No decision events are
+published for them.
+
+After each page the scan position of its segment is saved to --checkpoint;
+a run with the same checkpoint file continues where the last one stopped.
+
+Usage:
+    python tools/readjudicate_claims.py --table <table> --knowledge-base-id <kb id> --dry-run
+    python tools/readjudicate_claims.py --table <table> --knowledge-base-id <kb id> --segments 8 --workers 8 \\
+        --before 2025-06-01T00:00:00+00:00 --checkpoint readjudicate.json
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+import boto3
+from botocore.exceptions import ClientError
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'infrastructure', 'validation'))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'infrastructure', 'shared'))
+
+import claims_model  # noqa: E402
+import instrumentation  # noqa: E402
+import routing  # noqa: E402
+import rules  # noqa: E402
+import segments  # noqa: E402
+import triage  # noqa: E402
+
+DYNAMODB_THROTTLING_ERROR_CODES = {'ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded'}
+MAX_ATTEMPTS = 5
+PAGE_SIZE = 100
+
+dynamodb = boto3.client('dynamodb')
+
+counts = Counter()
+counts_lock = threading.Lock()
+
+
+def count(name, value=1):
+    with counts_lock:
+        counts[name] += value
+
+
+def backoff_delay(attempt):
+    return random.uniform(0, min(5.0, 0.2 * (2 ** attempt)))
+
+
+class Outcome(NamedTuple):
+    report_line: dict
+    # The scanned item and the attributes to write back; None when nothing is written back
+    item: dict = None
+    changes: dict = None
+
+
+class Checkpoint:
+    """
+    Scan position of every segment and the counts so far, saved as JSON after every page
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.run = None
+        self.positions = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        """
+        The saved state, or None when there is no checkpoint yet
+        """
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path) as checkpoint_file:
+            return json.load(checkpoint_file)
+
+    def resume(self, saved):
+        self.positions = {int(segment): position for segment, position in saved['positions'].items()}
+        counts.update(saved['counts'])
+
+    def save(self, segment, position):
+        with self._lock:
+            self.positions[segment] = position
+            with counts_lock:
+                state = {'run': self.run, 'positions': self.positions, 'counts': dict(counts)}
+            # Written to a temporary file first so that an interrupted save keeps the previous checkpoint
+            with open(self.path + '.tmp', 'w') as checkpoint_file:
+                json.dump(state, checkpoint_file)
+            os.replace(self.path + '.tmp', self.path)
+
+
+class Readjudicator:
+    def __init__(self, app, args, checkpoint, report):
+        self.app = app
+        self.args = args
+        self.checkpoint = checkpoint
+        self.report = report
+        self.report_lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=args.workers)
+
+    def run(self):
+        with ThreadPoolExecutor(max_workers=self.args.segments) as scanners:
+            futures = [
+                scanners.submit(self.scan_segment, segment)
+                for segment in range(self.args.segments)
+                if self.checkpoint.positions.get(segment) != 'done'
+            ]
+            for future in futures:
+                future.result()
+        self.executor.shutdown()
+
+    def scan_segment(self, segment):
+        request = {
+            'TableName': self.args.table,
+            'Segment': segment,
+            'TotalSegments': self.args.segments,
+            'Limit': PAGE_SIZE,
+            # Claims updated after --before were decided with the current SOPs
+            'FilterExpression': 'attribute_exists(#inferenceResult) AND #updatedAt < :before',
+            'ExpressionAttributeNames': {'#inferenceResult': 'inferenceResult', '#updatedAt': 'updatedAt'},
+            'ExpressionAttributeValues': {':before': {'S': self.args.before}}
+        }
+        position = self.checkpoint.positions.get(segment)
+        if position:
+            request['ExclusiveStartKey'] = position
+
+        while True:
+            response = dynamodb.scan(**request)
+            count('scanned', response.get('ScannedCount', 0))
+            outcomes = [
+                outcome for outcome in self.executor.map(self.readjudicate, response.get('Items', [])) if outcome
+            ]
+            changed = [outcome for outcome in outcomes if outcome.changes]
+            if changed and not self.args.dry_run:
+                skipped = self.write_back(changed)
+                outcomes = [outcome for outcome in outcomes if id(outcome) not in skipped]
+            # Reported once the page is written, right before its checkpoint, so a resumed run repeats no lines
+            self.write_report([outcome.report_line for outcome in outcomes])
+            # Metrics of the validation code are not needed here; flushing keeps them from piling up
+            instrumentation.flush_metrics()
+
+            last_key = response.get('LastEvaluatedKey')
+            self.checkpoint.save(segment, last_key or 'done')
+            if not last_key:
+                return
+            request['ExclusiveStartKey'] = last_key
+
+    def readjudicate(self, item):
+        """
+        Decide the claim again. Returns an Outcome when its decision changed or could not be made, otherwise None.
+        """
+        count('claims')
+        if item.get('routing', {}).get('M', {}).get('route', {}).get('S') == routing.ROUTE_REVIEW:
+            count('skipped, routed to review')
+            return None
+        if item.get('routing', {}).get('M', {}).get('route', {}).get('S') == triage.ROUTE_REJECTED:
+            count('skipped, rejected at triage')
+            return None
+        if 'outboxStatus' in item:
+            count('skipped, decision event not yet published')
+            return None
+
+        # Items validated before names were resolved carry the blueprint name BDA reported
+        blue_print_name = rules.blueprint_key(item.get('bluePrintName', {}).get('S', ''))
+        stored_segments = [
+            {'blueprint': rules.blueprint_key(segment['M']['blueprint']['S']), 'triage': segment['M']['triage']['S']}
+            for segment in item.get('segments', {}).get('L', [])
+        ]
+        old_result = item.get('validationResult', {}).get('S', '')
+        old_decision = segments.normalize_decision(segments.parse_decision(old_result).get('decision'))
+
+        try:
+            inference_result = claims_model.from_attribute_value(item['inferenceResult'])
+            if isinstance(inference_result, str):
+                # Items written before the current item model store the result as JSON text
+                inference_result = json.loads(inference_result)
+            if isinstance(inference_result, list) and len(stored_segments) != len(inference_result):
+                # Stored before segments were: the blueprint and triage result of each page are unknown
+                count('skipped, segments not stored')
+                return None
+            new_result = self.validate(inference_result, blue_print_name, stored_segments)
+        except Exception as e:
+            count('failed')
+            return Outcome(self.report_line(item, old_decision, None, error=str(e)))
+
+        new_decision = segments.normalize_decision(segments.parse_decision(new_result).get('decision'))
+        count(f"{old_decision or 'none'} -> {new_decision}")
+        if new_decision == old_decision:
+            return None
+
+        count('changed')
+        now = claims_model.now_iso()
+        reason = segments.parse_decision(new_result).get('reason')
+        return Outcome(
+            self.report_line(item, old_decision, new_decision, reason=reason),
+            item,
+            {
+                'validationResult': {'S': new_result},
+                'decision': {'S': new_decision},
+                'previousDecision': {'S': old_decision},
+                'readjudicatedAt': {'S': now},
+                'updatedAt': {'S': now}
+            }
+        )
+
+    def validate(self, inference_result, blue_print_name, stored_segments):
+        """
+        The decision of the validation lambda for the stored result; a multi-segment claim
+        is decided on its segments accepted at triage, each with its own blueprint, and aggregated
+        """
+        if not isinstance(inference_result, list):
+            return self.validate_segment(inference_result, blue_print_name)
+        segment_results = [
+            {'index': index, 'blueprint': segment['blueprint'],
+             'validation_result': self.validate_segment(result, segment['blueprint'])}
+            for index, (result, segment) in enumerate(zip(inference_result, stored_segments))
+            if segment['triage'] == triage.TRIAGE_ACCEPTED
+        ]
+        if not segment_results:
+            raise ValueError('No segment of the claim was accepted at triage')
+        return segments.aggregate_decisions(segment_results)
+
+    def validate_segment(self, result, blue_print_name):
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return self.app.validateBenefitClaim(result, blue_print_name)
+            except self.app.ClaimThrottledError:
+                count('throttled')
+                if attempt >= MAX_ATTEMPTS:
+                    raise
+                time.sleep(backoff_delay(attempt))
+
+    def report_line(self, item, old_decision, new_decision, reason=None, error=None):
+        line = {
+            'invocationId': item['invocationId']['S'],
+            'fileName': item['fileName']['S'],
+            'bluePrintName': item.get('bluePrintName', {}).get('S'),
+            'oldDecision': old_decision,
+            'newDecision': new_decision
+        }
+        if reason is not None:
+            line['reason'] = reason
+        if error is not None:
+            line['error'] = error
+        return line
+
+    def write_report(self, lines):
+        with self.report_lock:
+            for line in lines:
+                self.report.write(json.dumps(line) + '\n')
+            self.report.flush()
+
+    def write_back(self, outcomes):
+        """
+        Write the changed decisions, one conditional UpdateItem per claim.
+        Returns the ids of the outcomes that were not written.
+        """
+        return {id(outcome) for outcome, written in zip(outcomes, self.executor.map(self.write_item, outcomes))
+                if not written}
+
+    def write_item(self, outcome):
+        item = outcome.item
+        names = {f"#{name}": name for name in outcome.changes}
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                dynamodb.update_item(
+                    TableName=self.args.table,
+                    Key={'invocationId': item['invocationId'], 'fileName': item['fileName']},
+                    # Only the re-decided attributes, so concurrent writes to the rest of the item are kept
+                    UpdateExpression='SET ' + ', '.join(f"#{name} = :{name}" for name in outcome.changes),
+                    # Skipped when the claim was decided again or its decision event queued since the scan
+                    ConditionExpression='#updatedAt = :scannedUpdatedAt AND attribute_not_exists(#outboxStatus)',
+                    ExpressionAttributeNames={**names, '#outboxStatus': 'outboxStatus'},
+                    ExpressionAttributeValues={
+                        **{f":{name}": value for name, value in outcome.changes.items()},
+                        ':scannedUpdatedAt': item['updatedAt']
+                    }
+                )
+                count('written')
+                return True
+            except ClientError as e:
+                error_code = e.response.get('Error', {}).get('Code')
+                if error_code == 'ConditionalCheckFailedException':
+                    count('skipped, changed since the scan')
+                    return False
+                if error_code not in DYNAMODB_THROTTLING_ERROR_CODES or attempt >= MAX_ATTEMPTS:
+                    count('not written')
+                    print(f"Not written: {item['invocationId']['S']}/{item['fileName']['S']}: {e}", file=sys.stderr)
+                    return False
+                time.sleep(backoff_delay(attempt))
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-adjudicate past benefit claims against the current SOPs')
+    parser.add_argument('--table', default=os.environ.get('BDA_TABLE_NAME'), help='Claims table name')
+    parser.add_argument('--knowledge-base-id', default=os.environ.get('KNOWLEDGE_BASE_ID'))
+    parser.add_argument('--models', default=os.environ.get('ADJUDICATION_MODELS', 'amazon.nova-lite-v1:0'),
+                        help='ADJUDICATION_MODELS of the validation lambda')
+    parser.add_argument('--before', default=None,
+                        help='Re-adjudicate claims last updated before this ISO 8601 time '
+                             '(default: that of the checkpoint, or now)')
+    parser.add_argument('--segments', type=int, default=4, help='Parallel scan segments')
+    parser.add_argument('--workers', type=int, default=4, help='Claims decided at the same time')
+    parser.add_argument('--model-rpm', type=int, default=30, help='Model requests per minute for this job')
+    parser.add_argument('--checkpoint', default=None,
+                        help='Checkpoint file (default: readjudicate-<table>.json, or -dry-run.json)')
+    parser.add_argument('--report', default=None, help='Changed decisions as JSON lines (default: stdout)')
+    parser.add_argument('--dry-run', action='store_true', help='Report changed decisions without writing them')
+    args = parser.parse_args()
+    if not args.table:
+        parser.error('--table or BDA_TABLE_NAME is required')
+    if not args.knowledge_base_id:
+        parser.error('--knowledge-base-id or KNOWLEDGE_BASE_ID is required')
+
+    # The validation lambda reads its configuration from the environment when it is imported
+    os.environ.update({
+        'BDA_TABLE_NAME': args.table,
+        'KNOWLEDGE_BASE_ID': args.knowledge_base_id,
+        'ADJUDICATION_MODELS': args.models,
+        'MODEL_REQUESTS_PER_MINUTE': str(args.model_rpm),
+        'VALIDATION_MAX_CONCURRENCY': '1',
+        'MAX_CLAIM_WORKERS': str(args.workers)
+    })
+    import app
+    # Spans of every model call would otherwise be printed
+    instrumentation.write = lambda document: None
+
+    checkpoint = Checkpoint(args.checkpoint or f"readjudicate-{args.table}{'-dry-run' if args.dry_run else ''}.json")
+    saved = checkpoint.load()
+    if args.before is None:
+        args.before = saved['run']['before'] if saved else claims_model.now_iso()
+    checkpoint.run = {'table': args.table, 'segments': args.segments, 'before': args.before, 'dryRun': args.dry_run}
+    if saved:
+        if saved['run'] != checkpoint.run:
+            parser.error(f"{checkpoint.path} belongs to a run with other options: {saved['run']}")
+        checkpoint.resume(saved)
+        done = sum(1 for position in checkpoint.positions.values() if position == 'done')
+        print(f"Resuming from {checkpoint.path}: {done} of {args.segments} segment(s) done", file=sys.stderr)
+
+    report = open(args.report, 'a') if args.report else sys.stdout
+    try:
+        Readjudicator(app, args, checkpoint, report).run()
+    finally:
+        if report is not sys.stdout:
+            report.close()
+
+    for name, value in sorted(counts.items()):
+        print(f"{name}: {value}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+MIT No Attribution
+
+Copyright 2025 Amazon Web Services
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+
+Syncs the SOP documents into the knowledge base and, once the ingestion job
+has completed, invalidates the cached claim decisions and SOP passages.
+
+A sync started from the console is not seen by the validation lambda: the
+knowledge base does not publish an event when an ingestion job completes.
+This tool starts the ingestion job of the data source (or waits for the one
+given with --ingestion-job-id), polls it until it finishes and then puts the
+"Knowledge Base Sync Completed" event that KnowledgeBaseSyncRule routes to
+the validation lambda, which raises the knowledge base generation. No event
+is put when the job fails or is stopped.
+
+Usage:
+    python tools/sync_knowledge_base.py --knowledge-base-id <kb id>
+    python tools/sync_knowledge_base.py --knowledge-base-id <kb id> --ingestion-job-id <job id>
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import boto3
+
+# Matched by KnowledgeBaseSyncRule in infrastructure/template.yaml
+KB_SYNC_EVENT_SOURCE = 'benefit-claim-kb-sync'
+KB_SYNC_DETAIL_TYPE = 'Knowledge Base Sync Completed'
+DATA_SOURCE_NAME = 'benefit-claim-bedrock-kb-ds'
+FINISHED_STATUSES = {'COMPLETE', 'FAILED', 'STOPPED'}
+
+bedrock_agent = boto3.client('bedrock-agent')
+events = boto3.client('events')
+
+
+def find_data_source(knowledge_base_id, name):
+    paginator = bedrock_agent.get_paginator('list_data_sources')
+    for page in paginator.paginate(knowledgeBaseId=knowledge_base_id):
+        for data_source in page['dataSourceSummaries']:
+            if data_source['name'] == name:
+                return data_source['dataSourceId']
+    raise SystemExit(f"No data source {name} in knowledge base {knowledge_base_id}")
+
+
+def wait_for_ingestion_job(knowledge_base_id, data_source_id, ingestion_job_id, poll_seconds):
+    while True:
+        ingestion_job = bedrock_agent.get_ingestion_job(
+            knowledgeBaseId=knowledge_base_id,
+            dataSourceId=data_source_id,
+            ingestionJobId=ingestion_job_id
+        )['ingestionJob']
+        print(f"ingestion job {ingestion_job_id}: {ingestion_job['status']}", file=sys.stderr)
+        if ingestion_job['status'] in FINISHED_STATUSES:
+            return ingestion_job
+        time.sleep(poll_seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sync the SOP knowledge base and invalidate the cached decisions')
+    parser.add_argument('--knowledge-base-id', required=True)
+    parser.add_argument('--data-source-id', help=f"Default: the data source named {DATA_SOURCE_NAME}")
+    parser.add_argument('--ingestion-job-id', help='Wait for this ingestion job instead of starting one')
+    parser.add_argument('--poll-seconds', type=float, default=15)
+    args = parser.parse_args()
+
+    data_source_id = args.data_source_id or find_data_source(args.knowledge_base_id, DATA_SOURCE_NAME)
+    ingestion_job_id = args.ingestion_job_id
+    if not ingestion_job_id:
+        ingestion_job_id = bedrock_agent.start_ingestion_job(
+            knowledgeBaseId=args.knowledge_base_id,
+            dataSourceId=data_source_id
+        )['ingestionJob']['ingestionJobId']
+
+    ingestion_job = wait_for_ingestion_job(args.knowledge_base_id, data_source_id, ingestion_job_id, args.poll_seconds)
+    if ingestion_job['status'] != 'COMPLETE':
+        raise SystemExit(f"Ingestion job {ingestion_job_id} {ingestion_job['status']}: "
+                         f"{ingestion_job.get('failureReasons', [])}; cached decisions were not invalidated")
+
+    detail = {
+        'knowledgeBaseId': args.knowledge_base_id,
+        'dataSourceId': data_source_id,
+        'ingestionJobId': ingestion_job_id,
+        'statistics': ingestion_job.get('statistics', {})
+    }
+    response = events.put_events(Entries=[{
+        'Source': KB_SYNC_EVENT_SOURCE,
+        'DetailType': KB_SYNC_DETAIL_TYPE,
+        'Detail': json.dumps(detail)
+    }])
+    if response['FailedEntryCount']:
+        raise SystemExit(f"Could not put the sync event: {response['Entries']}")
+    print(json.dumps(detail))
+
+
+if __name__ == '__main__':
+    main()